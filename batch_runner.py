@@ -0,0 +1,126 @@
+import argparse
+from collections import Counter
+import json
+from multiprocessing import Pool
+import random
+import sys
+from timeit import default_timer
+
+from brave_rats import play_match
+from components.brain_management import BrainNotFound, get_brain_func
+from components.cards import Color
+from components.player import CheatingException
+from components.rules import VARIANTS
+
+# Job spec fields, besides the required "red" and "blue" brain names, and their defaults
+JOB_DEFAULTS = {
+    'id': None,  # echoed back in the result; defaults to the job's line number
+    'games': 1,
+    'red_hand': None,  # initial hand strings, eg. '0123456'
+    'blue_hand': None,
+    'seed': None,  # RNG seed for the job; without one, the job isn't repeatable
+    'rules': 'vanilla',
+}
+
+
+def run_job(job):
+    ''' Plays the match a job spec asks for
+    :param job: dict with "red" and "blue" brain names, and optionally any of the JOB_DEFAULTS fields
+    :return: dict with the job id, brains and game count, and either win counts or an error
+    '''
+    result = {'id': job.get('id'), 'red': job.get('red'), 'blue': job.get('blue')}
+    try:
+        unknown_fields = set(job) - set(JOB_DEFAULTS) - {'red', 'blue'}
+        if unknown_fields:
+            raise ValueError('Unknown job fields: {}'.format(', '.join(sorted(unknown_fields))))
+        spec = dict(JOB_DEFAULTS, **job)
+        red_brain_fn, blue_brain_fn = get_brain_func(spec['red']), get_brain_func(spec['blue'])
+        rules = VARIANTS[spec['rules']]
+        # Seed even without a seed, so that forked workers don't all play the same games
+        random.seed(spec['seed'])
+        start = default_timer()
+        win_count = Counter(
+            game.winner for game in play_match(
+                red_brain_fn, blue_brain_fn, num_games=int(spec['games']),
+                initial_red_hand_str=spec['red_hand'], initial_blue_hand_str=spec['blue_hand'], rules=rules,
+            )
+        )
+        result.update(
+            games=sum(win_count.itervalues()), red_wins=win_count[Color.red], ties=win_count[None],
+            blue_wins=win_count[Color.blue], seconds=round(default_timer() - start, 6),
+        )
+    except (BrainNotFound, CheatingException, KeyError, TypeError, ValueError) as error:
+        result['error'] = '{}: {}'.format(type(error).__name__, error)
+    return result
+
+
+def _run_line((line_number, line)):
+    ''' Process pool worker: runs the job on one line of input
+    :return: JSON result line
+    '''
+    try:
+        job = json.loads(line)
+        if not isinstance(job, dict):
+            raise ValueError('Job spec must be a JSON object')
+    except ValueError as error:
+        return json.dumps({'id': line_number, 'error': 'Bad job spec: {}'.format(error)})
+    job.setdefault('id', line_number)
+    return json.dumps(run_job(job))
+
+
+def _numbered_lines(input_file):
+    # readline rather than iterating over the file, which reads ahead and would hold back jobs piped in one by one
+    for line_number, line in enumerate(iter(input_file.readline, ''), 1):
+        if line.strip():
+            yield line_number, line
+
+
+def run_jobs(input_file, output_file, processes=1):
+    ''' Runs the JSON lines job specs in input_file, writing a JSON result line to output_file as each job finishes.
+    Brains stay imported between jobs.
+    :param processes: number of worker processes; with 1, jobs run in this process, in order
+    :return: number of jobs run
+    '''
+    if processes == 1:
+        results = (_run_line(numbered_line) for numbered_line in _numbered_lines(input_file))
+        pool = None
+    else:
+        pool = Pool(processes)
+        results = pool.imap_unordered(_run_line, _numbered_lines(input_file))
+    num_jobs = 0
+    try:
+        for result in results:
+            output_file.write(result + '\n')
+            output_file.flush()
+            num_jobs += 1
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return num_jobs
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Play many matches in warm processes. Reads one JSON job spec per line, eg. '
+                    '{"red": "cfr", "blue": "random_ai", "games": 100, "red_hand": "0123456", "seed": 1}, '
+                    'and writes one JSON result line per job as it finishes.'
+    )
+    parser.add_argument('input', nargs='?', help='File of job specs; defaults to stdin')
+    parser.add_argument('-o', '--output', help='File to append results to; defaults to stdout')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                        help='Number of worker processes; results come out in the order jobs finish')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    input_file = open(args.input) if args.input else sys.stdin
+    output_file = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        run_jobs(input_file, output_file, args.processes)
+    finally:
+        if args.input:
+            input_file.close()
+        if args.output:
+            output_file.close()
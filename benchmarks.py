@@ -0,0 +1,50 @@
+import argparse
+import sys
+
+from components.benchmarks import (
+    DEFAULT_THRESHOLD, SCENARIOS_BY_NAME, compare_results, load_results, run_benchmarks, save_results,
+)
+from components.latency import format_seconds
+
+
+def _print_result(name, result):
+    # Percentiles are of each batch's average time per unit, not of single units
+    print '{:22} {:>12.0f} {}/s   batch average p50 {:>8}  p90 {:>8}  p99 {:>8}'.format(
+        name, result['rate'], result['unit'],
+        *[format_seconds(result['batch_latency'][percent]) for percent in ('50', '90', '99')]
+    )
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the engine, brains and match paths')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='Run benchmarks and save the results as JSON')
+    run_parser.add_argument('-o', '--output', default='benchmarks.json', help='File to save results to')
+    run_parser.add_argument('-s', '--scenarios', nargs='+', choices=sorted(SCENARIOS_BY_NAME),
+                            help='Scenarios to run; defaults to all of them')
+    run_parser.add_argument('--seed', type=int, default=0, help='RNG seed')
+
+    compare_parser = subparsers.add_parser('compare', help='Flag scenarios that got slower between two runs')
+    compare_parser.add_argument('baseline', help='Results file to compare against')
+    compare_parser.add_argument('current', help='Newer results file')
+    compare_parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help='Fraction a rate may drop by before it counts as a regression')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    if args.command == 'run':
+        results = run_benchmarks(args.scenarios, seed=args.seed, progress_fn=_print_result)
+        save_results(results, args.output)
+        print 'Results written to', args.output
+    else:
+        baseline, current = load_results(args.baseline), load_results(args.current)
+        print 'Comparing {} with {}'.format(baseline['commit'], current['commit'])
+        rows = compare_results(baseline, current, args.threshold)
+        for name, old_rate, new_rate, change, regressed in rows:
+            print '{:22} {:>12.0f} -> {:>12.0f} {:+7.1%}{}'.format(name, old_rate, new_rate, change,
+                                                                   '  REGRESSION' if regressed else '')
+        if any(regressed for _, _, _, _, regressed in rows):
+            sys.exit(1)
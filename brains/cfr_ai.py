@@ -0,0 +1,67 @@
+import os
+import random
+
+from components.cards import Color
+from components.cfr import infoset_index, load_strategy, public_state_index
+from components.compact_game import FULL_HAND, NO_PREV, PREV_BASE, hand_mask
+from components.observation import takes_observation
+from components.rules import VANILLA, card_index
+
+# Average strategy written by train_cfr.py --export
+STRATEGY_PATH = os.environ.get('BRAVE_RATS_CFR_STRATEGY', 'cfr_strategy.f16')
+
+_strategy = []  # [strategy memmap, or None if there's no strategy file], loaded on first use
+
+
+def _get_strategy():
+    if not _strategy:
+        _strategy.append(load_strategy(STRATEGY_PATH) if os.path.exists(STRATEGY_PATH) else None)
+    return _strategy[0]
+
+
+@takes_observation
+def cfr_brain_fn(observation):
+    ''' Plays the average strategy found by counterfactual regret minimization (see components/cfr.py).
+    Falls back to random cards when there's no strategy file, in games that don't start with full hands, and in
+    situations training never reached. The strategy was trained on the vanilla rules, so other rule sets are
+    refused rather than played badly.
+    '''
+    if observation.is_over:
+        return None
+    if observation.rules is not VANILLA:
+        raise ValueError('cfr_brain_fn only plays the vanilla rules, not {}'.format(observation.rules.name))
+
+    hand = observation.hand
+    strategy = _get_strategy()
+    if strategy is None:
+        return random.choice(hand)
+
+    my_hand, opponent_hand = observation.hand_mask, observation.opponent_hand_mask
+    if (my_hand | hand_mask(my_card for my_card, _ in observation.fights) != FULL_HAND
+            or opponent_hand | hand_mask(opponent_card for _, opponent_card in observation.fights) != FULL_HAND):
+        return random.choice(hand)
+
+    my_card, opponent_card = observation.last_fight
+    if observation.color == Color.red:
+        red_hand, blue_hand = my_hand, opponent_hand
+        red_points, blue_points = observation.points, observation.opponent_points
+        prev_red, prev_blue = my_card, opponent_card
+    else:
+        red_hand, blue_hand = opponent_hand, my_hand
+        red_points, blue_points = observation.opponent_points, observation.points
+        prev_red, prev_blue = opponent_card, my_card
+    prev = NO_PREV if prev_red is None else card_index(prev_red) * PREV_BASE + card_index(prev_blue)
+    public_index = public_state_index(red_hand, blue_hand, red_points, blue_points, observation.on_hold_points, prev)
+    spied_card = observation.spied_card
+    row = strategy[infoset_index(public_index, prev, observation.color,
+                                 None if spied_card is None else int(spied_card))]
+
+    weights = [float(row[int(card)]) for card in hand]
+    if sum(weights) <= 0:
+        return random.choice(hand)
+    point = random.random() * sum(weights)
+    for card, weight in zip(hand, weights):
+        point -= weight
+        if point < 0:
+            return card
+    return hand[-1]
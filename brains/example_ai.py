@@ -13,7 +13,13 @@ def random_ai_brain_fn(player, game, spied_card):
     '''
     if game.is_over:
         return None
-
-    if spied_card:
-        print 'Hah! You think you can beat me with that {}? Prepare to be CRUSHED!'.format(spied_card.name)
     return random.choice(player.hand)
+
+
+def _random_ai_card_odds(player, game, spied_card):
+    ''' Exact odds of random_ai_brain_fn playing each card, for exploitability's best response
+    '''
+    return [(card, 1.0 / len(player.hand)) for card in player.hand]
+
+
+random_ai_brain_fn.card_odds = _random_ai_card_odds
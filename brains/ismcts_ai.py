@@ -0,0 +1,177 @@
+import math
+import random
+from timeit import default_timer
+
+from components.cards import Color
+from components.compact_game import HAND_CARDS, CompactGameStatus, hand_mask, hand_mask_from_str
+
+DEFAULT_ITERATIONS = 2000
+DEFAULT_TIME_LIMIT = 0.1  # seconds
+DEFAULT_EXPLORATION = 0.7
+
+# How many iterations to run between checks of the clock
+_ITERATIONS_PER_CLOCK_CHECK = 32
+
+
+class _Node(object):
+    ''' A node of the search tree. Each player picks its card with its own bandit (decoupled UCT), since cards are
+    chosen simultaneously. A player who successfully spied keeps separate stats for each revealed card.
+    Stats are [visits, total reward], reward being 1 for a win and 0.5 for a tie from that player's point of view.
+    '''
+    __slots__ = ('red_stats', 'blue_stats', 'children')
+
+    def __init__(self):
+        self.red_stats, self.blue_stats = {}, {}
+        self.children = {}  # {(red_card, blue_card): _Node}
+
+
+def _pick(stats, keys, exploration):
+    ''' UCB1 over the given action keys, trying unvisited ones first
+    '''
+    unvisited = [key for key in keys if key not in stats]
+    if unvisited:
+        return random.choice(unvisited)
+    log_total = math.log(sum(stats[key][0] for key in keys))
+    return max(
+        keys,
+        key=lambda key: stats[key][1] / stats[key][0] + exploration * math.sqrt(log_total / stats[key][0])
+    )
+
+
+def _choose_cards(node, game, exploration, forced_red=None, forced_blue=None):
+    ''' :return: (red_card, blue_card, red stats key, blue stats key)
+    '''
+    red_cards, blue_cards = HAND_CARDS[game.red_hand], HAND_CARDS[game.blue_hand]
+    spy_color = game.spy_color
+    if spy_color == Color.red:
+        blue_card = forced_blue if forced_blue is not None else _pick(node.blue_stats, blue_cards, exploration)
+        red_key = (blue_card, forced_red if forced_red is not None else
+                   _pick(node.red_stats, [(blue_card, card) for card in red_cards], exploration)[1])
+        return red_key[1], blue_card, red_key, blue_card
+    if spy_color == Color.blue:
+        red_card = forced_red if forced_red is not None else _pick(node.red_stats, red_cards, exploration)
+        blue_key = (red_card, forced_blue if forced_blue is not None else
+                    _pick(node.blue_stats, [(red_card, card) for card in blue_cards], exploration)[1])
+        return red_card, blue_key[1], red_card, blue_key
+    red_card = forced_red if forced_red is not None else _pick(node.red_stats, red_cards, exploration)
+    blue_card = forced_blue if forced_blue is not None else _pick(node.blue_stats, blue_cards, exploration)
+    return red_card, blue_card, red_card, blue_card
+
+
+def _rollout(game):
+    while not game.is_over:
+        game.resolve_fight(random.choice(HAND_CARDS[game.red_hand]), random.choice(HAND_CARDS[game.blue_hand]))
+    winner = game.winner
+    return 1.0 if winner == Color.red else 0.0 if winner == Color.blue else 0.5
+
+
+def _iterate(root, game, exploration, forced_red=None, forced_blue=None):
+    ''' One search iteration from root on a (determinized) copy of the game. Cards are only forced at the root.
+    '''
+    path = []
+    node = root
+    while not game.is_over:
+        red_card, blue_card, red_key, blue_key = _choose_cards(node, game, exploration, forced_red, forced_blue)
+        forced_red = forced_blue = None
+        path.append((node, red_key, blue_key))
+        game.resolve_fight(red_card, blue_card)
+        child = node.children.get((red_card, blue_card))
+        if child is None:
+            node.children[(red_card, blue_card)] = _Node()
+            break
+        node = child
+    red_reward = _rollout(game)
+    for node, red_key, blue_key in path:
+        red_stats = node.red_stats.setdefault(red_key, [0, 0.0])
+        red_stats[0] += 1
+        red_stats[1] += red_reward
+        blue_stats = node.blue_stats.setdefault(blue_key, [0, 0.0])
+        blue_stats[0] += 1
+        blue_stats[1] += 1.0 - red_reward
+
+
+def _opponent_hands(game, color, num_cards, spied_card):
+    ''' Samples the opponent's possible hands (including any card it has revealed to my spy) from the cards it
+    started with and the cards it has played. When its starting hand is known the hand is certain; otherwise
+    hands are sampled from its unplayed cards.
+    '''
+    opponent = Color.blue if color == Color.red else Color.red
+    initial_hand_str = getattr(game, 'initial_hands', {}).get(opponent.name)
+    played = hand_mask(fight[0 if opponent == Color.red else 1] for fight in game.all_fights)
+    revealed = 0 if spied_card is None else 1 << spied_card
+    candidates = HAND_CARDS[hand_mask_from_str(initial_hand_str) & ~played & ~revealed]
+    num_hidden = num_cards - (1 if revealed else 0)
+    while True:
+        if len(candidates) <= num_hidden:
+            yield hand_mask(candidates) | revealed
+        else:
+            yield hand_mask(random.sample(candidates, num_hidden)) | revealed
+
+
+def _advance_root(tree, game):
+    ''' Reuses the part of last turn's tree that matches the fights played since
+    '''
+    root, num_fights = tree
+    for red_card, blue_card in game.all_fights[num_fights:]:
+        root = root.children.get((int(red_card), int(blue_card)))
+        if root is None:
+            return _Node()
+    return root
+
+
+def make_ismcts_brain(iterations=DEFAULT_ITERATIONS, time_limit=DEFAULT_TIME_LIMIT,
+                      exploration=DEFAULT_EXPLORATION):
+    ''' Makes an information-set Monte Carlo tree search brain
+    :param iterations: max search iterations per move, or None for no limit
+    :param time_limit: max seconds of search per move, or None for no limit
+    :param exploration: UCB1 exploration constant
+    '''
+    if iterations is None and time_limit is None:
+        raise ValueError('The search needs an iteration or time limit')
+
+    def ismcts_brain_fn(player, game, spied_card):
+        if game.is_over:
+            player.ismcts_tree = None
+            return None
+
+        start = default_timer()
+        tree = getattr(player, 'ismcts_tree', None)
+        root = _advance_root(tree, game) if tree else _Node()
+
+        my_hand = hand_mask(player.hand)
+        spied_card = None if spied_card is None else int(spied_card)
+        # The opponent has as many cards as me, plus the card it has already chosen if it's been spied on
+        opponent_hands = _opponent_hands(game, player.color, len(player.hand), spied_card)
+        determinized_games = {}  # {opponent hand: CompactGameStatus}, since replaying the fights isn't free
+        if player.color == Color.red:
+            forced_red, forced_blue = None, spied_card
+        else:
+            forced_red, forced_blue = spied_card, None
+
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if (time_limit is not None and iteration % _ITERATIONS_PER_CLOCK_CHECK == 0
+                    and default_timer() - start > time_limit):
+                break
+            opponent_hand = next(opponent_hands)
+            if opponent_hand not in determinized_games:
+                red_hand, blue_hand = (
+                    (my_hand, opponent_hand) if player.color == Color.red else (opponent_hand, my_hand)
+                )
+                determinized_games[opponent_hand] = CompactGameStatus.from_game(game, red_hand, blue_hand)
+            _iterate(root, determinized_games[opponent_hand].copy(), exploration, forced_red, forced_blue)
+            iteration += 1
+
+        player.ismcts_tree = (root, len(game.all_fights))
+
+        my_stats = root.red_stats if player.color == Color.red else root.blue_stats
+        if spied_card is not None:
+            keys = dict(((spied_card, int(card)), card) for card in player.hand)
+        else:
+            keys = dict((int(card), card) for card in player.hand)
+        return keys[max(keys, key=lambda key: my_stats.get(key, (0,))[0])]
+
+    return ismcts_brain_fn
+
+
+ismcts_brain_fn = make_ismcts_brain()
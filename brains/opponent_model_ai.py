@@ -0,0 +1,164 @@
+import errno
+import fcntl
+import os
+import random
+
+import numpy as np
+
+from components.cards import Card, Color
+from components.game_status import MAX_ROUNDS_IN_GAME, POINTS_TO_WIN
+from components.observation import observe
+from components.rules import NUM_CARDS, NUM_PREVS, PREV_BASE, FightResult, card_index
+
+# Opponent models count the cards an opponent has played, by row:
+#   turn n (0-based): the cards played in the nth fight of a game
+#   _PREV_ROWS + prev: the cards played after a fight, with prev = my card * PREV_BASE + opponent's card, or
+#       card_index(None) for both before the first fight
+_PREV_ROWS = MAX_ROUNDS_IN_GAME
+_NUM_ROWS = _PREV_ROWS + NUM_PREVS
+
+# Value of winning the game, in points; a fight's value is the points it wins, or this if it wins the game
+_GAME_VALUE = 2 * POINTS_TO_WIN
+
+_CARDS = list(Card)
+_MY_WINS = {
+    Color.red: {FightResult.red_wins: 1, FightResult.red_wins_2: 2},
+    Color.blue: {FightResult.blue_wins: 1, FightResult.blue_wins_2: 2},
+}
+_MY_GAME_WIN = {Color.red: FightResult.red_wins_game, Color.blue: FightResult.blue_wins_game}
+
+
+class OpponentModel(object):
+    ''' Count table of the cards one opponent has played, kept in memory, or in a file memory-mapped by every
+    process that opens it. Processes take a lock on the file while they update it, and the file is made whole
+    under a temporary name, then renamed into place, so no process sees it half written.
+    '''
+    def __init__(self, path=None):
+        '''
+        :param path: .npy file to keep the counts in between runs, made if it doesn't exist; None keeps them in memory
+        '''
+        self.path = path
+        if path is None:
+            self.counts = np.zeros((_NUM_ROWS, NUM_CARDS), dtype=np.int32)
+            return
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        self._lock_path = path + '.lock'
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not os.path.exists(path):
+                temp_path = '{}.{}.tmp'.format(path, os.getpid())
+                with open(temp_path, 'wb') as temp_file:
+                    np.lib.format.write_array(temp_file, np.zeros((_NUM_ROWS, NUM_CARDS), dtype=np.int32))
+                os.rename(temp_path, path)
+        self.counts = np.lib.format.open_memmap(path, mode='r+')
+
+    def learn(self, fights):
+        ''' Counts the opponent's cards in a finished game
+        :param fights: (my card, opponent card) for each fight of the game
+        '''
+        if self.path is None:
+            self._count(fights)
+            return
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._count(fights)
+            self.counts.flush()
+
+    def _count(self, fights):
+        last_fight = (None, None)
+        for turn, fight in enumerate(fights):
+            opponent_card = int(fight[1])
+            self.counts[turn, opponent_card] += 1
+            self.counts[_prev_row(last_fight), opponent_card] += 1
+            last_fight = fight
+
+
+def _prev_row(last_fight):
+    my_card, opponent_card = last_fight
+    return _PREV_ROWS + card_index(my_card) * PREV_BASE + card_index(opponent_card)
+
+
+def _fight_value(observation, my_card, opponent_card):
+    ''' Points one fight wins me (or loses me, if negative), counting a game win as _GAME_VALUE
+    '''
+    color = observation.color
+    last_card, last_opponent_card = observation.last_fight
+    if color == Color.red:
+        result = observation.rules.fight_result(my_card, opponent_card, last_card, last_opponent_card)
+    else:
+        result = observation.rules.fight_result(opponent_card, my_card, last_opponent_card, last_card)
+    if result == FightResult.on_hold:
+        return 0
+    if result == _MY_GAME_WIN[color]:
+        return _GAME_VALUE
+    if result in _MY_WINS[color]:
+        points = _MY_WINS[color][result] + observation.on_hold_points
+        return _GAME_VALUE if observation.points + points >= POINTS_TO_WIN else points
+    opponent_color = Color.blue if color == Color.red else Color.red
+    if result == _MY_GAME_WIN[opponent_color]:
+        return -_GAME_VALUE
+    points = _MY_WINS[opponent_color][result] + observation.on_hold_points
+    return -_GAME_VALUE if observation.opponent_points + points >= POINTS_TO_WIN else -points
+
+
+# Environment variable naming the directory opponent_model_brain_fn saves its models in, eg. set with
+# --opponent-models. It's read when each match starts, so it reaches brains in worker processes too.
+MODELS_DIR_ENV = 'BRAVE_RATS_OPPONENT_MODELS'
+
+
+def make_opponent_model_brain(models_dir=None, models_dir_env=None):
+    ''' Makes a brain that learns which cards its opponent plays, by turn and after each previous fight, and plays the
+    card with the best expected result in the current fight against those odds. Counts are only updated when a game
+    is over, a fixed amount of work per game.
+    play_match tells the brain its opponent's name when a match starts (see brain_management.notify_new_match), and
+    the brain switches to a model of that opponent. In memory, that's a new model for every match, so a match plays
+    the same however many matches the process has played before it, eg. whichever tournament worker plays it. Saved
+    models are loaded and added to instead, so results then depend on what's been learned before.
+    :param models_dir: directory to save a model per opponent in, kept between runs and shared by every process using
+        it; None keeps models in memory
+    :param models_dir_env: environment variable to read models_dir from when a match starts, when models_dir is None
+    '''
+    # The current opponent's model. Games played outside of a match all count towards one model in memory.
+    model = [OpponentModel()]
+
+    def new_match(opponent_name):
+        directory = models_dir or (os.environ.get(models_dir_env) if models_dir_env else None)
+        model[0] = OpponentModel(os.path.join(directory, '{}.npy'.format(opponent_name)) if directory else None)
+
+    def opponent_model_brain_fn(player, game, spied_card):
+        observation = observe(player, game, spied_card)
+        if observation.is_over:
+            model[0].learn(observation.fights)
+            return None
+
+        if spied_card is not None:
+            odds = [(int(spied_card), 1.0)]
+        else:
+            counts = model[0].counts
+            opponent_cards = [card for card in range(NUM_CARDS) if observation.opponent_hand_mask & (1 << card)]
+            # One extra count for every card, so cards never seen yet are still expected now and then
+            card_counts = (counts[len(observation.fights), opponent_cards]
+                           + counts[_prev_row(observation.last_fight), opponent_cards] + 1)
+            odds = zip(opponent_cards, card_counts / float(card_counts.sum()))
+
+        best_cards, best_value = [], None
+        for my_card in observation.hand:
+            value = sum(probability * _fight_value(observation, my_card, _CARDS[opponent_card])
+                        for opponent_card, probability in odds)
+            if best_value is None or value > best_value + 1e-9:
+                best_cards, best_value = [my_card], value
+            elif value > best_value - 1e-9:
+                best_cards.append(my_card)
+        return random.choice(best_cards)
+
+    opponent_model_brain_fn.new_match = new_match
+    return opponent_model_brain_fn
+
+
+opponent_model_brain_fn = make_opponent_model_brain(models_dir_env=MODELS_DIR_ENV)
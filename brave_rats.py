@@ -1,32 +1,48 @@
 import argparse
 from collections import Counter
-import sys
+from functools import partial
+import os
 
 from brains.example_ai import random_ai_brain_fn
 from brains.human import human_brain_fn
+from brains.opponent_model_ai import MODELS_DIR_ENV
 from components.cards import Color
-from components.fight import resolve_fight, successful_spy_color
-from components.brain_management import get_brain_func
+from components.fight import resolve_fight
+from components.brain_management import get_brain_func, notify_new_match, unprefixed_name
+from components.brain_workers import play_match_in_workers
+from components.determinism import decision_cache, deterministic, is_deterministic, probe_deterministic
+from components.early_stopping import STOPPING_RULES
+from components.events import NULL_LISTENER, ConsoleListener, JsonlListener, ListenerGroup
+from components.game_records import GameRecordWriter
 from components.game_status import GameStatus
+from components.latency import BrainTimer, MoveTimeout, TIMEOUT_POLICIES
 from components.player import Player
-from components.style import blueify, redify
+from components.rules import VANILLA, VARIANTS
 
 
-def _get_played_cards(red_player, blue_player, game):
-    spy_color = successful_spy_color(game.most_recent_fight)
+def _get_played_cards(red_player, blue_player, game, listener):
+    spy_color = game.rules.spy_color(game.most_recent_fight)
     if spy_color == Color.red:
         # Red gets to peek at Blue's card
         blue_card = blue_player.choose_and_play_card(game)
+        listener.spy_revealed(game, spy_color, blue_card)
         red_card = red_player.choose_and_play_card(game, blue_card)
     elif spy_color == Color.blue:
         # Blue gets to peek at Red's card
         red_card = red_player.choose_and_play_card(game)
+        listener.spy_revealed(game, spy_color, red_card)
         blue_card = blue_player.choose_and_play_card(game, red_card)
     else:
         red_card, blue_card = red_player.choose_and_play_card(game), blue_player.choose_and_play_card(game)
     return red_card, blue_card
 
 
+def _brain_name(brain_fn):
+    ''' Unprefixed name of a brain function, or its repr if it has no name (eg. a functools.partial)
+    '''
+    return unprefixed_name(brain_fn) if hasattr(brain_fn, '__name__') else repr(brain_fn)
+
+
 def _notify_game_over(red_player, blue_player, game):
     red_player.notify_game_over(game)
     blue_player.notify_game_over(game)
@@ -34,35 +50,37 @@ def _notify_game_over(red_player, blue_player, game):
 
 def play_game(red_brain_fn=random_ai_brain_fn, blue_brain_fn=human_brain_fn,
               initial_red_hand_str=None, initial_blue_hand_str=None,
-              verbose=True):
-    game = GameStatus()
-    red_player = Player(Color.red, brain_fn=red_brain_fn, hand_str=initial_red_hand_str)
-    blue_player = Player(Color.blue, brain_fn=blue_brain_fn, hand_str=initial_blue_hand_str)
-    game.initial_hands={'red':initial_red_hand_str,'blue':initial_blue_hand_str}
+              listener=None, red_timer=None, blue_timer=None, rules=VANILLA):
+    '''
+    :param listener: optional GameListener told about the game as it's played, eg. a ConsoleListener to print it
+    '''
+    listener = listener or NULL_LISTENER
+    game = GameStatus(initial_red_hand_str, initial_blue_hand_str, rules)
+    red_player = Player(Color.red, brain_fn=red_brain_fn, hand_str=initial_red_hand_str, timer=red_timer)
+    blue_player = Player(Color.blue, brain_fn=blue_brain_fn, hand_str=initial_blue_hand_str, timer=blue_timer)
+    listener.game_started(game)
     while not game.is_over:
-        red_card, blue_card = _get_played_cards(red_player, blue_player, game)
+        try:
+            red_card, blue_card = _get_played_cards(red_player, blue_player, game, listener)
+        except MoveTimeout as timeout:
+            game.forfeit(timeout.color)
+            listener.move_timed_out(game, timeout)
+            break
         result = resolve_fight(red_card, blue_card, game)
-        if verbose:
-            result_string = 'red {} vs. blue {} -> {}'
-            print result_string.format(redify(red_card.name),
-                                       blueify(blue_card.name),
-                                       result.name)
-            print game.score_summary
+        listener.fight_resolved(game, red_card, blue_card, result)
 
     # Game's over when while loop exits
     _notify_game_over(red_player, blue_player, game)
-
-    if verbose:
-        if game.winner:
-            print game.winner.name.title(), 'wins!'
-        else:
-            print 'tie!'
-        print  # extra newline for readability
+    listener.game_over(game)
 
     return game
 
 
-def print_match_summary(games):
+def print_match_summary(games, stop_rule=None, timers=()):
+    '''
+    :param stop_rule: the StoppingRule passed to play_match, if any, to report why the match stopped
+    :param timers: BrainTimers passed to play_match, to report brain latencies
+    '''
     winners = [game.winner for game in games]
     print "Total wins for each player:"
     win_counter = Counter(winners)
@@ -71,28 +89,126 @@ def print_match_summary(games):
             print "{} ties".format(wins)
         else:
             print "{} won {} times".format(player.name, wins)
+    if stop_rule:
+        print "Stopped after {} games: {}".format(stop_rule.games_played, stop_rule.reason)
+    for timer in timers:
+        if timer:
+            print timer.summary()
+
+
+def _replay_game(game, listener):
+    ''' Plays a finished game's fights again on a new GameStatus, without asking the brains, and sends the listener
+    the same events as playing it did
+    '''
+    replay = GameStatus(game.initial_hands['red'], game.initial_hands['blue'], game.rules)
+    listener.game_started(replay)
+    for red_card, blue_card in game.all_fights:
+        spy_color = replay.rules.spy_color(replay.most_recent_fight)
+        if spy_color is not None:
+            listener.spy_revealed(replay, spy_color, blue_card if spy_color == Color.red else red_card)
+        result = resolve_fight(red_card, blue_card, replay)
+        listener.fight_resolved(replay, red_card, blue_card, result)
+    listener.game_over(replay)
+    return replay
+
+
+def _repeat_game(num_games, play_game_fn, listener):
+    ''' Yields num_games games that play the same as the one play_game_fn plays, only calling it once
+    '''
+    if num_games:
+        game = play_game_fn()
+        yield game
+        for game_index in range(num_games - 1):
+            yield _replay_game(game, listener)
+
+
+def _has_move_time_budget(*timers):
+    return any(timer and timer.move_time_budget is not None for timer in timers)
 
 
 def play_match(red_brain_fn=human_brain_fn, blue_brain_fn=random_ai_brain_fn,
-               num_games=1, verbose=True, quiet_games=True,
-               initial_red_hand_str=None, initial_blue_hand_str=None):
-    if verbose:
-        sys.stdout.write('\n')
-    for game_index in range(num_games):
-        game = play_game(
-            red_brain_fn=red_brain_fn,
-            blue_brain_fn=blue_brain_fn,
-            verbose=not quiet_games,
+               num_games=1, listener=None,
+               initial_red_hand_str=None, initial_blue_hand_str=None, record_writer=None,
+               stop_rule=None, red_timer=None, blue_timer=None,
+               isolate_brains=False, concurrency=256, worker_timeout=None, rules=VANILLA):
+    '''
+    :param num_games: number of games to play, or the maximum number if there's a stop_rule
+    :param listener: optional GameListener told about the match and its games. Games played with
+        isolate_brains only send match events (match_started, match_progress and match_over).
+    :param record_writer: optional GameRecordWriter that each finished game is written to
+    :param stop_rule: optional StoppingRule; the match ends as soon as it reaches a decision
+    :param red_timer: optional BrainTimer to time red's brain and enforce its move time budget
+    :param blue_timer: same as red_timer, for blue's brain
+    :param isolate_brains: if True, run each brain in its own worker process (see play_match_in_workers),
+        playing `concurrency` games at once. Timers aren't used in this mode.
+    :param worker_timeout: with isolate_brains, max seconds a worker may take to answer a batch of moves
+    :param rules: RuleSet to play with; brains in worker processes only play the vanilla rules
+
+    Brains are told their opponent's name before the first game (see brain_management.notify_new_match).
+
+    Brains declared with determinism.deterministic have their decisions cached (see determinism.decision_cache).
+    When both brains are deterministic, the match's game is only played once; the other games replay its fights on
+    new GameStatus objects, sending the listener the same events, without asking the brains. Timers then only see the
+    game that was played. Neither happens with isolate_brains, or when a timer has a move time budget to enforce.
+    '''
+    if isolate_brains and rules is not VANILLA:
+        raise ValueError('Isolated brains can only play the vanilla rules')
+    if listener:
+        listener.match_started(_brain_name(red_brain_fn), _brain_name(blue_brain_fn))
+    listener = listener or NULL_LISTENER
+    if not isolate_brains:
+        notify_new_match(red_brain_fn, _brain_name(blue_brain_fn))
+        notify_new_match(blue_brain_fn, _brain_name(red_brain_fn))
+    if isolate_brains:
+        games = play_match_in_workers(
+            unprefixed_name(red_brain_fn), unprefixed_name(blue_brain_fn), num_games=num_games,
+            initial_red_hand_str=initial_red_hand_str, initial_blue_hand_str=initial_blue_hand_str,
+            concurrency=concurrency, timeout=worker_timeout,
+        )
+    elif (not _has_move_time_budget(red_timer, blue_timer)
+          and is_deterministic(red_brain_fn) and is_deterministic(blue_brain_fn)):
+        # Every game would be the same as the first
+        games = _repeat_game(num_games, partial(
+            play_game,
+            red_brain_fn=decision_cache(red_brain_fn),
+            blue_brain_fn=decision_cache(blue_brain_fn),
+            listener=listener,
             initial_red_hand_str=initial_red_hand_str,
-            initial_blue_hand_str=initial_blue_hand_str
+            initial_blue_hand_str=initial_blue_hand_str,
+            red_timer=red_timer,
+            blue_timer=blue_timer,
+            rules=rules,
+        ), listener)
+    else:
+        if not _has_move_time_budget(red_timer, blue_timer):
+            red_brain_fn = decision_cache(red_brain_fn) if is_deterministic(red_brain_fn) else red_brain_fn
+            blue_brain_fn = decision_cache(blue_brain_fn) if is_deterministic(blue_brain_fn) else blue_brain_fn
+        games = (
+            play_game(
+                red_brain_fn=red_brain_fn,
+                blue_brain_fn=blue_brain_fn,
+                listener=listener,
+                initial_red_hand_str=initial_red_hand_str,
+                initial_blue_hand_str=initial_blue_hand_str,
+                red_timer=red_timer,
+                blue_timer=blue_timer,
+                rules=rules,
+            )
+            for game_index in range(num_games)
         )
-        if quiet_games and verbose:
-            # Games are quiet, so print some stuff at this level
-            sys.stdout.write(getattr(game.winner, 'name', 'tie')[0])
+    for game in games:
+        listener.match_progress(game)
+        if record_writer:
+            record_writer.write(game)
         yield game
+        if stop_rule and stop_rule.update(game.winner):
+            games.close()
+            break
+    else:
+        if stop_rule:
+            stop_rule.reached_max_games()
 
-    if verbose:
-        sys.stdout.write('\n')
+    listener.match_over()
 
 
 def args_from_match_parser():
@@ -106,19 +222,84 @@ def args_from_match_parser():
     parser.add_argument('-n', '--num-games', type=int, help='Number of games to play in this match')
     parser.add_argument('-q', '--quiet-games', action='store_true', default=False,
                         help='Set to have only game results (not turn-by-turn details) printed to stdout')
+    parser.add_argument('--event-log', help='Append every game event to this file, as JSON lines')
     parser.add_argument('-rh', '--initial_red_hand_str', help='Initial red hand as string')
     parser.add_argument('-bh', '--initial_blue_hand_str', help='Initial blue hand as string')
+    parser.add_argument('--record-file', help='Write a binary record of every game to this file')
+    parser.add_argument('--early-stop', choices=sorted(STOPPING_RULES),
+                        help='Stop the match once this test separates the brains; --num-games is then the maximum')
+    parser.add_argument('--time-brains', action='store_true', default=False,
+                        help='Report how long each brain takes to choose its cards')
+    parser.add_argument('--move-time-budget', type=float,
+                        help='Max seconds a brain may take to choose a card (implies --time-brains)')
+    parser.add_argument('--on-timeout', choices=TIMEOUT_POLICIES, default=TIMEOUT_POLICIES[0],
+                        help='What happens to a brain that goes over its move time budget')
+    parser.add_argument('--isolate-brains', action='store_true', default=False,
+                        help='Run each brain in its own worker process, playing many games at once')
+    parser.add_argument('--concurrency', type=int, help='Number of games played at once with --isolate-brains')
+    parser.add_argument('--worker-timeout', type=float,
+                        help='Max seconds a brain worker may take to answer a batch of moves')
+    parser.add_argument('--rules', choices=sorted(VARIANTS), help='Rule variant to play')
+    parser.add_argument('--opponent-models', metavar='DIR',
+                        help='Directory opponent_model saves what it learns about each opponent in, between runs')
+    parser.add_argument('--probe-determinism', action='store_true', default=False,
+                        help="Test whether brains that aren't declared deterministic behave deterministically, "
+                             "and treat them as deterministic if they do")
     args = vars(parser.parse_args())  # Convert the Namespace to a dict
     args = {k:v for k,v in args.items() if v is not None}  # Remove None values
 
+    if 'opponent_models' in args:
+        # Read by the brain when a match starts, also in worker processes
+        os.environ[MODELS_DIR_ENV] = args.pop('opponent_models')
     # Look up brains by name
     if 'red_brain' in args:
         args['red_brain_fn'] = get_brain_func(args.pop('red_brain'))
     if 'blue_brain' in args:
         args['blue_brain_fn'] = get_brain_func(args.pop('blue_brain'))
+    if 'rules' in args:
+        args['rules'] = VARIANTS[args['rules']]
+    if args.pop('probe_determinism'):
+        for color, default_brain_fn in (('red', human_brain_fn), ('blue', random_ai_brain_fn)):
+            brain_fn = args.get('{}_brain_fn'.format(color), default_brain_fn)
+            if brain_fn is not human_brain_fn and not is_deterministic(brain_fn) and probe_deterministic(brain_fn):
+                print '{} looks deterministic'.format(unprefixed_name(brain_fn))
+                deterministic(brain_fn)
+    listener = ConsoleListener(quiet_games=args.pop('quiet_games'))
+    if 'event_log' in args:
+        listener = ListenerGroup([listener, JsonlListener(args.pop('event_log'))])
+    args['listener'] = listener
+    if 'early_stop' in args:
+        args['stop_rule'] = STOPPING_RULES[args.pop('early_stop')]()
+
+    time_brains = args.pop('time_brains')
+    move_time_budget = args.pop('move_time_budget', None)
+    on_timeout = args.pop('on_timeout')
+    if time_brains or move_time_budget is not None:
+        for color, default_brain_fn in (('red', human_brain_fn), ('blue', random_ai_brain_fn)):
+            brain_fn = args.get('{}_brain_fn'.format(color), default_brain_fn)
+            args['{}_timer'.format(color)] = BrainTimer(
+                '{} {}'.format(color, unprefixed_name(brain_fn)), move_time_budget, on_timeout
+            )
     return args
 
 
 if __name__ == '__main__':
-    games = play_match(**args_from_match_parser())
-    print_match_summary(games)
\ No newline at end of file
+    args = args_from_match_parser()
+    record_file = args.pop('record_file', None)
+    if record_file:
+        with GameRecordWriter(
+            record_file,
+            red_brain_name=unprefixed_name(args.get('red_brain_fn', human_brain_fn)),
+            blue_brain_name=unprefixed_name(args.get('blue_brain_fn', random_ai_brain_fn)),
+            initial_red_hand_str=args.get('initial_red_hand_str'),
+            initial_blue_hand_str=args.get('initial_blue_hand_str'),
+        ) as record_writer:
+            print_match_summary(play_match(record_writer=record_writer, **args), args.get('stop_rule'),
+                                (args.get('red_timer'), args.get('blue_timer')))
+    else:
+        games = play_match(**args)
+        print_match_summary(games, args.get('stop_rule'), (args.get('red_timer'), args.get('blue_timer')))
+    args['listener'].close()
+    for brain_fn in {args.get('red_brain_fn', human_brain_fn), args.get('blue_brain_fn', random_ai_brain_fn)}:
+        if is_deterministic(brain_fn):
+            print decision_cache(brain_fn).summary()
\ No newline at end of file
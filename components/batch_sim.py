@@ -0,0 +1,152 @@
+from collections import namedtuple
+
+import numpy as np
+
+from components.cards import Card, Color
+from components.compact_game import (FIGHT_TABLE, FULL_HAND, HAND_CARDS, NO_CARD, NUM_CARDS, PREV_BASE,
+                                     PRINCESS_POINTS, SPY_TABLE)
+from components.fight import FightResult
+from components.game_status import MAX_ROUNDS_IN_GAME, POINTS_TO_WIN
+from components.player import CheatingException
+
+# Passed to policies in place of a spied card when there's nothing to peek at
+NO_SPIED_CARD = -1
+
+# Winner codes in simulate_batch output
+TIE, RED, BLUE = 0, int(Color.red), int(Color.blue)
+
+# FightResult value for each (red_card, blue_card, prev_red, prev_blue); NO_CARD indexes "no previous card"
+FIGHT_TENSOR = np.array(FIGHT_TABLE, dtype=np.int8).reshape(NUM_CARDS, NUM_CARDS, PREV_BASE, PREV_BASE)
+
+# Color value of the successful spy (0 for none) for each (prev_red, prev_blue)
+SPY_TENSOR = np.array([int(color or 0) for color in SPY_TABLE], dtype=np.int8).reshape(PREV_BASE, PREV_BASE)
+
+# Number of cards in each hand mask, and the cards themselves (padded with NO_CARD)
+HAND_SIZE = np.array([len(cards) for cards in HAND_CARDS], dtype=np.int8)
+HAND_CARD_TABLE = np.array(
+    [cards + (NO_CARD,) * (NUM_CARDS - len(cards)) for cards in HAND_CARDS],
+    dtype=np.int8
+)
+
+
+def _gain_table(wins, wins_2, wins_game):
+    table = np.zeros(len(FightResult) + 1, dtype=np.int32)
+    table[wins], table[wins_2], table[wins_game] = 1, 2, PRINCESS_POINTS
+    return table
+
+
+# Points gained for each FightResult value, not counting points on hold
+RED_GAIN = _gain_table(FightResult.red_wins, FightResult.red_wins_2, FightResult.red_wins_game)
+BLUE_GAIN = _gain_table(FightResult.blue_wins, FightResult.blue_wins_2, FightResult.blue_wins_game)
+
+BatchResult = namedtuple('BatchResult', 'red_wins ties blue_wins')
+
+
+def random_policy(hands, spied_cards, rng):
+    ''' Vectorized equivalent of random_ai_brain_fn.
+    A policy takes an array of hand masks, an array of spied cards (NO_SPIED_CARD where there's no spy reveal)
+    and a numpy RandomState, and returns an array with one card from each hand.
+    '''
+    picks = (rng.random_sample(len(hands)) * HAND_SIZE[hands]).astype(np.intp)
+    return HAND_CARD_TABLE[hands, picks]
+
+
+def fixed_order_policy(card_order):
+    ''' Makes a policy that always plays the first card of card_order that is still in hand
+    :param card_order: sequence of all cards (Card values or ints), in order of preference
+    '''
+    card_order = [int(card) for card in card_order]
+    first_in_hand = np.array(
+        [next((card for card in card_order if mask & (1 << card)), NO_CARD) for mask in range(FULL_HAND + 1)],
+        dtype=np.int8
+    )
+
+    def policy(hands, spied_cards, rng):
+        return first_in_hand[hands]
+    return policy
+
+
+def _choose(policy, hands, spied_cards, rng):
+    cards = np.asarray(policy(hands, spied_cards, rng), dtype=np.int8)
+    if np.any(cards >= NUM_CARDS) or np.any((hands >> cards.clip(0, NUM_CARDS - 1)) & 1 == 0):
+        raise CheatingException('Policy {} tried to play cards which are not in hand'.format(policy))
+    return cards
+
+
+def simulate_batch(red_policy, blue_policy, num_games, red_hand=FULL_HAND, blue_hand=FULL_HAND, rng=None):
+    ''' Plays num_games games in lockstep, one fight of every unfinished game per step.
+    :param red_policy: vectorized policy for the red player; see random_policy
+    :param blue_policy: vectorized policy for the blue player
+    :param red_hand: hand mask of red's initial hand
+    :param blue_hand: hand mask of blue's initial hand
+    :param rng: numpy RandomState passed to the policies
+    :return: int8 array of winners (TIE, RED or BLUE), one per game
+    '''
+    rng = rng or np.random.RandomState()
+    red_hands = np.full(num_games, red_hand, dtype=np.uint8)
+    blue_hands = np.full(num_games, blue_hand, dtype=np.uint8)
+    red_points = np.zeros(num_games, dtype=np.int32)
+    blue_points = np.zeros(num_games, dtype=np.int32)
+    prev_red = np.full(num_games, NO_CARD, dtype=np.int8)
+    prev_blue = np.full(num_games, NO_CARD, dtype=np.int8)
+    on_hold_points = np.zeros(num_games, dtype=np.int32)
+    active = np.full(num_games, bool(red_hand and blue_hand))
+
+    for _ in range(MAX_ROUNDS_IN_GAME):
+        games = np.flatnonzero(active)
+        if not len(games):
+            break
+        hands_r, hands_b = red_hands[games], blue_hands[games]
+        spy = SPY_TENSOR[prev_red[games], prev_blue[games]]
+        red_cards = np.empty(len(games), dtype=np.int8)
+        blue_cards = np.empty(len(games), dtype=np.int8)
+
+        # Players that aren't peeking choose first; a spy's revealed opponent is among them
+        red_peeks, blue_peeks = spy == RED, spy == BLUE
+        for peeks, hands, cards, policy in ((red_peeks, hands_r, red_cards, red_policy),
+                                            (blue_peeks, hands_b, blue_cards, blue_policy)):
+            first = ~peeks
+            if first.any():
+                no_spied = np.full(np.count_nonzero(first), NO_SPIED_CARD, dtype=np.int8)
+                cards[first] = _choose(policy, hands[first], no_spied, rng)
+        if red_peeks.any():
+            red_cards[red_peeks] = _choose(red_policy, hands_r[red_peeks], blue_cards[red_peeks], rng)
+        if blue_peeks.any():
+            blue_cards[blue_peeks] = _choose(blue_policy, hands_b[blue_peeks], red_cards[blue_peeks], rng)
+
+        results = FIGHT_TENSOR[red_cards, blue_cards, prev_red[games], prev_blue[games]]
+        on_hold = on_hold_points[games]
+        red_gain, blue_gain = RED_GAIN[results], BLUE_GAIN[results]
+        red_points[games] += np.where(red_gain > 0, red_gain + on_hold, 0)
+        blue_points[games] += np.where(blue_gain > 0, blue_gain + on_hold, 0)
+        both_ambassadors = (red_cards == Card.ambassador) & (blue_cards == Card.ambassador)
+        on_hold_points[games] = np.where(
+            results == FightResult.on_hold, on_hold + 1 + both_ambassadors, 0
+        )
+
+        red_hands[games] = hands_r ^ (np.uint8(1) << red_cards.astype(np.uint8))
+        blue_hands[games] = hands_b ^ (np.uint8(1) << blue_cards.astype(np.uint8))
+        prev_red[games], prev_blue[games] = red_cards, blue_cards
+        active[games] = (
+            (red_points[games] < POINTS_TO_WIN) & (blue_points[games] < POINTS_TO_WIN)
+            & (red_hands[games] != 0) & (blue_hands[games] != 0)
+        )
+
+    winners = np.full(num_games, TIE, dtype=np.int8)
+    winners[blue_points >= POINTS_TO_WIN] = BLUE
+    winners[red_points >= POINTS_TO_WIN] = RED
+    return winners
+
+
+def simulate(red_policy=random_policy, blue_policy=random_policy, num_games=10 ** 6,
+             red_hand=FULL_HAND, blue_hand=FULL_HAND, seed=None, batch_size=2 ** 20):
+    ''' Plays num_games games with simulate_batch, batch_size games at a time to bound memory use
+    :return: a BatchResult of win and tie counts
+    '''
+    rng = np.random.RandomState(seed)
+    counts = np.zeros(3, dtype=np.int64)
+    for start in range(0, num_games, batch_size):
+        winners = simulate_batch(red_policy, blue_policy, min(batch_size, num_games - start),
+                                 red_hand=red_hand, blue_hand=blue_hand, rng=rng)
+        counts += np.bincount(winners, minlength=3)
+    return BatchResult(red_wins=int(counts[RED]), ties=int(counts[TIE]), blue_wins=int(counts[BLUE]))
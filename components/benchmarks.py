@@ -0,0 +1,247 @@
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from timeit import default_timer
+
+from brains.example_ai import random_ai_brain_fn
+from components.brain_management import BrainRegistry
+from components.cards import Card, initial_hand
+from components.fight import fight_result, resolve_fight
+from components.game_status import GameStatus
+from components.rules import VANILLA
+
+RESULTS_VERSION = 1
+
+# Percentiles reported for each scenario of the average time per unit in each batch. Single calls aren't timed, since
+# many take less time than reading the clock.
+PERCENTILES = (50, 90, 99)
+
+# A scenario is slower than its baseline when its rate drops by more than this fraction. Runs on a busy machine
+# can differ by 10% or more with no code change.
+DEFAULT_THRESHOLD = 0.2
+
+_CARDS = list(Card)
+_CARDS_OR_NONE = _CARDS + [None]
+
+RESOLVE_FIGHT_BATCHES = 200
+
+
+class Scenario(object):
+    ''' A benchmark. setup_fn is called once with a seeded random.Random and a scratch directory, which is removed
+    after the scenario runs, and returns a function that does units_per_batch units of work (calls, games...) each
+    time it's called. Only that function is timed.
+    '''
+    def __init__(self, name, unit, units_per_batch, batches, setup_fn):
+        '''
+        :param unit: what's counted, eg. 'calls' or 'games'
+        :param batches: number of timed batches; latency percentiles are over batches, not single units
+        '''
+        self.name = name
+        self.unit = unit
+        self.units_per_batch = units_per_batch
+        self.batches = batches
+        self.setup_fn = setup_fn
+
+
+def _random_fights(rng, count):
+    return [
+        (rng.choice(_CARDS), rng.choice(_CARDS), rng.choice(_CARDS_OR_NONE), rng.choice(_CARDS_OR_NONE))
+        for _ in range(count)
+    ]
+
+
+def _setup_fight_result(rng, temp_dir):
+    fights = _random_fights(rng, 1000)
+
+    def batch():
+        for red_card, blue_card, prev_red_card, prev_blue_card in fights:
+            fight_result(red_card, blue_card, prev_red_card, prev_blue_card)
+    return batch
+
+
+def _setup_quick_fight_result(rng, temp_dir):
+    # The lookup fight.resolve_fight used before the rules were compiled into tables: a dict of every fight, keyed by
+    # (red card, blue card, previous red card, previous blue card). Kept as a baseline for fight_result.
+    quick_fight_result = {
+        (red_card, blue_card, prev_red_card, prev_blue_card):
+            VANILLA.fight_result(red_card, blue_card, prev_red_card, prev_blue_card)
+        for red_card in _CARDS
+        for blue_card in _CARDS
+        for prev_red_card in _CARDS_OR_NONE
+        for prev_blue_card in _CARDS_OR_NONE
+    }
+    fights = _random_fights(rng, 1000)
+
+    def batch():
+        for fight in fights:
+            quick_fight_result[fight]
+    return batch
+
+
+def _setup_resolve_fight(rng, temp_dir):
+    # 100 games' worth of fights, each game a shuffle of both full hands
+    orders = []
+    for _ in range(100):
+        red_hand, blue_hand = initial_hand(), initial_hand()
+        rng.shuffle(red_hand)
+        rng.shuffle(blue_hand)
+        orders.append(zip(red_hand, blue_hand))
+    # New games for every batch (and the warm up), made here so that making them isn't timed
+    batches_of_games = [[GameStatus() for _ in orders] for _ in range(RESOLVE_FIGHT_BATCHES + 1)]
+
+    def batch():
+        for game, fights in zip(batches_of_games.pop(), orders):
+            for red_card, blue_card in fights:
+                resolve_fight(red_card, blue_card, game)
+    return batch
+
+
+def _setup_play_game(rng, temp_dir):
+    from brave_rats import play_game
+
+    def batch():
+        for _ in range(100):
+            play_game(random_ai_brain_fn, random_ai_brain_fn)
+    return batch
+
+
+def _setup_play_match(rng, temp_dir):
+    from brave_rats import play_match
+
+    def batch():
+        for _ in play_match(random_ai_brain_fn, random_ai_brain_fn, num_games=10000):
+            pass
+    return batch
+
+
+def _brains_root():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Scans and imports every brain module in a new process, as a fresh command line run does
+_DISCOVER_BRAINS_SCRIPT = '''
+import sys
+from components.brain_management import BrainRegistry
+BrainRegistry(sys.argv[1], sys.argv[2]).all_brains()
+'''
+
+
+def _setup_discover_brains_cold(rng, temp_dir):
+    manifest_path = os.path.join(temp_dir, 'manifest.json')
+    command = [sys.executable, '-c', _DISCOVER_BRAINS_SCRIPT, _brains_root(), manifest_path]
+
+    def batch():
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        subprocess.check_call(command, cwd=_brains_root())
+    return batch
+
+
+def _setup_discover_brains_warm(rng, temp_dir):
+    manifest_path = os.path.join(temp_dir, 'manifest.json')
+    BrainRegistry(_brains_root(), manifest_path).all_brains()
+
+    def batch():
+        BrainRegistry(_brains_root(), manifest_path).all_brains()
+    return batch
+
+
+SCENARIOS = [
+    Scenario('fight_result', 'calls', 1000, 200, _setup_fight_result),
+    Scenario('quick_fight_result', 'calls', 1000, 200, _setup_quick_fight_result),
+    Scenario('resolve_fight', 'calls', 800, RESOLVE_FIGHT_BATCHES, _setup_resolve_fight),
+    Scenario('play_game', 'games', 100, 30, _setup_play_game),
+    Scenario('play_match_10k', 'games', 10000, 3, _setup_play_match),
+    # A new process with no manifest, so interpreter start up, the source scan and brain imports are all timed
+    Scenario('discover_brains_cold', 'runs', 1, 10, _setup_discover_brains_cold),
+    # In this process, with brain modules already imported and an up to date manifest
+    Scenario('discover_brains_warm', 'calls', 1, 30, _setup_discover_brains_warm),
+]
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def _percentile(sorted_values, percent):
+    return sorted_values[min(int(len(sorted_values) * percent / 100.0), len(sorted_values) - 1)]
+
+
+def run_scenario(scenario, seed=0):
+    ''' :return: dict of the scenario's rate (units per second) and percentiles over batches of the average time per
+    unit in each batch (seconds). The rate is taken from the fastest batch: other batches are slowed by whatever else
+    the machine is doing, so the fastest one is the most repeatable between runs, as with timeit.
+    '''
+    random.seed(seed)  # for brains, which use the random module
+    temp_dir = tempfile.mkdtemp()
+    try:
+        batch = scenario.setup_fn(random.Random(seed), temp_dir)
+        batch()  # warm up
+        latencies = []
+        for _ in range(scenario.batches):
+            start = default_timer()
+            batch()
+            latencies.append((default_timer() - start) / scenario.units_per_batch)
+    finally:
+        shutil.rmtree(temp_dir)
+    latencies.sort()
+    return {
+        'unit': scenario.unit,
+        'rate': 1 / latencies[0],
+        'batch_latency': {str(percent): _percentile(latencies, percent) for percent in PERCENTILES},
+    }
+
+
+def _git_commit():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=_brains_root(),
+                                           stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(scenario_names=None, seed=0, progress_fn=None):
+    '''
+    :param scenario_names: names of the scenarios to run; defaults to all of them
+    :param progress_fn: optional function called with (scenario name, result) as scenarios finish
+    :return: dict of results, ready to be saved as JSON
+    '''
+    results = {}
+    for name in scenario_names or [scenario.name for scenario in SCENARIOS]:
+        results[name] = run_scenario(SCENARIOS_BY_NAME[name], seed)
+        if progress_fn:
+            progress_fn(name, results[name])
+    return {
+        'version': RESULTS_VERSION,
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'seed': seed,
+        'scenarios': results,
+    }
+
+
+def save_results(results, path):
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'w') as results_file:
+        json.dump(results, results_file, indent=1, sort_keys=True)
+    os.rename(temp_path, path)
+
+
+def load_results(path):
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    ''' Compares the rates of scenarios found in both results
+    :return: list of (scenario name, baseline rate, current rate, change as a fraction, True if it regressed)
+    '''
+    rows = []
+    for name in sorted(set(baseline['scenarios']) & set(current['scenarios'])):
+        old_rate, new_rate = baseline['scenarios'][name]['rate'], current['scenarios'][name]['rate']
+        change = new_rate / old_rate - 1
+        rows.append((name, old_rate, new_rate, change, change < -threshold))
+    return rows
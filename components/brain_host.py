@@ -0,0 +1,48 @@
+from components.cards import Card
+from components.fight import resolve_fight
+from components.game_status import GameStatus
+from components.player import Player
+
+
+class BrainHost(object):
+    ''' Runs a brain function for many concurrent games whose engine lives elsewhere (another process or machine).
+    For each game, the host keeps a mirror Player and GameStatus, updated from the fights the engine reports, so
+    the brain sees the same objects it would in brave_rats.play_game. Cards go in and out as ints.
+    '''
+    def __init__(self, brain_fn):
+        self.brain_fn = brain_fn
+        self.games = {}  # {game id: (Player, GameStatus)}
+
+    def start_game(self, game_id, color, initial_red_hand_str=None, initial_blue_hand_str=None):
+        '''
+        :param color: Color the hosted brain plays in this game
+        '''
+        game = GameStatus(initial_red_hand_str, initial_blue_hand_str)
+        hand_str = game.initial_hands[color.name]
+        self.games[game_id] = (Player(color, brain_fn=self.brain_fn, hand_str=hand_str), game)
+
+    def choose(self, game_id, spied_card=None):
+        ''' Asks the brain for a card, and takes it out of the mirror player's hand
+        :param spied_card: int card revealed by the opponent, or None
+        :return: int card
+        '''
+        player, game = self.games[game_id]
+        spied_card = None if spied_card is None else Card(spied_card)
+        return int(player.choose_and_play_card(game, spied_card))
+
+    def record_fight(self, game_id, red_card, blue_card):
+        ''' Updates the mirror game with a fight played by the engine
+        '''
+        player, game = self.games[game_id]
+        resolve_fight(Card(red_card), Card(blue_card), game)
+
+    def end_game(self, game_id):
+        ''' Notifies the brain that the game is over and forgets the game
+        '''
+        player, game = self.games.pop(game_id)
+        player.notify_game_over(game)
+
+    def drop_game(self, game_id):
+        ''' Forgets a game without notifying the brain, eg. after the brain has crashed in it
+        '''
+        self.games.pop(game_id, None)
@@ -1,52 +1,186 @@
+import ast
 from collections import OrderedDict
-import pkgutil
+import importlib
+import json
+import os
+import sys
 
 # All brain functions are expected to have this suffix
 BRAIN_FN_SUFFIX = '_brain_fn'
 
+# Cache of which modules define which brains, kept in the brains root directory
+MANIFEST_FILENAME = '.brain_manifest.json'
+MANIFEST_VERSION = 1
+
 
 def unprefixed_name(fn):
     return fn.__name__[:-len(BRAIN_FN_SUFFIX)]
 
 
-def discover_brains(brains_root='.'):
-    ''' Finds brain functions (brain = a function with a name ending in "_brain_fn")
-    in discovered modules.
-    :param brains_root: root path passed to pkgutil.walk_packages to find packages
-    :return: OrderedDict of {unprefixed_name: brain functions}, sorted by name
+class BrainNotFound(Exception):
+    pass
+
+
+def _brain_names_in_source(source):
+    ''' Names of the brain functions defined or assigned at the top level of a module's source code
     '''
-    modules = [
-        loader.find_module(module_name).load_module(module_name)
-        for loader, module_name, is_pkg
-        in pkgutil.walk_packages(brains_root)
-    ]
+    names = []
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.FunctionDef):
+            targets = [node.name]
+        elif isinstance(node, ast.Assign):
+            targets = [target.id for target in node.targets if isinstance(target, ast.Name)]
+        else:
+            continue
+        names.extend(name for name in targets if name.endswith(BRAIN_FN_SUFFIX))
+    return names
 
-    brain_fns = [
-        fn
-        for module in modules
-        for name, fn in module.__dict__.items()
-        if callable(fn) and name.endswith(BRAIN_FN_SUFFIX)
-    ]
-    sorted_deduped_brains = sorted(set(brain_fns), key=unprefixed_name)
 
-    brain_fn_lookups = OrderedDict([
-        (unprefixed_name(fn), fn)
-        for fn in sorted_deduped_brains
-    ])
+class BrainRegistry(object):
+    ''' Finds brain functions without importing every module under the brains root.
+    Module sources are scanned (not imported) for top-level "*_brain_fn" definitions, and the results are
+    saved in a manifest keyed by module path and mtime, so only new or changed files are rescanned.
+    Modules are only imported when one of their brains is asked for.
+    '''
+    def __init__(self, brains_root='.', manifest_path=None):
+        self.brains_root = os.path.abspath(brains_root)
+        self.manifest_path = manifest_path or os.path.join(self.brains_root, MANIFEST_FILENAME)
+        self._modules = None  # {relative path: {'module': module name, 'mtime': mtime, 'brains': [names]}}
 
-    return brain_fn_lookups
+    def _module_files(self):
+        ''' Yields (relative path, module name) of every module pkgutil.walk_packages would find
+        '''
+        for dir_path, dir_names, file_names in os.walk(self.brains_root):
+            rel_dir = os.path.relpath(dir_path, self.brains_root)
+            package = [] if rel_dir == os.curdir else rel_dir.split(os.sep)
+            # Only descend into packages
+            dir_names[:] = sorted(
+                name for name in dir_names
+                if os.path.isfile(os.path.join(dir_path, name, '__init__.py'))
+            )
+            for file_name in sorted(file_names):
+                base, ext = os.path.splitext(file_name)
+                if ext != '.py':
+                    continue
+                module_parts = package if base == '__init__' else package + [base]
+                if module_parts:
+                    yield os.path.normpath(os.path.join(rel_dir, file_name)), '.'.join(module_parts)
 
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (IOError, ValueError):
+            return {}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest['modules']
 
-class BrainNotFound(Exception):
-    pass
+    def _save_manifest(self):
+        temp_path = '{}.{}.tmp'.format(self.manifest_path, os.getpid())
+        with open(temp_path, 'w') as manifest_file:
+            json.dump({'version': MANIFEST_VERSION, 'modules': self._modules}, manifest_file,
+                      indent=1, sort_keys=True)
+        os.rename(temp_path, self.manifest_path)
 
+    def refresh(self):
+        ''' Brings the manifest up to date, rescanning only files whose mtime has changed
+        '''
+        cached_modules = self._load_manifest()
+        modules = {}
+        for path, module_name in self._module_files():
+            mtime = os.path.getmtime(os.path.join(self.brains_root, path))
+            cached = cached_modules.get(path)
+            if cached and cached['mtime'] == mtime and cached['module'] == module_name:
+                modules[path] = cached
+                continue
+            with open(os.path.join(self.brains_root, path)) as module_file:
+                try:
+                    brain_names = _brain_names_in_source(module_file.read())
+                except SyntaxError:
+                    brain_names = []
+            modules[path] = {'module': module_name, 'mtime': mtime, 'brains': brain_names}
 
-def get_brain_func(fn_name):
-    all_brains = discover_brains()
-    try:
-        return all_brains[fn_name]
-    except KeyError:
-        raise BrainNotFound(
-            'Couldn\'t find brain by unprefixed name "{}". Valid options are: {}'
-            .format(fn_name, all_brains.keys())
+        self._modules = modules
+        if modules != cached_modules:
+            self._save_manifest()
+
+    def _brain_modules(self):
+        ''' :return: OrderedDict of {unprefixed brain name: module name}, sorted by name
+        '''
+        if self._modules is None:
+            self.refresh()
+        brain_modules = {}
+        for path in sorted(self._modules):
+            entry = self._modules[path]
+            for name in entry['brains']:
+                brain_modules.setdefault(str(name[:-len(BRAIN_FN_SUFFIX)]), str(entry['module']))
+        return OrderedDict(sorted(brain_modules.items()))
+
+    def brain_names(self):
+        return self._brain_modules().keys()
+
+    def _import_brain(self, name, module_name):
+        if self.brains_root not in sys.path:
+            sys.path.insert(0, self.brains_root)
+        return getattr(importlib.import_module(module_name), name + BRAIN_FN_SUFFIX)
+
+    def get(self, name):
+        ''' Imports only the module that defines the named brain
+        :param name: unprefixed brain name
+        :return: the brain function
+        '''
+        brain_modules = self._brain_modules()
+        if name not in brain_modules:
+            # The brain might be new since we last looked
+            self.refresh()
+            brain_modules = self._brain_modules()
+        try:
+            module_name = brain_modules[name]
+        except KeyError:
+            raise BrainNotFound(
+                'Couldn\'t find brain by unprefixed name "{}". Valid options are: {}'
+                .format(name, brain_modules.keys())
+            )
+        return self._import_brain(name, module_name)
+
+    def all_brains(self):
+        ''' Imports every module that defines a brain
+        :return: OrderedDict of {unprefixed_name: brain function}, sorted by name
+        '''
+        return OrderedDict(
+            (name, self._import_brain(name, module_name))
+            for name, module_name in self._brain_modules().iteritems()
         )
+
+
+_registries = {}
+
+
+def _registry(brains_root='.'):
+    brains_root = os.path.abspath(brains_root)
+    if brains_root not in _registries:
+        _registries[brains_root] = BrainRegistry(brains_root)
+    return _registries[brains_root]
+
+
+def discover_brains(brains_root='.'):
+    ''' Finds brain functions (brain = a function with a name ending in "_brain_fn")
+    in modules under brains_root, importing only the modules that define brains.
+    :param brains_root: root path to look for modules and packages in
+    :return: OrderedDict of {unprefixed_name: brain functions}, sorted by name
+    '''
+    return _registry(brains_root).all_brains()
+
+
+def get_brain_func(fn_name):
+    return _registry().get(fn_name)
+
+
+def notify_new_match(brain_fn, opponent_name):
+    ''' Tells a brain that a match against opponent_name is starting, if its function has a new_match attribute: a
+    function of the opponent's name, for brains that keep what they learn about each opponent
+    '''
+    new_match = getattr(brain_fn, 'new_match', None)
+    if new_match:
+        new_match(opponent_name)
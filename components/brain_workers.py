@@ -0,0 +1,250 @@
+from multiprocessing import Pipe, Process
+import traceback
+
+from components.brain_host import BrainHost
+from components.brain_management import get_brain_func, notify_new_match
+from components.cards import Card, Color, initial_hand
+from components.fight import resolve_fight, successful_spy_color
+from components.game_status import GameStatus
+
+# Messages to a worker are lists of operations, each a tuple of (op code, game id, arg, arg). The worker replies
+# with a list holding one card (or BRAIN_ERROR) per CHOOSE operation, in order.
+START = 's'  # args: initial red hand str, initial blue hand str; the worker's color is fixed for its lifetime
+CHOOSE = 'c'  # args: spied card or NO_SPIED_CARD, unused
+FIGHT = 'f'  # args: red card, blue card
+END = 'e'  # args unused
+NO_SPIED_CARD = -1
+BRAIN_ERROR = -1
+
+# Sent instead of a list of operations to shut a worker down
+STOP = None
+
+
+class BrainWorkerFailure(Exception):
+    pass
+
+
+def _worker_main(conn, brain_name, color_value, opponent_name):
+    ''' Worker process loop: hosts one brain and answers batches of operations until told to stop
+    '''
+    brain_fn = get_brain_func(brain_name)
+    notify_new_match(brain_fn, opponent_name)
+    host = BrainHost(brain_fn)
+    color = Color(color_value)
+    while True:
+        ops = conn.recv()
+        if ops is STOP:
+            break
+        replies = []
+        for op, game_id, arg1, arg2 in ops:
+            try:
+                if op == CHOOSE:
+                    if game_id in host.games:
+                        replies.append(host.choose(game_id, None if arg1 == NO_SPIED_CARD else arg1))
+                    else:
+                        # The brain already failed in this game
+                        replies.append(BRAIN_ERROR)
+                elif game_id not in host.games and op != START:
+                    continue
+                elif op == START:
+                    host.start_game(game_id, color, arg1, arg2)
+                elif op == FIGHT:
+                    host.record_fight(game_id, arg1, arg2)
+                elif op == END:
+                    host.end_game(game_id)
+            except Exception:
+                traceback.print_exc()
+                host.drop_game(game_id)
+                if op == CHOOSE:
+                    replies.append(BRAIN_ERROR)
+        conn.send(replies)
+    conn.close()
+
+
+class BrainWorker(object):
+    ''' A long-lived subprocess hosting one brain for one color. Operations are queued up with add() and
+    sent as one message by send(), so IPC cost is shared by every game in the batch.
+    '''
+    def __init__(self, brain_name, color, timeout=None, opponent_name=None):
+        '''
+        :param brain_name: unprefixed brain name, looked up by the worker with get_brain_func
+        :param color: Color the brain plays
+        :param timeout: max seconds to wait for the reply to one batch before killing the worker
+        :param opponent_name: unprefixed name of the opponent's brain, which the brain is told when the worker starts
+        '''
+        self.brain_name, self.color, self.timeout = brain_name, color, timeout
+        self.opponent_name = opponent_name
+        self.outbox = []
+        self._conn, self._process = None, None
+        self.start()
+
+    def start(self):
+        self._conn, child_conn = Pipe()
+        self._process = Process(target=_worker_main,
+                                args=(child_conn, self.brain_name, int(self.color), self.opponent_name))
+        self._process.daemon = True
+        self._process.start()
+        child_conn.close()
+
+    def restart(self):
+        self.kill()
+        self.outbox = []
+        self.start()
+
+    def kill(self):
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+        self._conn.close()
+
+    def add(self, op, game_id, arg1=None, arg2=None):
+        self.outbox.append((op, game_id, arg1, arg2))
+
+    def send(self):
+        ops, self.outbox = self.outbox, []
+        try:
+            self._conn.send(ops)
+        except (IOError, EOFError) as e:
+            raise BrainWorkerFailure('{} worker for {} died: {}'.format(self.color.name, self.brain_name, e))
+
+    def receive(self):
+        try:
+            if self.timeout is not None and not self._conn.poll(self.timeout):
+                raise BrainWorkerFailure('{} worker for {} timed out after {}s'.format(
+                    self.color.name, self.brain_name, self.timeout))
+            return self._conn.recv()
+        except (IOError, EOFError) as e:
+            raise BrainWorkerFailure('{} worker for {} died: {}'.format(self.color.name, self.brain_name, e))
+
+    def stop(self):
+        try:
+            self._conn.send(STOP)
+        except (IOError, EOFError):
+            pass
+        self._process.join(1)
+        self.kill()
+
+
+class EngineGame(object):
+    ''' Authoritative state of one game played through workers
+    '''
+    def __init__(self, game_id, initial_red_hand_str, initial_blue_hand_str):
+        self.game_id = game_id
+        self.status = GameStatus(initial_red_hand_str, initial_blue_hand_str)
+        self.hands = {
+            Color.red: set(int(card) for card in initial_hand(initial_red_hand_str)),
+            Color.blue: set(int(card) for card in initial_hand(initial_blue_hand_str)),
+        }
+        self.cards = {}
+
+    def take_card(self, color, card):
+        ''' Plays a card returned by a worker, forfeiting if it's an error or not in hand
+        :return: True if the card was valid
+        '''
+        if card == BRAIN_ERROR or card not in self.hands[color]:
+            self.status.forfeit(color)
+            return False
+        self.hands[color].remove(card)
+        self.cards[color] = card
+        return True
+
+
+def _exchange(workers):
+    ''' Sends every worker its queued operations, then collects the replies, so workers think in parallel.
+    :return: generator of (color, replies), with None for replies if the worker failed
+    '''
+    sent = []
+    for color, worker in workers.iteritems():
+        try:
+            worker.send()
+            sent.append(color)
+        except BrainWorkerFailure:
+            yield color, None
+    for color in sent:
+        try:
+            yield color, workers[color].receive()
+        except BrainWorkerFailure:
+            yield color, None
+
+
+def play_match_in_workers(red_brain_name, blue_brain_name, num_games=1,
+                          initial_red_hand_str=None, initial_blue_hand_str=None,
+                          concurrency=256, timeout=None, recycle_after=None):
+    ''' Plays a match with each brain running in its own long-lived worker process. Up to `concurrency` games
+    are played in lockstep, so each worker gets a batch of decisions per message rather than one.
+    A brain that raises, cheats, crashes its worker or times out forfeits the games it was playing;
+    its worker is restarted and the match goes on.
+    :param red_brain_name: unprefixed name of red's brain
+    :param blue_brain_name: unprefixed name of blue's brain
+    :param timeout: max seconds a worker may take to answer one batch
+    :param recycle_after: restart the workers after this many games, eg. to contain leaky brains
+    :return: generator of finished GameStatus objects, in the order games finish
+    '''
+    workers = {
+        Color.red: BrainWorker(red_brain_name, Color.red, timeout, blue_brain_name),
+        Color.blue: BrainWorker(blue_brain_name, Color.blue, timeout, red_brain_name),
+    }
+    active = {}
+    games_started = games_since_recycle = 0
+    try:
+        while games_started < num_games or active:
+            if recycle_after and games_since_recycle >= recycle_after and not active:
+                for worker in workers.itervalues():
+                    worker.restart()
+                games_since_recycle = 0
+            while (games_started < num_games and len(active) < concurrency
+                   and not (recycle_after and games_since_recycle >= recycle_after)):
+                game = EngineGame(games_started, initial_red_hand_str, initial_blue_hand_str)
+                active[game.game_id] = game
+                for worker in workers.itervalues():
+                    worker.add(START, game.game_id, initial_red_hand_str, initial_blue_hand_str)
+                games_started += 1
+                games_since_recycle += 1
+
+            # Players who aren't peeking choose first, then spies choose knowing their opponent's card
+            spy_colors = {
+                game_id: successful_spy_color(game.status.most_recent_fight) for game_id, game in active.iteritems()
+            }
+            for peeking in (False, True):
+                waiting = {color: [] for color in workers}
+                for game_id, game in active.iteritems():
+                    for color, worker in workers.iteritems():
+                        if (spy_colors[game_id] == color) != peeking or game.status.forfeited_by:
+                            continue
+                        if peeking:
+                            worker.add(CHOOSE, game_id, game.cards[Color.blue if color == Color.red else Color.red])
+                        else:
+                            worker.add(CHOOSE, game_id, NO_SPIED_CARD)
+                        waiting[color].append(game)
+                if not any(waiting.itervalues()):
+                    continue
+                for color, cards in _exchange(workers):
+                    if cards is None:
+                        # The worker died with the state of every active game
+                        workers[color].restart()
+                        for game in active.itervalues():
+                            if not game.status.forfeited_by:
+                                game.status.forfeit(color)
+                        continue
+                    for game, card in zip(waiting[color], cards):
+                        if not game.status.forfeited_by:
+                            game.take_card(color, card)
+
+            for game_id, game in active.items():
+                if not game.status.forfeited_by:
+                    red_card, blue_card = game.cards[Color.red], game.cards[Color.blue]
+                    resolve_fight(Card(red_card), Card(blue_card), game.status)
+                    for worker in workers.itervalues():
+                        worker.add(FIGHT, game_id, red_card, blue_card)
+                    game.cards = {}
+                if game.status.is_over or not (game.hands[Color.red] and game.hands[Color.blue]):
+                    for worker in workers.itervalues():
+                        worker.add(END, game_id)
+                    del active[game_id]
+                    yield game.status
+        # Deliver the last game over notifications
+        for color, _ in _exchange(workers):
+            pass
+    finally:
+        for worker in workers.itervalues():
+            worker.stop()
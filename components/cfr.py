@@ -0,0 +1,269 @@
+import json
+from multiprocessing import Pool
+import os
+import random
+
+import numpy as np
+
+from components.cards import Color
+from components.compact_game import FULL_HAND, HAND_CARDS, NUM_CARDS, PREV_BASE, SPY_TABLE
+from components.game_status import POINTS_TO_WIN
+from components.solver import CANONICAL_PREV, MAX_USEFUL_ON_HOLD_POINTS, child_state, initial_state
+
+# An information set is the public state of the game plus, for a player who successfully spied, the revealed card;
+# nothing else is hidden. Information sets are only encoded for the vanilla game, where both players start with
+# every card, so both hands always hold the same number of cards.
+
+_HAND_SIZE = tuple(bin(mask).count('1') for mask in range(FULL_HAND + 1))
+# Rank of each hand mask among the masks with the same number of cards
+HAND_RANK = tuple(
+    sum(1 for other in range(mask) if _HAND_SIZE[other] == _HAND_SIZE[mask])
+    for mask in range(FULL_HAND + 1)
+)
+_HANDS_WITH_SIZE = [_HAND_SIZE.count(size) for size in range(NUM_CARDS + 1)]
+# Index of the first (red hand, blue hand) pair of each hand size
+_HAND_PAIR_OFFSET = [sum(count * count for count in _HANDS_WITH_SIZE[:size]) for size in range(NUM_CARDS + 1)]
+NUM_HAND_PAIRS = _HAND_PAIR_OFFSET[-1] + _HANDS_WITH_SIZE[-1] ** 2
+
+# Previous fights, reduced to their distinct effects on the next fight (see solver.CANONICAL_PREV)
+_CONTEXTS = sorted(set(CANONICAL_PREV))
+CONTEXT_INDEX = tuple(_CONTEXTS.index(CANONICAL_PREV[prev]) for prev in range(PREV_BASE * PREV_BASE))
+NUM_CONTEXTS = len(_CONTEXTS)
+
+# Acting slots within a public state: without a spy, red acts in slot 0 and blue in slot 1. After a successful spy,
+# the revealed player acts in slot 0, and the spy in slot 1 + the revealed card.
+NUM_SLOTS = 1 + NUM_CARDS
+NUM_ON_HOLD = MAX_USEFUL_ON_HOLD_POINTS + 1
+NUM_INFOSETS = NUM_HAND_PAIRS * POINTS_TO_WIN * POINTS_TO_WIN * NUM_ON_HOLD * NUM_CONTEXTS * NUM_SLOTS
+
+REGRETS_FILENAME = 'regrets.f32'
+STRATEGY_SUM_FILENAME = 'strategy_sum.f32'
+META_FILENAME = 'meta.json'
+STRATEGY_DTYPE = np.float16
+
+# Probability that the player being updated explores a uniformly random card, in outcome sampling
+DEFAULT_EXPLORATION = 0.6
+
+# Rows of the strategy sums normalized at once by export_strategy, to bound memory use
+_EXPORT_CHUNK_ROWS = 1 << 20
+
+
+def public_state_index(red_hand, blue_hand, red_points, blue_points, on_hold_points, prev):
+    ''' :param prev: previous fight, as in CompactGameStatus
+    '''
+    size = _HAND_SIZE[red_hand]
+    hand_pair = _HAND_PAIR_OFFSET[size] + HAND_RANK[red_hand] * _HANDS_WITH_SIZE[size] + HAND_RANK[blue_hand]
+    on_hold_points = min(on_hold_points, MAX_USEFUL_ON_HOLD_POINTS)
+    return (((hand_pair * POINTS_TO_WIN + red_points) * POINTS_TO_WIN + blue_points) * NUM_ON_HOLD
+            + on_hold_points) * NUM_CONTEXTS + CONTEXT_INDEX[prev]
+
+
+def infoset_index(public_index, prev, color, revealed_card=None):
+    ''' Index of an information set of the player of the given color
+    :param revealed_card: int card revealed to this player by its spy, if any
+    '''
+    spy_color = SPY_TABLE[prev]
+    if spy_color is None:
+        slot = 0 if color == Color.red else 1
+    elif spy_color == color:
+        slot = 1 + revealed_card
+    else:
+        slot = 0
+    return public_index * NUM_SLOTS + slot
+
+
+def _regret_matching(regrets, cards):
+    positive = [max(float(regrets[card]), 0.0) for card in cards]
+    total = sum(positive)
+    if total > 0:
+        return [weight / total for weight in positive]
+    return [1.0 / len(cards)] * len(cards)
+
+
+def _sample_index(probabilities, rng):
+    point = rng.random()
+    for index, probability in enumerate(probabilities):
+        point -= probability
+        if point < 0:
+            return index
+    return len(probabilities) - 1
+
+
+class CfrTables(object):
+    ''' Cumulative regrets and strategy sums, float32 arrays of shape (NUM_INFOSETS, NUM_CARDS) memory-mapped from
+    files in a directory, plus a small JSON file of training metadata. Training only touches the rows of reachable
+    information sets, so on filesystems with sparse files most of the table never uses disk.
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.regrets = self._open(REGRETS_FILENAME)
+        self.strategy_sum = self._open(STRATEGY_SUM_FILENAME)
+
+    def _open(self, filename):
+        path = os.path.join(self.directory, filename)
+        return np.memmap(path, dtype=np.float32, mode='r+' if os.path.exists(path) else 'w+',
+                         shape=(NUM_INFOSETS, NUM_CARDS))
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, META_FILENAME)
+
+    def load_meta(self):
+        try:
+            with open(self._meta_path) as meta_file:
+                return json.load(meta_file)
+        except IOError:
+            return {'iterations': 0}
+
+    def checkpoint(self, meta):
+        ''' Flushes the tables to disk, then records the metadata that describes them
+        '''
+        self.regrets.flush()
+        self.strategy_sum.flush()
+        temp_path = self._meta_path + '.tmp'
+        with open(temp_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.rename(temp_path, self._meta_path)
+
+
+class CfrTrainer(object):
+    ''' Outcome-sampling Monte Carlo CFR (Lanctot et al., 2009) on the vanilla game. Each fight is treated as red
+    choosing before blue, with blue's information set not including red's card (unless blue spied).
+    Values are from the updated player's point of view: 1 for a win, -1 for a loss, 0 for a tie.
+    '''
+    def __init__(self, tables, exploration=DEFAULT_EXPLORATION, rng=None):
+        self.tables = tables
+        self.exploration = exploration
+        self.rng = rng or random.Random()
+
+    def iterate(self):
+        ''' One pass updating each player
+        '''
+        for update_color in (Color.red, Color.blue):
+            self._episode(initial_state(), None, update_color, 1.0, 1.0, 1.0)
+
+    def _episode(self, state, first_card, update_color, my_reach, opponent_reach, sample_reach):
+        ''' Samples one path through the rest of the game, updating the tables on the way back
+        :param first_card: card already chosen in this fight by the player who chooses first, or None
+        :return: sampled estimate of the value of this decision point to update_color
+        '''
+        red_hand, blue_hand, red_points, blue_points, prev = state[:5]
+        spy_color = SPY_TABLE[prev]
+        first_color, second_color = (Color.blue, Color.red) if spy_color == Color.red else (Color.red, Color.blue)
+        color = first_color if first_card is None else second_color
+
+        infoset = infoset_index(
+            public_state_index(red_hand, blue_hand, red_points, blue_points, state[5], prev),
+            prev, color, first_card if spy_color == color else None,
+        )
+        cards = HAND_CARDS[red_hand if color == Color.red else blue_hand]
+        policy = _regret_matching(self.tables.regrets[infoset], cards)
+        if color == update_color:
+            uniform = self.exploration / len(cards)
+            sample_policy = [uniform + (1 - self.exploration) * p for p in policy]
+        else:
+            sample_policy = policy
+        index = _sample_index(sample_policy, self.rng)
+        card = cards[index]
+
+        if color == update_color:
+            my_reach_after, opponent_reach_after = my_reach * policy[index], opponent_reach
+        else:
+            my_reach_after, opponent_reach_after = my_reach, opponent_reach * policy[index]
+        sample_reach_after = sample_reach * sample_policy[index]
+
+        if first_card is None:
+            child_value = self._episode(state, card, update_color, my_reach_after, opponent_reach_after,
+                                        sample_reach_after)
+        else:
+            red_card, blue_card = (first_card, card) if first_color == Color.red else (card, first_card)
+            terminal_value, child = child_state(state, red_card, blue_card)
+            if child is None:
+                child_value = terminal_value if update_color == Color.red else -terminal_value
+            else:
+                child_value = self._episode(child, None, update_color, my_reach_after, opponent_reach_after,
+                                            sample_reach_after)
+
+        # Importance-weighted estimates: only the sampled card has a nonzero estimated value
+        sampled_value = child_value / sample_policy[index]
+        value = policy[index] * sampled_value
+
+        if color == update_color:
+            regrets = self.tables.regrets[infoset]
+            strategy_sum = self.tables.strategy_sum[infoset]
+            weight = opponent_reach / sample_reach
+            for other_index, other_card in enumerate(cards):
+                action_value = sampled_value if other_index == index else 0.0
+                regrets[other_card] += (action_value - value) * weight
+                strategy_sum[other_card] += my_reach * policy[other_index] / sample_reach
+        return value
+
+
+def _train_worker((directory, iterations, seed, exploration)):
+    ''' Process pool worker. Workers update the shared memory-mapped tables without locking ("Hogwild" style),
+    which occasionally loses an update but doesn't stop CFR from converging.
+    '''
+    tables = CfrTables(directory)
+    trainer = CfrTrainer(tables, exploration, random.Random(seed))
+    for _ in range(iterations):
+        trainer.iterate()
+    tables.regrets.flush()
+    tables.strategy_sum.flush()
+    return iterations
+
+
+def train(directory, iterations, processes=1, checkpoint_every=10000, exploration=DEFAULT_EXPLORATION, seed=0,
+          progress_fn=None):
+    ''' Trains in (or resumes training in) a directory of CFR tables, checkpointing every checkpoint_every iterations
+    :param processes: number of worker processes sharing the tables
+    :param progress_fn: optional function called with the total number of iterations after each checkpoint
+    :return: total number of iterations the tables have been trained for
+    '''
+    tables = CfrTables(directory)
+    meta = tables.load_meta()
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        remaining = iterations
+        while remaining > 0:
+            batch = min(checkpoint_every, remaining)
+            # Seeds depend on how far training has got, so resumed runs don't repeat themselves
+            tasks = [
+                (directory, batch // processes + (1 if worker < batch % processes else 0),
+                 hash((seed, meta['iterations'], worker)), exploration)
+                for worker in range(processes)
+            ]
+            if pool:
+                pool.map(_train_worker, tasks)
+            else:
+                _train_worker(tasks[0])
+            meta['iterations'] += batch
+            tables.checkpoint(meta)
+            remaining -= batch
+            if progress_fn:
+                progress_fn(meta['iterations'])
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return meta['iterations']
+
+
+def export_strategy(directory, path):
+    ''' Writes the average strategy as a dense float16 array of shape (NUM_INFOSETS, NUM_CARDS), for
+    load_strategy. Rows of information sets that training never reached are all zero.
+    '''
+    strategy_sum = CfrTables(directory).strategy_sum
+    strategy = np.memmap(path, dtype=STRATEGY_DTYPE, mode='w+', shape=(NUM_INFOSETS, NUM_CARDS))
+    for start in range(0, NUM_INFOSETS, _EXPORT_CHUNK_ROWS):
+        rows = np.asarray(strategy_sum[start:start + _EXPORT_CHUNK_ROWS], dtype=np.float64)
+        totals = rows.sum(axis=1, keepdims=True)
+        reached = totals[:, 0] > 0
+        if reached.any():
+            strategy[start:start + _EXPORT_CHUNK_ROWS][reached] = rows[reached] / totals[reached]
+    strategy.flush()
+
+
+def load_strategy(path):
+    return np.memmap(path, dtype=STRATEGY_DTYPE, mode='r', shape=(NUM_INFOSETS, NUM_CARDS))
@@ -0,0 +1,266 @@
+import random
+
+from components.cards import Card, Color
+from components.game_status import MAX_ROUNDS_IN_GAME, POINTS_TO_WIN
+from components.player import CheatingException
+from components.rules import NO_CARD, NUM_CARDS, PREV_BASE, VANILLA, FightResult
+
+# Cards are plain ints (Card values) in the compact engine. NO_CARD stands in for "no previous card".
+FULL_HAND = (1 << NUM_CARDS) - 1
+
+# Previous fights are stored as a single int, prev_red * PREV_BASE + prev_blue
+NO_PREV = NO_CARD * PREV_BASE + NO_CARD
+
+# Fights are packed into CompactGameStatus.history, BITS_PER_FIGHT bits per fight, red card in the low bits
+BITS_PER_CARD = 3
+BITS_PER_FIGHT = 2 * BITS_PER_CARD
+CARD_BITS_MASK = (1 << BITS_PER_CARD) - 1
+
+PRINCESS_POINTS = 999999
+
+# Bit layout of CompactGameStatus.state_key, above the two hand masks: points capped at POINTS_TO_WIN take 3 bits
+# each, and prev takes 7
+_KEY_RED_POINTS_SHIFT = 2 * NUM_CARDS
+_KEY_BLUE_POINTS_SHIFT = _KEY_RED_POINTS_SHIFT + 3
+_KEY_PREV_SHIFT = _KEY_BLUE_POINTS_SHIFT + 3
+_KEY_ON_HOLD_SHIFT = _KEY_PREV_SHIFT + 7
+
+
+def hand_mask(hand):
+    ''' Converts an iterable of cards (Card values or ints) to an 8-bit hand mask
+    '''
+    mask = 0
+    for card in hand:
+        mask |= 1 << int(card)
+    return mask
+
+
+def hand_mask_from_str(hand_str=None):
+    ''' Same as cards.initial_hand, but returns a hand mask
+    '''
+    if hand_str:
+        return hand_mask(int(x) for x in hand_str)
+    return FULL_HAND
+
+
+# Flat tuple of FightResult int values, indexed by fight_index(), under the vanilla rules. CompactGameStatus keeps
+# its own rule set's tables; this is for the engines that only play the vanilla rules.
+FIGHT_TABLE = VANILLA.fight_table
+
+# Color of the successful spy (or None) for each previous fight, indexed by prev
+SPY_TABLE = VANILLA.spy_table
+
+# Cards in each hand mask, for choosing cards without rebuilding lists
+HAND_CARDS = tuple(
+    tuple(card for card in range(NUM_CARDS) if mask & (1 << card))
+    for mask in range(FULL_HAND + 1)
+)
+
+# Points gained by red / blue for each FightResult value, not counting points on hold
+_RED_GAIN = [0] * (len(FightResult) + 1)
+_RED_GAIN[FightResult.red_wins] = 1
+_RED_GAIN[FightResult.red_wins_2] = 2
+_BLUE_GAIN = [0] * (len(FightResult) + 1)
+_BLUE_GAIN[FightResult.blue_wins] = 1
+_BLUE_GAIN[FightResult.blue_wins_2] = 2
+
+_ON_HOLD = int(FightResult.on_hold)
+_RED_WINS_GAME = int(FightResult.red_wins_game)
+_BLUE_WINS_GAME = int(FightResult.blue_wins_game)
+_AMBASSADOR = int(Card.ambassador)
+
+
+class CompactGameStatus(object):
+    ''' Allocation-free equivalent of GameStatus plus both players' hands, for bulk simulation.
+    All state is kept in ints, and counters are updated incrementally by resolve_fight, so none of the
+    properties rebuild lists. Cards are ints (Card values), and fights are packed into history.
+    '''
+    __slots__ = (
+        'red_hand', 'blue_hand',
+        'red_points', 'blue_points',
+        'prev',
+        'on_hold_fights', 'on_hold_points',
+        'num_fights', 'history',
+        'is_over',
+        'undo_stack',
+        'rules', 'fight_table', 'spy_table',
+    )
+
+    def __init__(self, red_hand=FULL_HAND, blue_hand=FULL_HAND, rules=VANILLA):
+        '''
+        :param red_hand: hand mask of red's initial hand (bit n set = card n in hand)
+        :param blue_hand: hand mask of blue's initial hand
+        :param rules: RuleSet the game is played with
+        '''
+        self.rules, self.fight_table, self.spy_table = rules, rules.fight_table, rules.spy_table
+        self.red_hand, self.blue_hand = red_hand, blue_hand
+        self.red_points, self.blue_points = 0, 0
+        self.prev = NO_PREV
+        self.on_hold_fights, self.on_hold_points = 0, 0
+        self.num_fights, self.history = 0, 0
+        # A player with an empty hand can't play on, so the game is over
+        self.is_over = not (red_hand and blue_hand)
+        # State overwritten by each fight played with apply, for undo
+        self.undo_stack = []
+
+    @classmethod
+    def from_hand_strs(cls, initial_red_hand_str=None, initial_blue_hand_str=None, rules=VANILLA):
+        return cls(hand_mask_from_str(initial_red_hand_str), hand_mask_from_str(initial_blue_hand_str), rules)
+
+    @classmethod
+    def from_game(cls, game, red_hand, blue_hand):
+        ''' Builds the compact equivalent of a GameStatus by replaying its fights under its rules
+        :param game: GameStatus
+        :param red_hand: hand mask of the cards red has left
+        :param blue_hand: hand mask of the cards blue has left
+        '''
+        fights = game.all_fights
+        compact_game = cls(red_hand | hand_mask(red_card for red_card, _ in fights),
+                           blue_hand | hand_mask(blue_card for _, blue_card in fights),
+                           game.rules)
+        for red_card, blue_card in fights:
+            compact_game.resolve_fight(int(red_card), int(blue_card))
+        return compact_game
+
+    def copy(self):
+        other = CompactGameStatus.__new__(CompactGameStatus)
+        for slot in CompactGameStatus.__slots__:
+            setattr(other, slot, getattr(self, slot))
+        other.undo_stack = list(self.undo_stack)
+        return other
+
+    @property
+    def state_key(self):
+        ''' Int identifying the position for transposition tables: games with the same key play out the same from
+        here on, whatever fights led to them. Scores at or over POINTS_TO_WIN all count as a win.
+        '''
+        return (self.red_hand | self.blue_hand << NUM_CARDS
+                | min(self.red_points, POINTS_TO_WIN) << _KEY_RED_POINTS_SHIFT
+                | min(self.blue_points, POINTS_TO_WIN) << _KEY_BLUE_POINTS_SHIFT
+                | self.prev << _KEY_PREV_SHIFT
+                | self.on_hold_points << _KEY_ON_HOLD_SHIFT)
+
+    @property
+    def winner(self):
+        if self.red_points >= POINTS_TO_WIN:
+            return Color.red
+        if self.blue_points >= POINTS_TO_WIN:
+            return Color.blue
+        return None
+
+    @property
+    def most_recent_fight(self):
+        ''' (prev_red, prev_blue) as ints, NO_CARD if there hasn't been a fight yet
+        '''
+        return divmod(self.prev, PREV_BASE)
+
+    @property
+    def spy_color(self):
+        ''' Color of the player who successfully played a spy last fight, or None
+        '''
+        return self.spy_table[self.prev]
+
+    def fight(self, n):
+        ''' (red_card, blue_card) played in the nth fight (0-based)
+        '''
+        packed = self.history >> (n * BITS_PER_FIGHT)
+        return packed & CARD_BITS_MASK, (packed >> BITS_PER_CARD) & CARD_BITS_MASK
+
+    @property
+    def all_fights(self):
+        return [self.fight(n) for n in range(self.num_fights)]
+
+    def resolve_fight(self, red_card, blue_card):
+        ''' Compact equivalent of fight.resolve_fight. Also removes the played cards from the hands.
+        :param red_card: int value of card played by red player
+        :param blue_card: int value of card played by blue player
+        :return: FightResult int value
+        '''
+        red_bit, blue_bit = 1 << red_card, 1 << blue_card
+        if not (self.red_hand & red_bit and self.blue_hand & blue_bit):
+            raise CheatingException('Tried to play cards {} and {} not in hand'.format(red_card, blue_card))
+        self.red_hand ^= red_bit
+        self.blue_hand ^= blue_bit
+
+        result = self.fight_table[(red_card * NUM_CARDS + blue_card) * PREV_BASE * PREV_BASE + self.prev]
+
+        if result == _ON_HOLD:
+            self.on_hold_fights += 1
+            self.on_hold_points += 2 if red_card == blue_card == _AMBASSADOR else 1
+        elif result == _RED_WINS_GAME:
+            self.red_points = PRINCESS_POINTS
+            self.on_hold_fights, self.on_hold_points = 0, 0
+        elif result == _BLUE_WINS_GAME:
+            self.blue_points = PRINCESS_POINTS
+            self.on_hold_fights, self.on_hold_points = 0, 0
+        else:
+            red_gain = _RED_GAIN[result]
+            if red_gain:
+                self.red_points += red_gain + self.on_hold_points
+            else:
+                self.blue_points += _BLUE_GAIN[result] + self.on_hold_points
+            self.on_hold_fights, self.on_hold_points = 0, 0
+
+        self.history |= (red_card | (blue_card << BITS_PER_CARD)) << (self.num_fights * BITS_PER_FIGHT)
+        self.num_fights += 1
+        self.prev = red_card * PREV_BASE + blue_card
+        self.is_over = (
+            self.red_points >= POINTS_TO_WIN or self.blue_points >= POINTS_TO_WIN
+            or self.num_fights == MAX_ROUNDS_IN_GAME
+            or not (self.red_hand and self.blue_hand)
+        )
+        return result
+
+    def apply(self, red_card, blue_card):
+        ''' Same as resolve_fight, but the fight can be taken back with undo, so search can explore moves without
+        copying the game
+        :return: FightResult int value
+        '''
+        self.undo_stack.append((self.red_points, self.blue_points, self.prev,
+                                self.on_hold_fights, self.on_hold_points, self.is_over))
+        return self.resolve_fight(red_card, blue_card)
+
+    def undo(self):
+        ''' Takes back the last fight played with apply
+        '''
+        (self.red_points, self.blue_points, self.prev,
+         self.on_hold_fights, self.on_hold_points, self.is_over) = self.undo_stack.pop()
+        self.num_fights -= 1
+        red_card, blue_card = self.fight(self.num_fights)
+        self.red_hand |= 1 << red_card
+        self.blue_hand |= 1 << blue_card
+        self.history &= (1 << (self.num_fights * BITS_PER_FIGHT)) - 1
+
+
+def random_policy(game, color, spied_card):
+    ''' Compact equivalent of random_ai_brain_fn
+    '''
+    hand = game.red_hand if color == Color.red else game.blue_hand
+    return random.choice(HAND_CARDS[hand])
+
+
+def play_compact_game(red_policy=random_policy, blue_policy=random_policy,
+                      red_hand=FULL_HAND, blue_hand=FULL_HAND, rules=VANILLA):
+    ''' Plays a game on a CompactGameStatus. Spy reveals are handled in the same order as brave_rats.play_game.
+    :param red_policy: function of (game, color, spied_card) returning an int card from the player's hand.
+        spied_card is the int card the opponent has revealed, or None.
+    :param blue_policy: same as red_policy, for the blue player
+    :param red_hand: hand mask of red's initial hand
+    :param blue_hand: hand mask of blue's initial hand
+    :param rules: RuleSet the game is played with
+    :return: the finished CompactGameStatus
+    '''
+    game = CompactGameStatus(red_hand, blue_hand, rules)
+    red, blue = Color.red, Color.blue
+    while not game.is_over:
+        spy_color = game.spy_table[game.prev]
+        if spy_color == red:
+            blue_card = blue_policy(game, blue, None)
+            red_card = red_policy(game, red, blue_card)
+        elif spy_color == blue:
+            red_card = red_policy(game, red, None)
+            blue_card = blue_policy(game, blue, red_card)
+        else:
+            red_card, blue_card = red_policy(game, red, None), blue_policy(game, blue, None)
+        game.resolve_fight(red_card, blue_card)
+    return game
@@ -0,0 +1,155 @@
+import random
+
+from brains.example_ai import random_ai_brain_fn
+from components.cards import Color
+from components.compact_game import hand_mask, hand_mask_from_str
+from components.observation import observe
+
+
+def deterministic(brain_fn):
+    ''' Decorator declaring that a brain function always plays the same card in the same position: no randomness,
+    and no memory of earlier moves or games beyond what an Observation holds (with the last fight standing in for the
+    fights before it). play_match plays a match between two deterministic brains only once, and remembers their
+    decisions in other matches.
+    '''
+    brain_fn.deterministic = True
+    return brain_fn
+
+
+def is_deterministic(brain_fn):
+    return getattr(brain_fn, 'deterministic', False)
+
+
+def _key(rules, color, my_hand_mask, opponent_hand_mask, points, opponent_points, on_hold_points,
+         last_card, last_opponent_card, spied_card):
+    return (rules.name, int(color), my_hand_mask, opponent_hand_mask, points, opponent_points, on_hold_points,
+            -1 if last_card is None else int(last_card),
+            -1 if last_opponent_card is None else int(last_opponent_card),
+            -1 if spied_card is None else int(spied_card))
+
+
+def decision_key(observation):
+    ''' The parts of an Observation that a deterministic brain's decision depends on, as a tuple of the rule set's
+    name and ints
+    '''
+    last_card, last_opponent_card = observation.last_fight
+    return _key(observation.rules, observation.color, observation.hand_mask, observation.opponent_hand_mask,
+                observation.points, observation.opponent_points, observation.on_hold_points,
+                last_card, last_opponent_card, observation.spied_card)
+
+
+def game_decision_key(player, game, spied_card):
+    ''' Same as decision_key(observe(player, game, spied_card)), without building the Observation
+    '''
+    all_fights = game.resolved_fights + game.on_hold_fights
+    last_fight = all_fights[-1] if all_fights else (None, None)
+    if player.color == Color.red:
+        opponent_hand_mask = (hand_mask_from_str(game.initial_hands['blue'])
+                              & ~hand_mask(blue_card for _, blue_card in all_fights))
+        return _key(game.rules, player.color, hand_mask(player.hand), opponent_hand_mask,
+                    game.red_points, game.blue_points, game.on_hold_points, last_fight[0], last_fight[1], spied_card)
+    opponent_hand_mask = (hand_mask_from_str(game.initial_hands['red'])
+                          & ~hand_mask(red_card for red_card, _ in all_fights))
+    return _key(game.rules, player.color, hand_mask(player.hand), opponent_hand_mask,
+                game.blue_points, game.red_points, game.on_hold_points, last_fight[1], last_fight[0], spied_card)
+
+
+class DecisionCache(object):
+    ''' Brain function wrapper that asks a deterministic brain about each position once, and remembers its answer.
+    Counts cache hits and misses. Brains that take an Observation only get one built on a miss.
+    '''
+    def __init__(self, brain_fn):
+        self.brain_fn = brain_fn
+        # Brain name for unprefixed_name
+        self.__name__ = getattr(brain_fn, '__name__', repr(brain_fn))
+        self._takes_observation = getattr(brain_fn, 'takes_observation', False)
+        self.decisions = {}  # {decision_key: Card}
+        self.hits, self.misses = 0, 0
+
+    def __call__(self, player, game, spied_card):
+        if game.is_over:
+            return self._ask(player, game, spied_card)
+        key = game_decision_key(player, game, spied_card)
+        card = self.decisions.get(key)
+        if card is None:
+            self.misses += 1
+            card = self.decisions[key] = self._ask(player, game, spied_card)
+        else:
+            self.hits += 1
+        return card
+
+    def _ask(self, player, game, spied_card):
+        if self._takes_observation:
+            return self.brain_fn(observe(player, game, spied_card))
+        return self.brain_fn(player, game, spied_card)
+
+    def summary(self):
+        return '{} decision cache: {} hits, {} misses'.format(self.__name__, self.hits, self.misses)
+
+
+# {brain function: DecisionCache}, shared by all matches in this process
+_decision_caches = {}
+
+
+def decision_cache(brain_fn):
+    ''' :return: the DecisionCache this process uses for a deterministic brain, made on first use
+    '''
+    if brain_fn not in _decision_caches:
+        _decision_caches[brain_fn] = DecisionCache(brain_fn)
+    return _decision_caches[brain_fn]
+
+
+class _ProbeBrain(object):
+    ''' Brain function wrapper for probe_deterministic, which asks the brain twice about every position, with
+    different random states and a fresh Player the second time, and checks its answers against each other and
+    against its answers in the same position earlier
+    '''
+    def __init__(self, brain_fn):
+        self.brain_fn = brain_fn
+        self.__name__ = getattr(brain_fn, '__name__', repr(brain_fn))
+        self.answers = {}  # {decision_key: Card}
+        self.consistent = True
+
+    def _ask(self, player, game, spied_card):
+        if getattr(self.brain_fn, 'takes_observation', False):
+            return self.brain_fn(observe(player, game, spied_card))
+        return self.brain_fn(player, game, spied_card)
+
+    def __call__(self, player, game, spied_card):
+        if game.is_over:
+            return self._ask(player, game, spied_card)
+        card = self._ask(player, game, spied_card)
+        state = random.getstate()
+        random.seed(random.random())
+        fresh_player = type(player)(player.color, self.brain_fn)
+        fresh_player.hand = list(player.hand)
+        second_card = self._ask(fresh_player, game, spied_card)
+        random.setstate(state)
+        earlier_card = self.answers.setdefault(game_decision_key(player, game, spied_card), card)
+        if not card == second_card == earlier_card:
+            self.consistent = False
+        return card
+
+
+def probe_deterministic(brain_fn, num_games=20, seed=0):
+    ''' Tests whether a brain looks deterministic, by playing it against random opponents and asking it about
+    each position twice. A brain that passes may still not be deterministic in positions the probe didn't reach.
+    The random module's state is restored afterwards.
+    :return: True if the brain gave the same answer every time it was asked about a position
+    '''
+    from brave_rats import play_game
+
+    probe = _ProbeBrain(brain_fn)
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        for game_index in range(num_games):
+            if game_index % 2:
+                play_game(probe, random_ai_brain_fn)
+            else:
+                play_game(random_ai_brain_fn, probe)
+            if not probe.consistent:
+                return False
+        return True
+    finally:
+        random.setstate(state)
@@ -0,0 +1,162 @@
+import math
+
+from components.cards import Color
+
+
+class StoppingRule(object):
+    ''' Keeps win/tie/loss counts as a match goes, and decides when the result is clear enough to stop.
+    Ties are counted but don't count as evidence either way.
+    '''
+    def __init__(self, min_games=20):
+        '''
+        :param min_games: never stop before this many games have been played
+        '''
+        self.min_games = min_games
+        self.red_wins, self.ties, self.blue_wins = 0, 0, 0
+        self.reason = None
+
+    @property
+    def games_played(self):
+        return self.red_wins + self.ties + self.blue_wins
+
+    def update(self, winner):
+        ''' Records a game result
+        :param winner: Color of the winner, or None for a tie
+        :return: True if the match should stop; the reason is then in self.reason
+        '''
+        if winner == Color.red:
+            self.red_wins += 1
+        elif winner == Color.blue:
+            self.blue_wins += 1
+        else:
+            self.ties += 1
+        if self.games_played >= self.min_games:
+            self.reason = self._separation()
+        return self.reason is not None
+
+    def reached_max_games(self):
+        if self.reason is None:
+            self.reason = 'reached the maximum number of games without a clear winner'
+
+    def _separation(self):
+        ''' :return: a description of why the match can stop (the brains are separated, or found to be even), or
+        None if it can't yet
+        '''
+        raise NotImplementedError
+
+
+def normal_quantile(probability):
+    ''' :return: z such that a standard normal variable is below z with the given probability (0.5 to 1)
+    '''
+    low, high = 0.0, 40.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if 0.5 * math.erfc(middle / math.sqrt(2)) > 1 - probability:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+class WilsonStop(StoppingRule):
+    ''' Stops once the Wilson score interval for red's share of decisive games excludes 1/2.
+    Looking after every game would call one brain stronger far more often than the interval's confidence suggests,
+    so the interval is only checked at checkpoints spaced checkpoint_ratio times further apart, starting at
+    min_games, and the error rate alpha is spent across them: the kth check (from 0) uses a two-sided interval at
+    confidence 1 - alpha * 6 / (pi^2 * (k + 1)^2). Those add up to at most alpha, so over a whole match of any
+    length, even brains are called different with probability at most alpha.
+    '''
+    def __init__(self, alpha=0.01, min_games=20, checkpoint_ratio=1.5):
+        '''
+        :param alpha: chance of calling either brain stronger when the match is even
+        :param checkpoint_ratio: ratio between the game counts of successive checkpoints
+        '''
+        super(WilsonStop, self).__init__(min_games)
+        self.alpha = alpha
+        self.checkpoint_ratio = checkpoint_ratio
+        self.checks = 0
+        self.next_checkpoint = min_games
+        self.z = self._checkpoint_z(0)
+
+    def _checkpoint_z(self, check):
+        return normal_quantile(1 - self.alpha * 3 / (math.pi * math.pi * (check + 1) * (check + 1)))
+
+    def interval(self):
+        ''' :return: the Wilson interval for red's share of decisive games, at the confidence of the next check
+        '''
+        decisive = self.red_wins + self.blue_wins
+        if not decisive:
+            return 0.0, 1.0
+        p = float(self.red_wins) / decisive
+        z2 = self.z * self.z
+        center = (p + z2 / (2 * decisive)) / (1 + z2 / decisive)
+        half_width = self.z * math.sqrt(p * (1 - p) / decisive + z2 / (4 * decisive * decisive)) / (1 + z2 / decisive)
+        return center - half_width, center + half_width
+
+    def _separation(self):
+        if self.games_played < self.next_checkpoint:
+            return None
+        low, high = self.interval()
+        z = self.z
+        self.checks += 1
+        self.next_checkpoint = max(int(math.ceil(self.next_checkpoint * self.checkpoint_ratio)),
+                                   self.next_checkpoint + 1)
+        self.z = self._checkpoint_z(self.checks)
+        if low > 0.5:
+            stronger = Color.red
+        elif high < 0.5:
+            stronger = Color.blue
+        else:
+            return None
+        return '{} is stronger (Wilson interval {:.3f}-{:.3f} at z={:.2f} for red win share excludes 0.5)'.format(
+            stronger.name, low, high, z)
+
+
+class SPRTStop(StoppingRule):
+    ''' Two one-sided sequential probability ratio tests on decisive games, each testing
+    H0: red wins a decisive game with probability 1/2, against H1: red is stronger (wins with probability
+    1/2 + delta) for one test, or blue is stronger (red wins with probability 1/2 - delta) for the other.
+    The match stops as soon as either test accepts its H1, or once both have accepted H0, meaning there's no
+    significant difference between the brains.
+    '''
+    def __init__(self, delta=0.05, alpha=0.05, beta=0.05, min_games=20):
+        '''
+        :param delta: smallest difference from an even match worth detecting
+        :param alpha: chance of calling either brain stronger when the match is even, split between the two tests
+        :param beta: chance of finding no significant difference when one brain is stronger by delta
+        '''
+        super(SPRTStop, self).__init__(min_games)
+        self.delta = delta
+        stronger_llr, weaker_llr = math.log(1 + 2 * delta), math.log(1 - 2 * delta)
+        # {Color of the stronger brain under a test's H1: (log likelihood ratio of a red win, of a blue win)}
+        self._game_llrs = {Color.red: (stronger_llr, weaker_llr), Color.blue: (weaker_llr, stronger_llr)}
+        self.lower_bound = math.log(beta / (1 - alpha / 2))
+        self.upper_bound = math.log((1 - beta) / (alpha / 2))
+        self._even = set()  # Colors whose test has accepted H0
+
+    def log_likelihood_ratio(self, stronger):
+        ''' :param stronger: Color of the stronger brain under the H1 of the test to get the ratio of
+        '''
+        red_win_llr, blue_win_llr = self._game_llrs[stronger]
+        return self.red_wins * red_win_llr + self.blue_wins * blue_win_llr
+
+    def _separation(self):
+        for stronger in (Color.red, Color.blue):
+            if stronger in self._even:
+                continue
+            llr = self.log_likelihood_ratio(stronger)
+            if llr >= self.upper_bound:
+                return '{} is stronger (SPRT log likelihood ratio {:.2f} above {:.2f})'.format(
+                    stronger.name, llr, self.upper_bound)
+            if llr <= self.lower_bound:
+                self._even.add(stronger)
+        if len(self._even) == 2:
+            return 'no significant difference (both SPRTs favored an even match over a difference of {})'.format(
+                self.delta)
+        return None
+
+
+STOPPING_RULES = {
+    'wilson': WilsonStop,
+    'sprt': SPRTStop,
+}
@@ -0,0 +1,217 @@
+import json
+import sys
+
+from components.style import blueify, redify
+
+# Number of events a sink collects before writing them out
+DEFAULT_BATCH_SIZE = 1000
+
+
+class GameListener(object):
+    ''' Receives events from play_game and play_match. Every method does nothing by default, so listeners only
+    override the events they care about.
+    '''
+    def match_started(self, red_brain_name, blue_brain_name):
+        pass
+
+    def game_started(self, game):
+        pass
+
+    def spy_revealed(self, game, spy_color, revealed_card):
+        ''' A player's spy worked, and the opponent's card for this fight has been revealed to it
+        '''
+        pass
+
+    def fight_resolved(self, game, red_card, blue_card, result):
+        pass
+
+    def move_timed_out(self, game, timeout):
+        ''' A brain went over its move time budget and forfeits the game
+        :param timeout: the MoveTimeout
+        '''
+        pass
+
+    def game_over(self, game):
+        pass
+
+    def match_progress(self, game):
+        ''' A game of the match has finished. Also sent for matches whose games aren't played by play_game, which
+        send no other game events.
+        '''
+        pass
+
+    def match_over(self):
+        pass
+
+    def close(self):
+        ''' Writes out anything buffered
+        '''
+        pass
+
+
+# Listener that ignores every event
+NULL_LISTENER = GameListener()
+
+
+class ListenerGroup(GameListener):
+    ''' Passes every event on to each of a list of listeners
+    '''
+    def __init__(self, listeners):
+        self.listeners = listeners
+
+    def match_started(self, red_brain_name, blue_brain_name):
+        for listener in self.listeners:
+            listener.match_started(red_brain_name, blue_brain_name)
+
+    def game_started(self, game):
+        for listener in self.listeners:
+            listener.game_started(game)
+
+    def spy_revealed(self, game, spy_color, revealed_card):
+        for listener in self.listeners:
+            listener.spy_revealed(game, spy_color, revealed_card)
+
+    def fight_resolved(self, game, red_card, blue_card, result):
+        for listener in self.listeners:
+            listener.fight_resolved(game, red_card, blue_card, result)
+
+    def move_timed_out(self, game, timeout):
+        for listener in self.listeners:
+            listener.move_timed_out(game, timeout)
+
+    def game_over(self, game):
+        for listener in self.listeners:
+            listener.game_over(game)
+
+    def match_progress(self, game):
+        for listener in self.listeners:
+            listener.match_progress(game)
+
+    def match_over(self):
+        for listener in self.listeners:
+            listener.match_over()
+
+    def close(self):
+        for listener in self.listeners:
+            listener.close()
+
+
+class ConsoleListener(GameListener):
+    ''' Prints games the way the command line always has: every fight of every game, or only a letter per game
+    when games are quiet. Game details are written as they happen, since a human may be playing; the letters are
+    written in batches.
+    '''
+    def __init__(self, quiet_games=True, batch_size=100, out=None):
+        '''
+        :param quiet_games: if True, print one letter per game (the winner's initial, or t for a tie) instead of
+            every fight
+        '''
+        self.quiet_games = quiet_games
+        self.batch_size = batch_size
+        self.out = out or sys.stdout
+        self._progress = []
+
+    def match_started(self, red_brain_name, blue_brain_name):
+        self.out.write('\n')
+
+    def spy_revealed(self, game, spy_color, revealed_card):
+        if not self.quiet_games:
+            print >> self.out, '{} spy reveals {}'.format(spy_color.name.title(), revealed_card.name)
+
+    def fight_resolved(self, game, red_card, blue_card, result):
+        if not self.quiet_games:
+            print >> self.out, 'red {} vs. blue {} -> {}'.format(redify(red_card.name), blueify(blue_card.name),
+                                                                result.name)
+            print >> self.out, game.score_summary
+
+    def move_timed_out(self, game, timeout):
+        if not self.quiet_games:
+            print >> self.out, timeout, '- forfeit!'
+
+    def game_over(self, game):
+        if not self.quiet_games:
+            if game.winner:
+                print >> self.out, game.winner.name.title(), 'wins!'
+            else:
+                print >> self.out, 'tie!'
+            print >> self.out  # extra newline for readability
+
+    def match_progress(self, game):
+        if self.quiet_games:
+            self._progress.append(getattr(game.winner, 'name', 'tie')[0])
+            if len(self._progress) >= self.batch_size:
+                self._flush_progress()
+
+    def match_over(self):
+        self._flush_progress()
+        self.out.write('\n')
+
+    def _flush_progress(self):
+        self.out.write(''.join(self._progress))
+        self.out.flush()
+        self._progress = []
+
+    def close(self):
+        self._flush_progress()
+
+
+class JsonlListener(GameListener):
+    ''' Writes events to a file as JSON lines, batch_size events at a time. Games are numbered in the order they
+    start; cards are ints and colors are names.
+    '''
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        self._file = open(path, 'a')
+        self.batch_size = batch_size
+        self._events = []
+        self._game_number = 0
+        self._game_numbers = {}  # {id(game): game number}
+
+    def _add(self, event, **fields):
+        fields['event'] = event
+        self._events.append(json.dumps(fields))
+        if len(self._events) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._events:
+            self._file.write('\n'.join(self._events) + '\n')
+            self._events = []
+
+    def _number(self, game):
+        return self._game_numbers.get(id(game))
+
+    def match_started(self, red_brain_name, blue_brain_name):
+        self._add('match_started', red=red_brain_name, blue=blue_brain_name)
+
+    def game_started(self, game):
+        self._game_numbers[id(game)] = self._game_number
+        self._add('game_started', game=self._game_number)
+        self._game_number += 1
+
+    def spy_revealed(self, game, spy_color, revealed_card):
+        self._add('spy_revealed', game=self._number(game), spy=spy_color.name, card=int(revealed_card))
+
+    def fight_resolved(self, game, red_card, blue_card, result):
+        self._add('fight', game=self._number(game), red=int(red_card), blue=int(blue_card), result=result.name,
+                  red_points=game.red_points, blue_points=game.blue_points)
+
+    def move_timed_out(self, game, timeout):
+        self._add('move_timed_out', game=self._number(game), color=timeout.color.name, message=str(timeout))
+
+    def game_over(self, game):
+        self._add('game_over', game=self._number(game), winner=getattr(game.winner, 'name', None))
+
+    def match_progress(self, game):
+        if id(game) in self._game_numbers:
+            del self._game_numbers[id(game)]
+        else:
+            # Played outside play_game, so there was no game_over event
+            self._add('game_over', game=None, winner=getattr(game.winner, 'name', None))
+
+    def match_over(self):
+        self._add('match_over')
+        self._flush()
+
+    def close(self):
+        self._flush()
+        self._file.close()
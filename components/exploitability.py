@@ -0,0 +1,262 @@
+from collections import Counter
+import math
+from multiprocessing import Pool
+import random
+import zlib
+
+from components.brain_management import get_brain_func
+from components.cards import Card, Color
+from components.compact_game import HAND_CARDS, CompactGameStatus, hand_mask_from_str
+from components.fight import resolve_fight
+from components.game_status import GameStatus
+from components.player import Player
+
+# Number of times a brain is asked for its card in each position, to estimate the odds of each card
+DEFAULT_SAMPLES = 16
+# Number of independent sets of samples the best response is scored on, once it has chosen its cards on another set
+DEFAULT_EVALUATIONS = 4
+
+_CARDS = list(Card)
+
+
+def _score(game, color):
+    ''' Final score of a finished game for one player: 1 for a win, 0.5 for a tie, 0 for a loss
+    '''
+    winner = game.winner
+    return 0.5 if winner is None else float(winner == color)
+
+
+class BestResponse(object):
+    ''' Exhaustive search for the best way to play against a fixed brain.
+    Brains whose function has a card_odds attribute give their exact odds of playing each card: card_odds is a
+    function of (player, game, spied_card), like the brain function, returning a list of (card, probability).
+    Other brains' odds are estimated by asking them `samples` times. A best response chosen and scored on the same
+    estimates is biased up, since it exploits their sampling noise as much as the brain, so the best response chooses
+    its cards on sample set 0, and is scored on `evaluations` more sets, sampled independently. Each of those gives
+    an unbiased estimate of the chosen cards' score, which is at most the true best response's score, and their spread
+    gives the sampling error.
+    Odds are memoized by what the brain can observe: the position (as CompactGameStatus.state_key) and the card its
+    spy revealed, if any. Brains are assumed to choose from the position alone, not from the order of the fights that
+    led to it or from earlier games; each question goes to a fresh Player, so brains that keep state on their player
+    start over every time.
+    The random module is seeded from the seed, the position and the sample set before the brain is asked about it, so
+    searches with the same seed estimate the same odds for a position, however they reach it.
+    '''
+    def __init__(self, brain_fn, brain_color, initial_red_hand_str=None, initial_blue_hand_str=None,
+                 samples=DEFAULT_SAMPLES, seed=0, evaluations=DEFAULT_EVALUATIONS):
+        '''
+        :param brain_color: Color the brain plays; the best response plays the other one
+        :param evaluations: number of sample sets the best response is scored on; at least 2, for the sampling error.
+            Not used with exact odds.
+        '''
+        self.brain_fn = brain_fn
+        self.brain_color = brain_color
+        self.color = Color.blue if brain_color == Color.red else Color.red
+        self.initial_hand_strs = (initial_red_hand_str, initial_blue_hand_str)
+        self.samples = samples
+        self.seed = seed
+        self.card_odds_fn = getattr(brain_fn, 'card_odds', None)
+        if self.card_odds_fn is None and evaluations < 2:
+            raise ValueError('The sampling error needs at least 2 evaluations')
+        # Sample set 0 chooses the best response's cards, and the others score them
+        self.sample_sets = 1 if self.card_odds_fn else 1 + evaluations
+        self.values = {}  # {(state key, sample set): best response's expected score}
+        self.brain_odds = {}  # {(state key, spied card, sample set): [(card, probability)]}
+        self.brain_queries = 0
+
+    def initial_game(self):
+        return CompactGameStatus(*[hand_mask_from_str(hand_str) for hand_str in self.initial_hand_strs])
+
+    def _game_status(self, game):
+        ''' GameStatus with the same fights as a CompactGameStatus, for asking the brain
+        '''
+        game_status = GameStatus(*self.initial_hand_strs)
+        for red_card, blue_card in game.all_fights:
+            resolve_fight(_CARDS[red_card], _CARDS[blue_card], game_status)
+        return game_status
+
+    def _brain_player(self, game):
+        brain_player = Player(self.brain_color, self.brain_fn)
+        hand = game.red_hand if self.brain_color == Color.red else game.blue_hand
+        brain_player.hand = [_CARDS[card] for card in HAND_CARDS[hand]]
+        return brain_player
+
+    def _odds(self, game, spied_card, sample_set=0):
+        ''' :return: list of (int card, probability) the brain plays in a position
+        '''
+        if self.card_odds_fn:
+            sample_set = 0
+        key = (game.state_key, spied_card, sample_set)
+        odds = self.brain_odds.get(key)
+        if odds is None:
+            game_status = self._game_status(game)
+            spied = None if spied_card is None else _CARDS[spied_card]
+            if self.card_odds_fn:
+                self.brain_queries += 1
+                odds = [(int(card), probability)
+                        for card, probability in self.card_odds_fn(self._brain_player(game), game_status, spied)]
+            else:
+                random.seed(zlib.crc32('{}:{}:{}:{}:{}'.format(self.seed, self.brain_color, key[0], spied_card,
+                                                               sample_set)))
+                counts = Counter()
+                for _ in range(self.samples):
+                    counts[int(self._brain_player(game).choose_and_play_card(game_status, spied))] += 1
+                self.brain_queries += self.samples
+                odds = [(card, float(count) / self.samples) for card, count in counts.iteritems()]
+            self.brain_odds[key] = odds
+        return odds
+
+    def child_value(self, game, my_card, brain_card, sample_set=0):
+        ''' :return: value of the position after a fight, with cards given as ints
+        '''
+        red_card, blue_card = (my_card, brain_card) if self.color == Color.red else (brain_card, my_card)
+        game.apply(red_card, blue_card)
+        try:
+            return self.value(game, sample_set)
+        finally:
+            game.undo()
+
+    def _choice(self, game, my_cards, brain_card=None):
+        ''' :return: the card the best response plays in a position, chosen on sample set 0
+        :param brain_card: the brain's card, if our spy has revealed it
+        '''
+        if brain_card is not None:
+            return max(my_cards, key=lambda my_card: self.child_value(game, my_card, brain_card))
+        brain_spied = game.spy_table[game.prev] == self.brain_color
+        return max(my_cards, key=lambda my_card: sum(
+            probability * self.child_value(game, my_card, card)
+            for card, probability in self._odds(game, my_card if brain_spied else None)
+        ))
+
+    def value(self, game, sample_set=0):
+        ''' :return: expected score of the best response from a position, 1 for a win and 0.5 for a tie, with the
+        brain's odds from a sample set. The best response's cards are always chosen on sample set 0.
+        '''
+        if game.is_over:
+            return _score(game, self.color)
+        key = (game.state_key, sample_set)
+        value = self.values.get(key)
+        if value is None:
+            my_cards = HAND_CARDS[game.red_hand if self.color == Color.red else game.blue_hand]
+            spy_color = game.spy_table[game.prev]
+            if spy_color == self.color:
+                # We see the brain's card before choosing ours
+                value = sum(
+                    probability * self.child_value(game, self._choice(game, my_cards, brain_card), brain_card,
+                                                   sample_set)
+                    for brain_card, probability in self._odds(game, None, sample_set)
+                )
+            else:
+                # If the brain's spy worked, it sees our card before choosing its own
+                my_card = self._choice(game, my_cards)
+                value = sum(
+                    probability * self.child_value(game, my_card, brain_card, sample_set)
+                    for brain_card, probability in self._odds(game, my_card if spy_color == self.brain_color
+                                                              else None, sample_set)
+                )
+            self.values[key] = value
+        return value
+
+    def score(self):
+        ''' :return: (best response's expected score from the start of the game, its standard error). With sampled
+        odds, that's the mean of its values on the evaluation sample sets, and the error comes from their spread.
+        '''
+        game = self.initial_game()
+        if self.sample_sets == 1:
+            return self.value(game), 0.0
+        values = [self.value(game, sample_set) for sample_set in range(1, self.sample_sets)]
+        mean = sum(values) / len(values)
+        variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+        return mean, math.sqrt(variance / len(values))
+
+
+# Each worker process's BestResponses, kept between the subtrees it searches so that they share one memo:
+# {(brain name, brain color, initial hand strs, samples, seed, evaluations): BestResponse}
+_worker_best_responses = {}
+
+
+def _first_fight_values((brain_name, brain_color, red_hand_str, blue_hand_str, samples, seed, evaluations,
+                         my_card, brain_card)):
+    ''' Process pool worker: best response values after one first fight, in every sample set
+    :return: (brain_color, my_card, brain_card, [value in each sample set], brain queries)
+    '''
+    key = (brain_name, brain_color, red_hand_str, blue_hand_str, samples, seed, evaluations)
+    if key not in _worker_best_responses:
+        _worker_best_responses[key] = BestResponse(get_brain_func(brain_name), brain_color, red_hand_str,
+                                                   blue_hand_str, samples, seed, evaluations)
+    best_response = _worker_best_responses[key]
+    queries_before = best_response.brain_queries
+    game = best_response.initial_game()
+    values = [best_response.child_value(game, my_card, brain_card, sample_set)
+              for sample_set in range(best_response.sample_sets)]
+    return brain_color, my_card, brain_card, values, best_response.brain_queries - queries_before
+
+
+def best_response_scores(brain_name, initial_red_hand_str=None, initial_blue_hand_str=None,
+                         samples=DEFAULT_SAMPLES, processes=None, seed=0, evaluations=DEFAULT_EVALUATIONS):
+    ''' Best response to a brain with it playing each color. Games are split by their first fight, and the subtrees
+    are searched in a process pool. Subtrees can reach the same positions through fights played in a different order,
+    so each worker process keeps a single memo for every subtree it searches; positions reached in more than one
+    process are searched again, but get the same odds, since those are sampled with a seed derived from the position.
+    :param brain_name: unprefixed brain name, looked up with get_brain_func
+    :param samples: number of times the brain is asked for its card in each position, in each sample set
+    :param seed: base RNG seed
+    :param evaluations: number of sample sets the best response is scored on (see BestResponse)
+    :return: ({brain Color: best response's expected score against it}, {brain Color: standard error of the score},
+        number of brain queries)
+    '''
+    best_responses = {}
+    tasks = []
+    for brain_color in Color:
+        best_response = best_responses[brain_color] = BestResponse(
+            get_brain_func(brain_name), brain_color, initial_red_hand_str, initial_blue_hand_str, samples, seed,
+            evaluations)
+        game = best_response.initial_game()
+        if game.is_over:
+            continue
+        # Nobody has a spy working before the first fight
+        brain_cards = set(brain_card for sample_set in range(best_response.sample_sets)
+                          for brain_card, _ in best_response._odds(game, None, sample_set))
+        tasks.extend(
+            (brain_name, brain_color, initial_red_hand_str, initial_blue_hand_str, samples, seed, evaluations,
+             my_card, brain_card)
+            for my_card in HAND_CARDS[game.red_hand if best_response.color == Color.red else game.blue_hand]
+            for brain_card in sorted(brain_cards)
+        )
+
+    num_queries = sum(best_response.brain_queries for best_response in best_responses.itervalues())
+    pool = Pool(processes)
+    try:
+        for brain_color, my_card, brain_card, values, queries in pool.imap_unordered(_first_fight_values, tasks):
+            # Fill in the memo of the position after the first fight, so that score only searches the first fight
+            best_response = best_responses[brain_color]
+            game = best_response.initial_game()
+            red_card, blue_card = (my_card, brain_card) if best_response.color == Color.red else (brain_card, my_card)
+            game.resolve_fight(red_card, blue_card)
+            if not game.is_over:
+                for sample_set, value in enumerate(values):
+                    best_response.values[(game.state_key, sample_set)] = value
+            num_queries += queries
+    finally:
+        pool.close()
+        pool.join()
+
+    scores, errors = {}, {}
+    for brain_color, best_response in best_responses.iteritems():
+        scores[brain_color], errors[brain_color] = best_response.score()
+    return scores, errors, num_queries
+
+
+def exploitability(scores):
+    ''' How much a best response gains against a brain: its average score over both colors, less 0.5. With equal
+    hands, 0 means the brain can't be beaten on average, and 0.5 means it always loses to the best response.
+    :param scores: {brain Color: best response's expected score}, as returned by best_response_scores
+    '''
+    return sum(scores.itervalues()) / len(scores) - 0.5
+
+
+def exploitability_error(errors):
+    ''' Standard error of exploitability(scores)
+    :param errors: {brain Color: standard error of the best response's score}, as returned by best_response_scores
+    '''
+    return math.sqrt(sum(error * error for error in errors.itervalues())) / len(errors)
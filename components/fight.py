@@ -1,8 +1,5 @@
-from enum import IntEnum
-import itertools
-from components.cards import Card, Color, initial_hand
-
-FightResult = IntEnum('FightResult', 'red_wins red_wins_2 blue_wins blue_wins_2 on_hold red_wins_game blue_wins_game')
+from components.cards import Card
+from components.rules import NO_CARD, NUM_CARDS, NUM_PREVS, PREV_BASE, VANILLA, FightResult
 
 
 def _short_format_result(fight_result_):
@@ -13,74 +10,24 @@ def _short_format_result(fight_result_):
         FightResult.blue_wins: 'b',
         FightResult.red_wins_2: 'r2',
         FightResult.blue_wins_2: 'b2',
-        FightResult.on_hold: 'h'
+        FightResult.on_hold: 'h',
+        FightResult.red_wins_game: 'rg',
+        FightResult.blue_wins_game: 'bg',
     }[fight_result_]
 
 
 def fight_result(red_card, blue_card, prev_red_card, prev_blue_card):
-    ''' The main game engine. Figures out what the result of played cards should be.
+    ''' The main game engine. Figures out what the result of played cards should be, under the vanilla rules (see
+    rules.standard_fight_result for the card powers).
     :return: a FightResult
     '''
-    #5. Wizard - nullifies opponent's power
-    blue_has_power = red_card != Card.wizard
-    red_has_power = blue_card != Card.wizard
-
-    #0. Musician - round is put on hold
-    if red_has_power and red_card == Card.musician:
-        return FightResult.on_hold
-    if blue_has_power and blue_card == Card.musician:
-        return FightResult.on_hold
-
-    #1. Princess - wins against prince
-    if red_has_power and red_card == Card.princess and blue_card == Card.prince:
-        return FightResult.red_wins_game
-    if blue_has_power and blue_card == Card.princess and red_card == Card.prince:
-        return FightResult.blue_wins_game
-
-    #7. Prince - you win the round
-    if red_has_power and red_card == Card.prince and blue_card != Card.prince:
-        return FightResult.red_wins
-    if blue_has_power and blue_card == Card.prince and red_card != Card.prince:
-        return FightResult.blue_wins
-
-    #6. General - next round, your card gets +2 strength
-    if prev_red_card == Card.general and prev_blue_card not in [Card.wizard, Card.musician]:
-        red_value = red_card.value + 2
-    else:
-        red_value = red_card.value
-    if prev_blue_card == Card.general and prev_red_card not in [Card.wizard, Card.musician]:
-        blue_value = blue_card.value + 2
-    else:
-        blue_value = blue_card.value
-
-    #3. Assassin - Lowest strength wins
-    modifier = -1 if (red_has_power and red_card == Card.assassin)\
-                  or (blue_has_power and blue_card == Card.assassin) else 1
-
-    if modifier * red_value > modifier * blue_value:
-        #4. Ambassador - win with this counts as 2 victories
-        if red_has_power and red_card == Card.ambassador:
-            return FightResult.red_wins_2
-        return FightResult.red_wins
-    elif modifier * red_value < modifier * blue_value:
-        #4. Ambassador - win with this counts as 2 victories
-        if blue_has_power and blue_card == Card.ambassador:
-            return FightResult.blue_wins_2
-        return FightResult.blue_wins
-    else:
-        return FightResult.on_hold
-
-
-# Cache off all possible values of fight_result for a fetch-speed gain
-QUICK_FIGHT_RESULT = {
-    cards_: fight_result(*cards_)
-    for cards_ in itertools.product(*[initial_hand()]*2 + [initial_hand() + [None]] * 2)
-}
+    return VANILLA.fight_result(red_card, blue_card, prev_red_card, prev_blue_card)
 
 
-def print_results_table(red_general_played=False):
+def print_results_table(red_general_played=False, rules=VANILLA):
     ''' Prints a results table similar to that provided with the Brave Rats card game.
     :param red_general_played: if True,
+    :param rules: RuleSet to print the results of
     :return: None; output is printed to stdout
     '''
     format_cell = '{}'.format
@@ -93,7 +40,7 @@ def print_results_table(red_general_played=False):
         print '\t'.join(
             ['r=' + format_cell(red_card.value)] +  # Row header
             [
-                format_cell(_short_format_result(fight_result(red_card, blue_card, previous_red, None)))
+                format_cell(_short_format_result(rules.fight_result(red_card, blue_card, previous_red, None)))
                 for blue_card in Card
             ]
         )
@@ -107,9 +54,12 @@ def resolve_fight(red_card, blue_card, game):
     '''
     previous_red_card, previous_blue_card = game.most_recent_fight
 
-    # Using QUICK_FIGHT_RESULT is equivalent to this, but all the answers have been cached off
-    # result = fight_result(red_card, blue_card, previous_red_card, previous_blue_card)
-    result = QUICK_FIGHT_RESULT[(red_card, blue_card, previous_red_card, previous_blue_card)]
+    # Equivalent to game.rules.fight_result(...), with the table index (see rules.fight_index) inlined
+    result = game.rules.results[
+        (red_card * NUM_CARDS + blue_card) * NUM_PREVS
+        + (NO_CARD if previous_red_card is None else previous_red_card) * PREV_BASE
+        + (NO_CARD if previous_blue_card is None else previous_blue_card)
+    ]
 
     if result is FightResult.on_hold:
         game.on_hold_fights.append((red_card, blue_card))
@@ -136,14 +86,9 @@ def resolve_fight(red_card, blue_card, game):
     return result
 
 
-def successful_spy_color((red_card, blue_card)):
-    ''' Determine whether the provided fight has a non-nullified spy in it
+def successful_spy_color(fight):
+    ''' Determine whether the provided fight has a non-nullified spy in it, under the vanilla rules
     Takes a fight tuple of (red_card, blue_card)
     :return: Color of non-nullified spy, if any, or None if no non-nullified spy.
     '''
-    spy_nullifiers = {Card.musician, Card.wizard, Card.spy}
-    if red_card == Card.spy and blue_card not in spy_nullifiers:
-        return Color.red
-    if blue_card == Card.spy and red_card not in spy_nullifiers:
-        return Color.blue
-    return None
+    return VANILLA.spy_color(fight)
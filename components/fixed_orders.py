@@ -0,0 +1,185 @@
+from itertools import permutations
+import math
+from multiprocessing import Pool
+import os
+
+import numpy as np
+
+from components.batch_sim import FIGHT_TENSOR
+from components.cards import Card
+from components.compact_game import NO_CARD, NUM_CARDS
+from components.fight import FightResult
+from components.game_status import POINTS_TO_WIN
+
+# Every fixed card order, in lexicographic order; a strategy's index in the payoff matrix is its row here
+ORDERS = np.array(list(permutations(range(NUM_CARDS))), dtype=np.int8)
+NUM_ORDERS = len(ORDERS)
+
+# Payoffs stored in the matrix, from red's point of view
+RED_WIN, TIE, BLUE_WIN = 1, 0, -1
+
+DEFAULT_CHUNK_ROWS = 64
+PROGRESS_SUFFIX = '.progress'
+# Most memory expected_payoffs spends on temporaries: the int8 columns it picks out of a chunk of rows, and their
+# float64 upcast in the dot product
+PAYOFF_CHUNK_BYTES = 64 * 1024 * 1024
+
+# FIGHT_TENSOR flattened, indexed by (red_card * NUM_CARDS + blue_card) * _PREV_SIZE + prev_red * PREV_BASE + prev_blue
+_PREV_SIZE = FIGHT_TENSOR.shape[2] * FIGHT_TENSOR.shape[3]
+_FLAT_FIGHTS = FIGHT_TENSOR.reshape(-1)
+_PREV_BASE = FIGHT_TENSOR.shape[3]
+
+
+def _gain_table(wins, wins_2, wins_game):
+    # Winning by princess just needs to reach POINTS_TO_WIN, which keeps points small enough for int16
+    table = np.zeros(len(FightResult) + 1, dtype=np.int16)
+    table[wins], table[wins_2], table[wins_game] = 1, 2, POINTS_TO_WIN
+    return table
+
+
+_RED_GAIN = _gain_table(FightResult.red_wins, FightResult.red_wins_2, FightResult.red_wins_game)
+_BLUE_GAIN = _gain_table(FightResult.blue_wins, FightResult.blue_wins_2, FightResult.blue_wins_game)
+
+
+def order_index(order_str):
+    ''' :param order_str: cards in the order they're played, eg. '76543210'
+    :return: index of the order in ORDERS
+    '''
+    cards = [int(card) for card in order_str]
+    if sorted(cards) != range(NUM_CARDS):
+        raise ValueError('{!r} is not an order of all {} cards'.format(order_str, NUM_CARDS))
+    # Lexicographic rank of the permutation
+    index = 0
+    remaining = range(NUM_CARDS)
+    for position, card in enumerate(cards):
+        rank = remaining.index(card)
+        remaining.pop(rank)
+        index += rank * math.factorial(NUM_CARDS - 1 - position)
+    return index
+
+
+def order_str(index):
+    return ''.join(str(card) for card in ORDERS[index])
+
+
+def play_orders(red_orders, blue_orders):
+    ''' Plays every red order against every blue order. Fixed orders never look at a spied card, so a spy only
+    changes who chooses first, not which cards are played.
+    :param red_orders: int8 array of shape (num red orders, NUM_CARDS)
+    :param blue_orders: int8 array of shape (num blue orders, NUM_CARDS)
+    :return: int8 array of RED_WIN/TIE/BLUE_WIN of shape (num red orders, num blue orders)
+    '''
+    shape = (len(red_orders), len(blue_orders))
+    red_points = np.zeros(shape, dtype=np.int16)
+    blue_points = np.zeros(shape, dtype=np.int16)
+    on_hold_points = np.zeros(shape, dtype=np.int16)
+    prev = np.full(shape, NO_CARD * _PREV_BASE + NO_CARD, dtype=np.int16)
+    over = np.zeros(shape, dtype=bool)
+
+    for fight in range(NUM_CARDS):
+        red_cards = red_orders[:, fight].astype(np.int16)[:, np.newaxis]
+        blue_cards = blue_orders[:, fight].astype(np.int16)[np.newaxis, :]
+        results = _FLAT_FIGHTS[(red_cards * NUM_CARDS + blue_cards) * _PREV_SIZE + prev]
+        red_gain, blue_gain = _RED_GAIN[results], _BLUE_GAIN[results]
+        # Games that are already over keep their score
+        red_points += np.where(over | (red_gain == 0), 0, red_gain + on_hold_points)
+        blue_points += np.where(over | (blue_gain == 0), 0, blue_gain + on_hold_points)
+        both_ambassadors = (red_cards == Card.ambassador) & (blue_cards == Card.ambassador)
+        on_hold_points = np.where(results == FightResult.on_hold, on_hold_points + 1 + both_ambassadors, 0)
+        prev = red_cards * _PREV_BASE + blue_cards
+        over |= (red_points >= POINTS_TO_WIN) | (blue_points >= POINTS_TO_WIN)
+
+    payoffs = np.full(shape, TIE, dtype=np.int8)
+    payoffs[blue_points >= POINTS_TO_WIN] = BLUE_WIN
+    payoffs[red_points >= POINTS_TO_WIN] = RED_WIN
+    return payoffs
+
+
+def open_matrix(path, mode='r'):
+    ''' :return: the payoff matrix memmap, of shape (NUM_ORDERS, NUM_ORDERS); rows are red orders
+    '''
+    return np.memmap(path, dtype=np.int8, mode=mode, shape=(NUM_ORDERS, NUM_ORDERS))
+
+
+def _compute_chunk((path, start, stop)):
+    ''' Process pool worker: fills rows start:stop of the matrix
+    '''
+    matrix = open_matrix(path, 'r+')
+    matrix[start:stop] = play_orders(ORDERS[start:stop], ORDERS)
+    matrix.flush()
+    return start
+
+
+def compute_matrix(path, processes=None, chunk_rows=DEFAULT_CHUNK_ROWS, progress_fn=None):
+    ''' Computes the payoff matrix of every fixed order against every other, chunk_rows rows at a time over a
+    process pool. Finished chunks are recorded in a progress file next to the matrix, so an interrupted run picks
+    up where it left off.
+    :param progress_fn: optional function called with (chunks done, total chunks) as chunks finish
+    '''
+    if not os.path.exists(path):
+        open_matrix(path, 'w+').flush()
+    starts = range(0, NUM_ORDERS, chunk_rows)
+    progress_path = path + PROGRESS_SUFFIX
+    if os.path.exists(progress_path) and os.path.getsize(progress_path) != len(starts):
+        raise ValueError('{} was written with a different chunk size'.format(progress_path))
+    progress = np.memmap(progress_path, dtype=np.uint8, mode='r+' if os.path.exists(progress_path) else 'w+',
+                         shape=(len(starts),))
+    chunks = [(path, start, min(start + chunk_rows, NUM_ORDERS))
+              for chunk, start in enumerate(starts) if not progress[chunk]]
+    pool = Pool(processes)
+    try:
+        for start in pool.imap_unordered(_compute_chunk, chunks):
+            progress[start // chunk_rows] = 1
+            progress.flush()
+            if progress_fn:
+                progress_fn(int(progress.sum()), len(starts))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _row_chunks(num_rows, chunk_rows):
+    for start in range(0, num_rows, chunk_rows):
+        yield start, min(start + chunk_rows, num_rows)
+
+
+def expected_payoffs(matrix, blue_strategy, max_bytes=PAYOFF_CHUNK_BYTES):
+    ''' Expected payoff of every red order against a mixed strategy of blue orders
+    :param blue_strategy: {order index: probability}
+    :param max_bytes: memory budget for the temporaries of each chunk of rows
+    :return: float array of NUM_ORDERS payoffs, from red's point of view
+    '''
+    columns = np.array(sorted(blue_strategy))
+    probabilities = np.array([blue_strategy[column] for column in columns])
+    bytes_per_row = len(columns) * (matrix.itemsize + probabilities.itemsize)
+    chunk_rows = max(1, max_bytes // max(1, bytes_per_row))
+    payoffs = np.empty(NUM_ORDERS)
+    for start, stop in _row_chunks(NUM_ORDERS, chunk_rows):
+        payoffs[start:stop] = matrix[start:stop][:, columns].dot(probabilities)
+    return payoffs
+
+
+def best_response(matrix, opponent_strategy):
+    ''' Best fixed order against a mixed strategy of fixed orders. The rules are the same for both colors, so a
+    red order's payoff against blue is also what that order gets as blue against the same order as red.
+    :param opponent_strategy: {order index: probability}
+    :return: (order index, expected payoff)
+    '''
+    payoffs = expected_payoffs(matrix, opponent_strategy)
+    best = int(payoffs.argmax())
+    return best, float(payoffs[best])
+
+
+def dominated_rows(matrix, reference_rows, chunk_rows=256):
+    ''' Finds the orders weakly dominated by any of the reference orders: never better against any opponent
+    order, and worse against at least one. Dominated orders can be pruned before solving the matrix game.
+    :param reference_rows: order indexes to compare against
+    :return: bool array, True for each dominated order (reference orders don't dominate themselves)
+    '''
+    references = np.asarray(matrix[sorted(reference_rows)])
+    dominated = np.zeros(NUM_ORDERS, dtype=bool)
+    for start, stop in _row_chunks(NUM_ORDERS, chunk_rows):
+        rows = np.asarray(matrix[start:stop])
+        for reference in references:
+            dominated[start:stop] |= (rows <= reference).all(axis=1) & (rows < reference).any(axis=1)
+    return dominated
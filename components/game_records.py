@@ -0,0 +1,182 @@
+import struct
+
+import numpy as np
+
+from components.cards import Color
+from components.compact_game import BITS_PER_CARD, BITS_PER_FIGHT, CARD_BITS_MASK, NUM_CARDS, hand_mask_from_str
+from components.game_status import MAX_ROUNDS_IN_GAME
+
+# A game record is one little-endian uint64: the fights packed as in CompactGameStatus.history (6 bits per fight,
+# red card in the low 3 bits), then the number of fights, then the winner (0 for a tie, else the Color value)
+FIGHTS_BITS = MAX_ROUNDS_IN_GAME * BITS_PER_FIGHT
+NUM_FIGHTS_SHIFT = FIGHTS_BITS
+NUM_FIGHTS_MASK = 0xf
+WINNER_SHIFT = NUM_FIGHTS_SHIFT + 4
+WINNER_MASK = 0x3
+RECORD_DTYPE = np.dtype('<u8')
+
+# File header: magic, format version, initial hand masks, and brain names (padded with NULs)
+MAGIC = 'BRATREC\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHBB4x24s24s')
+HEADER_SIZE = HEADER.size
+
+# Number of records processed at once by GameRecordReader, to bound memory use
+READ_CHUNK_SIZE = 1 << 22
+
+
+class BadRecordFile(Exception):
+    pass
+
+
+def pack_game(game):
+    ''' Packs a finished GameStatus into a record
+    '''
+    record = 0
+    fights = game.all_fights
+    for n, (red_card, blue_card) in enumerate(fights):
+        record |= (int(red_card) | (int(blue_card) << BITS_PER_CARD)) << (n * BITS_PER_FIGHT)
+    return record | (len(fights) << NUM_FIGHTS_SHIFT) | (int(game.winner or 0) << WINNER_SHIFT)
+
+
+def pack_compact_game(game):
+    ''' Packs a finished CompactGameStatus into a record
+    '''
+    return game.history | (game.num_fights << NUM_FIGHTS_SHIFT) | (int(game.winner or 0) << WINNER_SHIFT)
+
+
+def _field(records, shift, mask):
+    ''' Extracts a bit field from an array of records, as an index array
+    '''
+    # Shift by numpy uint64s, since numpy won't mix uint64 arrays with Python ints
+    return ((records >> np.uint64(shift)) & np.uint64(mask)).astype(np.intp)
+
+
+class GameRecordWriter(object):
+    ''' Streams game records to a file. Use as a context manager, or call close() when done.
+    '''
+    def __init__(self, path, red_brain_name='', blue_brain_name='',
+                 initial_red_hand_str=None, initial_blue_hand_str=None, buffer_size=1 << 16):
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION,
+            hand_mask_from_str(initial_red_hand_str), hand_mask_from_str(initial_blue_hand_str),
+            red_brain_name, blue_brain_name,
+        ))
+
+    def write_record(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def write(self, game):
+        ''' Records a finished GameStatus
+        '''
+        self.write_record(pack_game(game))
+
+    def write_compact(self, game):
+        ''' Records a finished CompactGameStatus
+        '''
+        self.write_record(pack_compact_game(game))
+
+    def flush(self):
+        np.array(self._buffer, dtype=RECORD_DTYPE).tofile(self._file)
+        self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class GameRecordReader(object):
+    ''' Memory-maps a game record file, for computing stats over more games than fit in memory
+    '''
+    def __init__(self, path):
+        with open(path, 'rb') as record_file:
+            header = record_file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise BadRecordFile('{} is too short to be a game record file'.format(path))
+        magic, version, self.red_hand, self.blue_hand, red_name, blue_name = HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise BadRecordFile('{} is not a version {} game record file'.format(path, FORMAT_VERSION))
+        self.red_brain_name, self.blue_brain_name = red_name.rstrip('\x00'), blue_name.rstrip('\x00')
+        self.path = path
+        try:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE)
+        except ValueError:
+            # numpy refuses to map zero records
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _chunks(self):
+        for start in range(0, len(self.records), READ_CHUNK_SIZE):
+            yield self.records[start:start + READ_CHUNK_SIZE]
+
+    @staticmethod
+    def _winners(records):
+        return _field(records, WINNER_SHIFT, WINNER_MASK)
+
+    @staticmethod
+    def _cards(records, turn, color):
+        ''' Card played by color in the given turn of each record, or NUM_CARDS if the game was already over
+        '''
+        shift = turn * BITS_PER_FIGHT + (BITS_PER_CARD if color == Color.blue else 0)
+        cards = _field(records, shift, CARD_BITS_MASK)
+        cards[_field(records, NUM_FIGHTS_SHIFT, NUM_FIGHTS_MASK) <= turn] = NUM_CARDS
+        return cards
+
+    def win_counts(self):
+        ''' :return: (red wins, ties, blue wins)
+        '''
+        counts = np.zeros(3, dtype=np.int64)
+        for records in self._chunks():
+            counts += np.bincount(self._winners(records), minlength=3)
+        return int(counts[Color.red]), int(counts[0]), int(counts[Color.blue])
+
+    def win_counts_by_opening(self):
+        ''' :return: {(red's first card, blue's first card): (red wins, ties, blue wins)}
+        '''
+        counts = np.zeros((NUM_CARDS + 1, NUM_CARDS + 1, 3), dtype=np.int64)
+        for records in self._chunks():
+            np.add.at(counts, (self._cards(records, 0, Color.red), self._cards(records, 0, Color.blue),
+                               self._winners(records)), 1)
+        return {
+            (red_card, blue_card): (int(counts[red_card, blue_card, Color.red]),
+                                    int(counts[red_card, blue_card, 0]),
+                                    int(counts[red_card, blue_card, Color.blue]))
+            for red_card in range(NUM_CARDS)
+            for blue_card in range(NUM_CARDS)
+            if counts[red_card, blue_card].any()
+        }
+
+    def card_usage(self, color):
+        ''' How often each card was played in each turn
+        :param color: Color of the player to count cards for
+        :return: int array of counts indexed by [turn, card]
+        '''
+        usage = np.zeros((MAX_ROUNDS_IN_GAME, NUM_CARDS + 1), dtype=np.int64)
+        for records in self._chunks():
+            for turn in range(MAX_ROUNDS_IN_GAME):
+                usage[turn] += np.bincount(self._cards(records, turn, color), minlength=NUM_CARDS + 1)
+        return usage[:, :NUM_CARDS]
+
+    def game_lengths(self):
+        ''' :return: int array of how many games lasted each number of fights
+        '''
+        lengths = np.zeros(MAX_ROUNDS_IN_GAME + 1, dtype=np.int64)
+        for records in self._chunks():
+            lengths += np.bincount(_field(records, NUM_FIGHTS_SHIFT, NUM_FIGHTS_MASK),
+                                   minlength=MAX_ROUNDS_IN_GAME + 1)
+        return lengths
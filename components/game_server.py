@@ -0,0 +1,396 @@
+import asynchat
+import asyncore
+from collections import Counter
+import heapq
+import json
+import os
+import socket
+from timeit import default_timer
+
+from components.brain_host import BrainHost
+from components.brain_workers import EngineGame
+from components.cards import Card, Color
+from components.fight import resolve_fight, successful_spy_color
+from components.latency import LatencyHistogram
+from components.player import Player
+
+# Messages are JSON objects, one per line. Cards are ints, colors are 'red' or 'blue' and game ids are ints.
+# Client to server:
+PLAY = 'play'  # games: number of games to play, concurrency: max games at once, color: optional color to play
+CARD = 'card'  # game, card: answer to a CHOOSE
+# Server to client:
+START = 'start'  # game, color, hand: a new game, with the client's starting hand
+CHOOSE = 'choose'  # game, spied_card: choose a card; spied_card is the opponent's card if the client's spy worked
+FIGHT = 'fight'  # game, red, blue, result, red_points, blue_points: a fight was played
+END = 'end'  # game, winner (None for a tie), forfeited_by
+DONE = 'done'  # every game asked for in the last PLAY is over
+ERROR = 'error'  # message
+
+# Opponent setting that pairs clients against each other instead of against a brain hosted by the server
+REMOTE_OPPONENT = 'remote'
+
+DEFAULT_MOVE_TIMEOUT = 5.0  # seconds
+# A connection isn't read from while this many messages to it are waiting to be sent
+DEFAULT_MAX_PENDING_MESSAGES = 1024
+MAX_LINE_LENGTH = 4096
+
+# Seconds asyncore waits for a socket event before the server checks for expired moves
+_POLL_INTERVAL = 0.05
+
+
+def parse_address(address):
+    ''' :param address: 'unix:/path/to/socket' or 'host:port'
+    :return: (socket family, address)
+    '''
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, port = address.rsplit(':', 1)
+    return socket.AF_INET, (host, int(port))
+
+
+class _JsonLineChannel(asynchat.async_chat):
+    ''' A connection carrying JSON line messages, which stops reading while too many replies are waiting to be
+    sent, so a client that doesn't read can't make the other end buffer without limit
+    '''
+    def __init__(self, sock, socket_map, max_pending_messages):
+        asynchat.async_chat.__init__(self, sock, map=socket_map)
+        self.set_terminator('\n')
+        self.max_pending_messages = max_pending_messages
+        self._line = []
+        self._line_length = 0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        asynchat.async_chat.close(self)
+
+    def readable(self):
+        return len(self.producer_fifo) < self.max_pending_messages
+
+    def collect_incoming_data(self, data):
+        self._line.append(data)
+        self._line_length += len(data)
+        if self._line_length > MAX_LINE_LENGTH:
+            self.handle_close()
+
+    def found_terminator(self):
+        line, self._line, self._line_length = ''.join(self._line), [], 0
+        try:
+            message = json.loads(line)
+            self.handle_message(message['type'], message)
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_message(ERROR, message='Bad message {!r}: {}'.format(line, e))
+
+    def send_message(self, message_type, **fields):
+        ''' Queues a message, unless the connection is closed. Messages queued while connecting are sent once
+        the connection is up.
+        '''
+        if not self.closed:
+            fields['type'] = message_type
+            self.push(json.dumps(fields) + '\n')
+
+    def handle_message(self, message_type, message):
+        raise NotImplementedError
+
+
+class _ClientConnection(_JsonLineChannel):
+    ''' The server's end of a connection with a remote brain
+    '''
+    def __init__(self, sock, server):
+        _JsonLineChannel.__init__(self, sock, server.socket_map, server.max_pending_messages)
+        self.server = server
+        self.games_wanted = self.games_started = 0
+        self.concurrency = 1
+        self.color = None  # Color asked for, or None to alternate
+        self.active = set()  # ids of games in progress
+        self.queued = 0  # games waiting for a remote opponent
+
+    def handle_message(self, message_type, message):
+        if message_type == PLAY:
+            self.server.request_games(self, int(message['games']), int(message.get('concurrency', 1)),
+                                      message.get('color'))
+        elif message_type == CARD:
+            self.server.receive_card(self, int(message['game']), int(message['card']))
+        else:
+            raise ValueError('unknown message type')
+
+    def handle_close(self):
+        self.close()
+        self.server.connection_lost(self)
+
+
+class _ServerGame(EngineGame):
+    def __init__(self, game_id, seats):
+        '''
+        :param seats: {Color: _ClientConnection, or Player for a brain hosted by the server}
+        '''
+        EngineGame.__init__(self, game_id, None, None)
+        self.seats = seats
+        self.deadlines = {}  # {Color: time by which the remote player must answer}
+
+
+class GameServer(asyncore.dispatcher):
+    ''' Plays games between remote brains, connected over TCP or a Unix socket, and either a brain hosted by the
+    server or other remote brains. Every game runs the same way as brave_rats.play_game: remote brains see the
+    same information brain functions do, spies choose after the revealed card, and brains that cheat, disconnect
+    or run out of time forfeit. One process serves thousands of games at once, since no game blocks on a client.
+    '''
+    def __init__(self, address, opponent_brain_fn=None, move_timeout=DEFAULT_MOVE_TIMEOUT,
+                 max_pending_messages=DEFAULT_MAX_PENDING_MESSAGES):
+        '''
+        :param address: 'unix:/path/to/socket' or 'host:port'
+        :param opponent_brain_fn: brain function playing against remote brains, or None to pair remote brains
+            against each other
+        :param move_timeout: max seconds a remote brain may take to choose a card, or None for no limit
+        '''
+        self.socket_map = {}
+        asyncore.dispatcher.__init__(self, map=self.socket_map)
+        family, self.address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)
+        self.create_socket(family, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(self.address)
+        self.listen(128)
+
+        self.opponent_brain_fn = opponent_brain_fn
+        self.move_timeout = move_timeout
+        self.max_pending_messages = max_pending_messages
+        self.games = {}  # {game id: _ServerGame}
+        self.next_game_id = 0
+        self.waiting = []  # connections waiting for a remote opponent, one entry per game
+        self.move_deadlines = []  # heap of (deadline, game id, Color)
+        # Connections to start more games for once the current event is handled. Starting them from the loop
+        # rather than from _end_game keeps games that end at once, eg. when a hosted brain fails, from nesting calls.
+        self.pending_fills = []
+        self.results = Counter()  # {winner Color or None: count}
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            _ClientConnection(pair[0], self)
+
+    def serve_forever(self):
+        while True:
+            asyncore.loop(timeout=_POLL_INTERVAL, use_poll=True, map=self.socket_map, count=1)
+            self._expire_moves()
+            self._fill_pending()
+
+    def request_games(self, connection, num_games, concurrency, color=None):
+        connection.games_wanted = connection.games_started + num_games
+        connection.concurrency = max(concurrency, 1)
+        connection.color = Color[color] if color else None
+        self._fill(connection)
+
+    def _fill(self, connection):
+        ''' Starts games for a connection until it's playing as many as it asked for at once
+        '''
+        while (not connection.closed and connection.games_started < connection.games_wanted
+               and len(connection.active) + connection.queued < connection.concurrency):
+            color = connection.color or (Color.red if connection.games_started % 2 == 0 else Color.blue)
+            connection.games_started += 1
+            if self.opponent_brain_fn:
+                opponent_color = Color.blue if color == Color.red else Color.red
+                self._start_game({color: connection, opponent_color: Player(opponent_color, self.opponent_brain_fn)})
+                continue
+            # Pair with the first connection waiting for an opponent, other than this one
+            opponent = next((other for other in self.waiting if other is not connection), None)
+            if opponent is None:
+                self.waiting.append(connection)
+                connection.queued += 1
+            else:
+                self.waiting.remove(opponent)
+                opponent.queued -= 1
+                self._start_game({Color.red: opponent, Color.blue: connection})
+        if (connection.games_started == connection.games_wanted and not connection.active
+                and not connection.queued):
+            connection.send_message(DONE)
+
+    def _fill_pending(self):
+        while self.pending_fills:
+            self._fill(self.pending_fills.pop(0))
+
+    def _start_game(self, seats):
+        game = _ServerGame(self.next_game_id, seats)
+        self.next_game_id += 1
+        self.games[game.game_id] = game
+        for color, seat in seats.iteritems():
+            if isinstance(seat, _ClientConnection):
+                seat.active.add(game.game_id)
+                seat.send_message(START, game=game.game_id, color=color.name, hand=sorted(game.hands[color]))
+        self._next_fight(game)
+
+    def _next_fight(self, game):
+        if game.status.is_over or not (game.hands[Color.red] and game.hands[Color.blue]):
+            self._end_game(game)
+            return
+        spy_color = successful_spy_color(game.status.most_recent_fight)
+        if spy_color is None:
+            for color in (Color.red, Color.blue):
+                self._ask(game, color)
+                if game.game_id not in self.games:
+                    return
+        else:
+            # The revealed player chooses first, as in brave_rats._get_played_cards
+            self._ask(game, Color.blue if spy_color == Color.red else Color.red)
+
+    def _ask(self, game, color, spied_card=None):
+        seat = game.seats[color]
+        if isinstance(seat, Player):
+            try:
+                card = int(seat.choose_and_play_card(game.status, None if spied_card is None else Card(spied_card)))
+            except Exception as e:
+                self.log_info('{} brain failed in game {}: {}'.format(color.name, game.game_id, e), 'error')
+                game.status.forfeit(color)
+                self._end_game(game)
+                return
+            self._card_chosen(game, color, card)
+            return
+        seat.send_message(CHOOSE, game=game.game_id, spied_card=spied_card)
+        if self.move_timeout is not None:
+            deadline = default_timer() + self.move_timeout
+            game.deadlines[color] = deadline
+            heapq.heappush(self.move_deadlines, (deadline, game.game_id, color))
+
+    def receive_card(self, connection, game_id, card):
+        game = self.games.get(game_id)
+        color = None
+        if game:
+            color = next((color for color, seat in game.seats.iteritems() if seat is connection), None)
+        if color is None or color in game.cards or (
+                color == successful_spy_color(game.status.most_recent_fight) and not game.cards):
+            connection.send_message(ERROR, message='Not expecting a card in game {}'.format(game_id))
+            return
+        game.deadlines.pop(color, None)
+        self._card_chosen(game, color, card)
+
+    def _card_chosen(self, game, color, card):
+        if not game.take_card(color, card):
+            self._end_game(game)
+            return
+        if Color.red not in game.cards or Color.blue not in game.cards:
+            spy_color = successful_spy_color(game.status.most_recent_fight)
+            if spy_color is not None:
+                self._ask(game, spy_color, card)
+            return
+
+        red_card, blue_card = game.cards[Color.red], game.cards[Color.blue]
+        game.cards = {}
+        result = resolve_fight(Card(red_card), Card(blue_card), game.status)
+        for seat in game.seats.itervalues():
+            if isinstance(seat, _ClientConnection):
+                seat.send_message(FIGHT, game=game.game_id, red=red_card, blue=blue_card, result=result.name,
+                                  red_points=game.status.red_points, blue_points=game.status.blue_points)
+        self._next_fight(game)
+
+    def _expire_moves(self):
+        now = default_timer()
+        while self.move_deadlines and self.move_deadlines[0][0] <= now:
+            deadline, game_id, color = heapq.heappop(self.move_deadlines)
+            game = self.games.get(game_id)
+            if game and game.deadlines.get(color) == deadline:
+                game.status.forfeit(color)
+                self._end_game(game)
+
+    def _end_game(self, game):
+        del self.games[game.game_id]
+        winner = game.status.winner
+        self.results[winner] += 1
+        forfeited_by = game.status.forfeited_by
+        for seat in game.seats.itervalues():
+            if isinstance(seat, Player):
+                try:
+                    seat.notify_game_over(game.status)
+                except Exception as e:
+                    self.log_info('Brain failed at the end of game {}: {}'.format(game.game_id, e), 'error')
+        for seat in set(game.seats.itervalues()):
+            if isinstance(seat, _ClientConnection):
+                seat.active.discard(game.game_id)
+                seat.send_message(END, game=game.game_id, winner=getattr(winner, 'name', None),
+                                  forfeited_by=getattr(forfeited_by, 'name', None))
+                if seat not in self.pending_fills:
+                    self.pending_fills.append(seat)
+
+    def connection_lost(self, connection):
+        ''' Forfeits the disconnected brain's games
+        '''
+        connection.games_wanted = connection.games_started
+        while connection in self.waiting:
+            self.waiting.remove(connection)
+        for game_id in list(connection.active):
+            game = self.games.get(game_id)
+            if game:
+                color = next(color for color, seat in game.seats.iteritems() if seat is connection)
+                game.status.forfeit(color)
+                self._end_game(game)
+
+
+class _LoadClientConnection(_JsonLineChannel):
+    ''' One connection of the load generator, playing a brain through a BrainHost
+    '''
+    def __init__(self, load_client, num_games, concurrency):
+        _JsonLineChannel.__init__(self, None, load_client.socket_map, load_client.max_pending_messages)
+        self.load_client = load_client
+        self.host = BrainHost(load_client.brain_fn)
+        self.num_games, self.concurrency = num_games, concurrency
+        self.colors, self.game_starts = {}, {}  # {game id: Color}, {game id: start time}
+        self.done = False
+        family, address = parse_address(load_client.address)
+        self.create_socket(family, socket.SOCK_STREAM)
+        self.connect(address)
+        self.send_message(PLAY, games=num_games, concurrency=concurrency)
+
+    def handle_message(self, message_type, message):
+        if message_type == CHOOSE:
+            self.send_message(CARD, game=message['game'], card=self.host.choose(message['game'],
+                                                                                message['spied_card']))
+        elif message_type == FIGHT:
+            self.host.record_fight(message['game'], message['red'], message['blue'])
+        elif message_type == START:
+            color = Color[message['color']]
+            self.colors[message['game']] = color
+            self.game_starts[message['game']] = default_timer()
+            self.host.start_game(message['game'], color)
+        elif message_type == END:
+            game_id = message['game']
+            self.load_client.game_times.add(default_timer() - self.game_starts.pop(game_id))
+            color = self.colors.pop(game_id)
+            winner = message['winner']
+            self.load_client.results['tie' if winner is None else 'win' if winner == color.name else 'loss'] += 1
+            self.host.end_game(game_id)
+        elif message_type == DONE:
+            self.done = True
+            self.close()
+        elif message_type == ERROR:
+            self.load_client.errors += 1
+
+    def handle_close(self):
+        self.done = True
+        self.close()
+
+
+class LoadClient(object):
+    ''' Load generator for GameServer: plays a brain over many connections and games at once, and reports
+    throughput and game times
+    '''
+    def __init__(self, address, brain_fn, num_connections=4, games_per_connection=1000, concurrency=256,
+                 max_pending_messages=DEFAULT_MAX_PENDING_MESSAGES):
+        self.address, self.brain_fn = address, brain_fn
+        self.num_connections, self.games_per_connection = num_connections, games_per_connection
+        self.concurrency, self.max_pending_messages = concurrency, max_pending_messages
+        self.socket_map = {}
+        self.results = Counter()  # {'win', 'tie' or 'loss': count}, from the client brain's point of view
+        self.game_times = LatencyHistogram()
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def run(self):
+        start = default_timer()
+        connections = [
+            _LoadClientConnection(self, self.games_per_connection, self.concurrency)
+            for _ in range(self.num_connections)
+        ]
+        while not all(connection.done for connection in connections):
+            asyncore.loop(timeout=_POLL_INTERVAL, use_poll=True, map=self.socket_map, count=1)
+        self.elapsed = default_timer() - start
+        return self
@@ -1,4 +1,5 @@
 from components.cards import Card, Color, initial_hand
+from components.rules import VANILLA
 
 # Game ends when players have played all of their cards, so the max number of rounds
 # in the game is the size of the players' initial hand.
@@ -7,13 +8,35 @@ POINTS_TO_WIN = 4
 
 
 class GameStatus(object):
-    def __init__(self):
+    def __init__(self, initial_red_hand_str=None, initial_blue_hand_str=None, rules=VANILLA):
+        '''
+        :param initial_red_hand_str: string of card values in red's initial hand, or None for all cards
+        :param initial_blue_hand_str: same as initial_red_hand_str, for blue
+        :param rules: RuleSet the game is played with
+        '''
+        self.rules = rules
         self.red_points, self.blue_points = 0, 0
+        self.initial_hands = {'red': initial_red_hand_str, 'blue': initial_blue_hand_str}
+        # The game ends when either player runs out of cards
+        self.max_rounds = min(len(initial_hand(initial_red_hand_str)), len(initial_hand(initial_blue_hand_str)))
 
         # List of tuples of (red_card, blue_card)
         self.resolved_fights = []  # Doesn't include on hold fights; use all_fights for full list
         self.on_hold_fights = []
 
+        # Color of the player who forfeited the game, if any
+        self.forfeited_by = None
+
+    def forfeit(self, color):
+        ''' Ends the game with a win for the opponent of the player of the given color
+        '''
+        self.forfeited_by = color
+        # Max out the opponent's score, the same as a win by princess
+        if color == Color.red:
+            self.blue_points = 999999
+        else:
+            self.red_points = 999999
+
     @property
     def on_hold_points(self):
         two_pointers = [
@@ -33,7 +56,7 @@ class GameStatus(object):
     @property
     def is_over(self):
         # The game is over if somebody has won or if the players are out of cards
-        return self.winner or len(self.all_fights) == MAX_ROUNDS_IN_GAME
+        return self.winner or len(self.all_fights) == self.max_rounds
 
     @property
     def all_fights(self):
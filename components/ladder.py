@@ -0,0 +1,133 @@
+import json
+import math
+import os
+
+DEFAULT_RATING = 1500.0
+DEFAULT_RD = 350.0
+MIN_RD = 30.0
+
+_Q = math.log(10) / 400
+
+
+def _g(rd):
+    ''' Glicko's discount for the uncertainty of an opponent's rating
+    '''
+    return 1 / math.sqrt(1 + 3 * (_Q * rd / math.pi) ** 2)
+
+
+def expected_score(rating, opponent_rating, opponent_rd):
+    ''' Expected score per game (1 for a win, 0.5 for a tie) against an opponent
+    '''
+    return 1 / (1 + 10 ** (-_g(opponent_rd) * (rating - opponent_rating) / 400))
+
+
+class Rating(object):
+    ''' A Glicko rating: an estimate of a brain's strength, and the standard deviation (RD) of that estimate
+    '''
+    def __init__(self, rating=DEFAULT_RATING, rd=DEFAULT_RD, games=0):
+        self.rating, self.rd, self.games = rating, rd, games
+
+    def to_json(self):
+        return {'rating': self.rating, 'rd': self.rd, 'games': self.games}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['rating'], data['rd'], data['games'])
+
+    def _information(self, opponent, num_games):
+        ''' Fisher information about this rating from num_games games against opponent
+        '''
+        expected = expected_score(self.rating, opponent.rating, opponent.rd)
+        return num_games * (_Q * _g(opponent.rd)) ** 2 * expected * (1 - expected)
+
+    def variance_reduction(self, opponent, num_games):
+        ''' Expected drop in the variance of this rating after playing num_games games against opponent
+        '''
+        variance = self.rd ** 2
+        return variance - 1 / (1 / variance + self._information(opponent, num_games))
+
+    def updated(self, opponent, score, num_games):
+        ''' Glicko update for one rating period of games against a single opponent
+        :param score: total score over the games, 1 for each win and 0.5 for each tie
+        :return: new Rating
+        '''
+        expected = expected_score(self.rating, opponent.rating, opponent.rd)
+        precision = 1 / self.rd ** 2 + self._information(opponent, num_games)
+        rating = self.rating + _Q / precision * _g(opponent.rd) * (score - num_games * expected)
+        return Rating(rating, max(math.sqrt(1 / precision), MIN_RD), self.games + num_games)
+
+
+class Ladder(object):
+    ''' Ratings for a pool of brains, updated one match at a time, and saved as JSON so the ladder can be resumed
+    and new brains can join without replaying old matches.
+    Rather than playing every pair, the ladder schedules the matches expected to shrink rating uncertainty most:
+    games between brains with uncertain ratings and evenly matched ones.
+    '''
+    def __init__(self, path=None):
+        '''
+        :param path: JSON state file, loaded if it exists
+        '''
+        self.path = path
+        self.ratings = {}  # {brain name: Rating}
+        self.matches_played = 0
+        if path and os.path.exists(path):
+            with open(path) as state_file:
+                state = json.load(state_file)
+            self.ratings = {str(name): Rating.from_json(data) for name, data in state['ratings'].iteritems()}
+            self.matches_played = state['matches_played']
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as state_file:
+            json.dump({
+                'ratings': {name: rating.to_json() for name, rating in self.ratings.iteritems()},
+                'matches_played': self.matches_played,
+            }, state_file, indent=2, sort_keys=True)
+        os.rename(temp_path, self.path)
+
+    def add_brain(self, name):
+        ''' Adds a brain with the default, very uncertain rating, unless it's already rated
+        '''
+        if name not in self.ratings:
+            self.ratings[name] = Rating()
+
+    def information_gain(self, name_a, name_b, num_games):
+        ''' Expected total drop in rating variance from a match of num_games games between two brains
+        '''
+        rating_a, rating_b = self.ratings[name_a], self.ratings[name_b]
+        return rating_a.variance_reduction(rating_b, num_games) + rating_b.variance_reduction(rating_a, num_games)
+
+    def next_matches(self, names, num_games, max_matches=1):
+        ''' Picks the most informative matches among the given brains, using each brain at most once
+        :return: list of (name, name) pairs, best first
+        '''
+        pairs = sorted(
+            ((self.information_gain(name_a, name_b, num_games), name_a, name_b)
+             for i, name_a in enumerate(names) for name_b in names[i + 1:]),
+            reverse=True,
+        )
+        matches, busy = [], set()
+        for _, name_a, name_b in pairs:
+            if len(matches) == max_matches:
+                break
+            if name_a not in busy and name_b not in busy:
+                matches.append((name_a, name_b))
+                busy.update((name_a, name_b))
+        return matches
+
+    def record_match(self, name_a, name_b, wins_a, ties, wins_b):
+        ''' Updates both brains' ratings with the result of a match between them
+        '''
+        num_games = wins_a + ties + wins_b
+        if not num_games:
+            return
+        rating_a, rating_b = self.ratings[name_a], self.ratings[name_b]
+        self.ratings[name_a] = rating_a.updated(rating_b, wins_a + 0.5 * ties, num_games)
+        self.ratings[name_b] = rating_b.updated(rating_a, wins_b + 0.5 * ties, num_games)
+        self.matches_played += 1
+
+    def standings(self):
+        ''' :return: list of (name, Rating), best first, ranked by a conservative estimate of strength
+        '''
+        return sorted(self.ratings.iteritems(), key=lambda (name, rating): rating.rating - 2 * rating.rd,
+                      reverse=True)
@@ -0,0 +1,104 @@
+import math
+
+# What happens to a brain that takes longer than its move time budget
+RANDOM_CARD = 'random'  # its choice is replaced by a random card from its hand
+FORFEIT = 'forfeit'  # it forfeits the game
+TIMEOUT_POLICIES = (RANDOM_CARD, FORFEIT)
+
+
+class MoveTimeout(Exception):
+    def __init__(self, color, elapsed):
+        super(MoveTimeout, self).__init__('{} took {:.6f}s to choose a card'.format(color.name, elapsed))
+        self.color = color
+
+
+class LatencyHistogram(object):
+    ''' Log-scale histogram of call latencies. Bucket 0 counts calls under 1 microsecond,
+    and bucket n counts calls taking 2**(n-1) to 2**n microseconds.
+    '''
+    NUM_BUCKETS = 40
+
+    def __init__(self):
+        self.buckets = [0] * self.NUM_BUCKETS
+        self.count, self.total, self.max = 0, 0.0, 0.0
+
+    def add(self, seconds):
+        microseconds = seconds * 1e6
+        bucket = 0 if microseconds < 1 else min(int(math.log(microseconds, 2)) + 1, self.NUM_BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        ''' :return: upper bound, in seconds, of the bucket holding the given percentile
+        '''
+        if not self.count:
+            return 0.0
+        threshold = self.count * percent / 100.0
+        seen = 0
+        for bucket, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= threshold:
+                return min(2 ** bucket * 1e-6, self.max)
+        return self.max
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return '{:.1f}us'.format(seconds * 1e6)
+    if seconds < 1:
+        return '{:.1f}ms'.format(seconds * 1e3)
+    return '{:.2f}s'.format(seconds)
+
+
+class BrainTimer(object):
+    ''' Latency stats for one brain, and the time budget it is held to.
+    Pass one to Player to have it time every call to the brain function.
+    '''
+    def __init__(self, name='', move_time_budget=None, on_timeout=RANDOM_CARD):
+        '''
+        :param name: brain name, for reporting
+        :param move_time_budget: max seconds a brain may take to choose a card, or None for no limit. Brains run
+            in-process and can't be interrupted, so the budget is enforced once the brain returns.
+        :param on_timeout: RANDOM_CARD or FORFEIT
+        '''
+        if on_timeout not in TIMEOUT_POLICIES:
+            raise ValueError('on_timeout must be one of {}'.format(TIMEOUT_POLICIES))
+        self.name = name
+        self.move_time_budget = move_time_budget
+        self.on_timeout = on_timeout
+        self.moves = LatencyHistogram()
+        self.game_over = LatencyHistogram()  # Calls made when the game is over
+        self.timeouts = 0
+
+    def merge(self, other):
+        self.moves.merge(other.moves)
+        self.game_over.merge(other.game_over)
+        self.timeouts += other.timeouts
+
+    def record_move(self, elapsed):
+        ''' :return: True if the move went over budget
+        '''
+        self.moves.add(elapsed)
+        if self.move_time_budget is not None and elapsed > self.move_time_budget:
+            self.timeouts += 1
+            return True
+        return False
+
+    def summary(self):
+        return '{}: {} moves, mean {}, p50 {}, p99 {}, max {}; game over p99 {}; {} timeouts'.format(
+            self.name, self.moves.count, format_seconds(self.moves.mean),
+            format_seconds(self.moves.percentile(50)), format_seconds(self.moves.percentile(99)),
+            format_seconds(self.moves.max), format_seconds(self.game_over.percentile(99)), self.timeouts,
+        )
@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+from components.cards import Card, Color
+
+_FULL_HAND = (1 << len(Card)) - 1
+
+# What a player can see of the game when choosing a card, from that player's side: "opponent" fields are about the
+# other player. Built once per move, out of tuples and ints, so brains can't change the game through it.
+#   color: the player's Color
+#   hand: tuple of the Cards in the player's hand
+#   hand_mask, opponent_hand_mask: cards left in each hand, as 8-bit masks (bit n set = card n in hand)
+#   points, opponent_points: scores
+#   on_hold_points: points going to the winner of the next fight that isn't put on hold
+#   fights: tuple of (my card, opponent card) for every fight so far, in the order played
+#   last_fight: the last of fights, or (None, None) before the first fight
+#   spy_color: Color of the player whose spy worked in the last fight, or None
+#   spied_card: the card the opponent revealed to my spy, or None
+#   is_over, winner: as in GameStatus
+#   rules: RuleSet the game is played with
+Observation = namedtuple('Observation', [
+    'color', 'hand', 'hand_mask', 'opponent_hand_mask',
+    'points', 'opponent_points', 'on_hold_points',
+    'fights', 'last_fight', 'spy_color', 'spied_card',
+    'is_over', 'winner', 'rules',
+])
+
+
+def takes_observation(brain_fn):
+    ''' Decorator for brain functions that take a single Observation instead of (player, game, spied_card):
+
+        @takes_observation
+        def burninator_brain_fn(observation):
+            ...
+
+    They're called the same way as other brains, once per move and once after the game is over.
+    '''
+    brain_fn.takes_observation = True
+    return brain_fn
+
+
+def _mask(cards):
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+
+def _initial_mask(hand_str):
+    return _mask(int(x) for x in hand_str) if hand_str else _FULL_HAND
+
+
+def observe(player, game, spied_card=None):
+    ''' :return: the Observation of a game by one of its players. Reads the game's fight lists once, rather than
+    going through its properties, which rebuild them.
+    '''
+    all_fights = game.resolved_fights + game.on_hold_fights
+    most_recent_fight = all_fights[-1] if all_fights else (None, None)
+    if player.color == Color.red:
+        opponent = Color.blue
+        fights = tuple(all_fights)
+        points, opponent_points = game.red_points, game.blue_points
+    else:
+        opponent = Color.red
+        fights = tuple((blue_card, red_card) for red_card, blue_card in all_fights)
+        points, opponent_points = game.blue_points, game.red_points
+    winner = game.winner
+    return Observation(
+        color=player.color,
+        hand=tuple(player.hand),
+        hand_mask=_mask(player.hand),
+        opponent_hand_mask=(_initial_mask(game.initial_hands[opponent.name])
+                            & ~_mask(opponent_card for _, opponent_card in fights)),
+        points=points,
+        opponent_points=opponent_points,
+        on_hold_points=game.on_hold_points,
+        fights=fights,
+        last_fight=fights[-1] if fights else (None, None),
+        spy_color=game.rules.spy_color(most_recent_fight),
+        spied_card=spied_card,
+        is_over=bool(winner) or len(all_fights) == game.max_rounds,
+        winner=winner,
+        rules=game.rules,
+    )
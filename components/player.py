@@ -1,4 +1,9 @@
+import random
+from timeit import default_timer
+
 from components import cards
+from components.latency import FORFEIT, MoveTimeout
+from components.observation import observe
 
 
 class CheatingException(Exception):
@@ -6,7 +11,7 @@ class CheatingException(Exception):
 
 
 class Player(object):
-    def __init__(self, color, brain_fn, hand_str=None):
+    def __init__(self, color, brain_fn, hand_str=None, timer=None):
         '''
         :param color: a Color enum value indicating which color this player is playing for
         :param game: a GameStatus object
@@ -19,17 +24,35 @@ class Player(object):
                 player has revealed to play.
             Should return a card from its hand to play. Can harbor hidden powers; should be expected to be called
                 exactly once per round.
+            Brains decorated with observation.takes_observation instead take a single Observation of the game.
         :param hand_str: string of card values in initial hand (eg. '0123456' to play without Prince)
+        :param timer: optional BrainTimer which records how long brain_fn takes and enforces its time budget
         '''
         self.hand = cards.initial_hand(hand_str)
         self.color = color
         self.card_choosing_fn = brain_fn
+        self.takes_observation = getattr(brain_fn, 'takes_observation', False)
+        self.timer = timer
 
     def has_cards(self):
         return bool(len(self.hand))
 
+    def _call_brain(self, game, spied_card):
+        if self.takes_observation:
+            return self.card_choosing_fn(observe(self, game, spied_card))
+        return self.card_choosing_fn(self, game, spied_card)
+
     def choose_and_play_card(self, game, spied_card=None):
-        card = self.card_choosing_fn(self, game, spied_card)
+        if self.timer:
+            start = default_timer()
+            card = self._call_brain(game, spied_card)
+            elapsed = default_timer() - start
+            if self.timer.record_move(elapsed):
+                if self.timer.on_timeout == FORFEIT:
+                    raise MoveTimeout(self.color, elapsed)
+                card = random.choice(self.hand)
+        else:
+            card = self._call_brain(game, spied_card)
         if card not in self.hand:
             raise CheatingException('Tried to play card {} which is not in hand'.format(card))
         self.hand.remove(card)
@@ -37,4 +60,9 @@ class Player(object):
 
     def notify_game_over(self, game):
         # Call the brain function and give it a chance to clean up now that the game's over
-        self.card_choosing_fn(self, game, None)
+        if self.timer:
+            start = default_timer()
+            self._call_brain(game, None)
+            self.timer.game_over.add(default_timer() - start)
+        else:
+            self._call_brain(game, None)
@@ -0,0 +1,122 @@
+import sqlite3
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS matchups (
+    red TEXT NOT NULL,
+    blue TEXT NOT NULL,
+    target_games INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    red_wins INTEGER NOT NULL DEFAULT 0,
+    ties INTEGER NOT NULL DEFAULT 0,
+    blue_wins INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (red, blue)
+);
+CREATE INDEX IF NOT EXISTS matchups_by_blue ON matchups (blue);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    red TEXT NOT NULL,
+    blue TEXT NOT NULL,
+    winner TEXT,
+    red_points INTEGER NOT NULL,
+    blue_points INTEGER NOT NULL,
+    fights TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_matchup ON games (red, blue);
+'''
+
+
+def game_row(game):
+    ''' Per-game row for ResultsStore.record: (winner color name or None, red points, blue points, fights), with
+    fights as a string of red and blue card values, eg. '0716' for musician vs. prince, then general vs. princess
+    '''
+    return (getattr(game.winner, 'name', None), game.red_points, game.blue_points,
+            ''.join('{}{}'.format(int(red_card), int(blue_card)) for red_card, blue_card in game.all_fights))
+
+
+class ResultsStore(object):
+    ''' Tournament results in an SQLite database, so that a tournament can be resumed after it's interrupted and
+    queried while it runs. Each matchup of a red and a blue brain keeps running totals, which summary queries read
+    through indexes without touching the games; rows for single games are optional.
+    The database uses a write-ahead log, so readers don't block the tournament writing to it.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # With a write-ahead log, this only risks the last transactions on power loss, never corruption
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def completed_matchups(self, target_games):
+        ''' :return: set of (red name, blue name) of matchups that have played all of target_games games
+        '''
+        return set(self._connection.execute(
+            'SELECT red, blue FROM matchups WHERE target_games = ? AND games >= target_games', (target_games,)
+        ))
+
+    def start_matchup(self, red_name, blue_name, target_games):
+        ''' Clears any results of a matchup, ready to play it from the start
+        '''
+        with self._connection:
+            self._connection.execute('DELETE FROM games WHERE red = ? AND blue = ?', (red_name, blue_name))
+            self._connection.execute(
+                'INSERT OR REPLACE INTO matchups (red, blue, target_games) VALUES (?, ?, ?)',
+                (red_name, blue_name, target_games)
+            )
+
+    def record(self, red_name, blue_name, red_wins, ties, blue_wins, game_rows=()):
+        ''' Adds the results of some games of a started matchup, in a single transaction
+        :param game_rows: optional list of game_row() tuples for the games
+        '''
+        with self._connection:
+            self._connection.execute(
+                'UPDATE matchups SET games = games + ?, red_wins = red_wins + ?, ties = ties + ?, '
+                'blue_wins = blue_wins + ? WHERE red = ? AND blue = ?',
+                (red_wins + ties + blue_wins, red_wins, ties, blue_wins, red_name, blue_name)
+            )
+            self._connection.executemany(
+                'INSERT INTO games (red, blue, winner, red_points, blue_points, fights) VALUES (?, ?, ?, ?, ?, ?)',
+                ((red_name, blue_name) + tuple(row) for row in game_rows)
+            )
+
+    def win_table(self):
+        ''' :return: {(red name, blue name): (red wins, ties, blue wins)} of every matchup with games played
+        '''
+        return {
+            (red_name, blue_name): (red_wins, ties, blue_wins)
+            for red_name, blue_name, red_wins, ties, blue_wins in self._connection.execute(
+                'SELECT red, blue, red_wins, ties, blue_wins FROM matchups WHERE games > 0'
+            )
+        }
+
+    def brain_record(self, name):
+        ''' A brain's results against each opponent, playing either color. Games against itself count once, as
+        red's results.
+        :return: {opponent name: (wins, ties, losses)}
+        '''
+        record = {}
+        for opponent, wins, ties, losses in self._connection.execute(
+            'SELECT blue, red_wins, ties, blue_wins FROM matchups WHERE red = ? '
+            'UNION ALL SELECT red, blue_wins, ties, red_wins FROM matchups WHERE blue = ? AND red != ?',
+            (name, name, name)
+        ):
+            total = record.get(opponent, (0, 0, 0))
+            record[opponent] = (total[0] + wins, total[1] + ties, total[2] + losses)
+        return record
+
+    def games(self, red_name, blue_name):
+        ''' :return: list of game_row() tuples recorded for a matchup, in the order they were recorded
+        '''
+        return list(self._connection.execute(
+            'SELECT winner, red_points, blue_points, fights FROM games WHERE red = ? AND blue = ? ORDER BY id',
+            (red_name, blue_name)
+        ))
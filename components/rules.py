@@ -0,0 +1,148 @@
+from enum import IntEnum
+
+from components.cards import Card, Color
+
+FightResult = IntEnum('FightResult', 'red_wins red_wins_2 blue_wins blue_wins_2 on_hold red_wins_game blue_wins_game')
+
+NUM_CARDS = len(Card)
+# Index standing in for "no previous card" in compiled tables
+NO_CARD = NUM_CARDS
+PREV_BASE = NUM_CARDS + 1
+NUM_PREVS = PREV_BASE * PREV_BASE
+
+_CARDS_OR_NONE = list(Card) + [None]
+
+
+def card_index(card):
+    ''' Table index of a Card (or int card), or NO_CARD for None
+    '''
+    return NO_CARD if card is None else int(card)
+
+
+def fight_index(red_card, blue_card, prev):
+    ''' Index into RuleSet.fight_table
+    :param prev: previous fight as card_index(prev_red) * PREV_BASE + card_index(prev_blue)
+    '''
+    return (red_card * NUM_CARDS + blue_card) * NUM_PREVS + prev
+
+
+def standard_fight_result(rules, red_card, blue_card, prev_red_card, prev_blue_card):
+    ''' The card powers of the original game, with card strengths and the general's bonus taken from the rule set.
+    fight.fight_result looks these up in the vanilla rule set's table.
+    :param prev_red_card: Card played by red in the previous fight, or None
+    :return: a FightResult
+    '''
+    # Wizard nullifies the opponent's power
+    red_has_power, blue_has_power = blue_card != Card.wizard, red_card != Card.wizard
+
+    # Musician puts the fight on hold
+    if (red_has_power and red_card == Card.musician) or (blue_has_power and blue_card == Card.musician):
+        return FightResult.on_hold
+
+    # Princess wins the game against the prince
+    if red_has_power and red_card == Card.princess and blue_card == Card.prince:
+        return FightResult.red_wins_game
+    if blue_has_power and blue_card == Card.princess and red_card == Card.prince:
+        return FightResult.blue_wins_game
+
+    # Prince wins the fight
+    if red_has_power and red_card == Card.prince and blue_card != Card.prince:
+        return FightResult.red_wins
+    if blue_has_power and blue_card == Card.prince and red_card != Card.prince:
+        return FightResult.blue_wins
+
+    # General makes your next card stronger, unless the opponent's card nullified it
+    red_value, blue_value = rules.strengths[red_card], rules.strengths[blue_card]
+    if prev_red_card == Card.general and prev_blue_card not in (Card.wizard, Card.musician):
+        red_value += rules.general_bonus
+    if prev_blue_card == Card.general and prev_red_card not in (Card.wizard, Card.musician):
+        blue_value += rules.general_bonus
+
+    # Assassin makes the lowest strength win
+    if (red_has_power and red_card == Card.assassin) or (blue_has_power and blue_card == Card.assassin):
+        red_value, blue_value = -red_value, -blue_value
+
+    # Ambassador's wins count double
+    if red_value > blue_value:
+        return FightResult.red_wins_2 if red_has_power and red_card == Card.ambassador else FightResult.red_wins
+    if red_value < blue_value:
+        return FightResult.blue_wins_2 if blue_has_power and blue_card == Card.ambassador else FightResult.blue_wins
+    return FightResult.on_hold
+
+
+def standard_spy_color(rules, red_card, blue_card):
+    ''' :return: Color of the player whose spy worked in a fight, if any, or None
+    '''
+    spy_nullifiers = (Card.musician, Card.wizard, Card.spy)
+    if red_card == Card.spy and blue_card not in spy_nullifiers:
+        return Color.red
+    if blue_card == Card.spy and red_card not in spy_nullifiers:
+        return Color.blue
+    return None
+
+
+class RuleSet(object):
+    ''' A definition of the cards' powers, compiled into flat tables indexed by ints, so that every rule set,
+    house variants included, plays at the same speed.
+    Variants can change card strengths or the general's bonus, or replace the fight and spy functions entirely;
+    those are only called while compiling.
+    '''
+    def __init__(self, name, strengths=None, general_bonus=2,
+                 fight_fn=standard_fight_result, spy_fn=standard_spy_color):
+        '''
+        :param name: name of the variant
+        :param strengths: strength of each card, indexed by Card value; defaults to the Card values
+        :param general_bonus: strength added to the card played after a general
+        :param fight_fn: function of (rules, red_card, blue_card, prev_red_card, prev_blue_card) returning a
+            FightResult. Previous cards are None before the first fight.
+        :param spy_fn: function of (rules, red_card, blue_card) returning the Color whose spy worked in that
+            fight, or None
+        '''
+        self.name = name
+        self.strengths = tuple(strengths if strengths is not None else (int(card) for card in Card))
+        self.general_bonus = general_bonus
+
+        # FightResult of every fight, indexed by fight_index
+        self.results = tuple(
+            fight_fn(self, red_card, blue_card, prev_red_card, prev_blue_card)
+            for red_card in Card
+            for blue_card in Card
+            for prev_red_card in _CARDS_OR_NONE
+            for prev_blue_card in _CARDS_OR_NONE
+        )
+        # The same as ints, for engines that work on ints
+        self.fight_table = tuple(int(result) for result in self.results)
+        # Color of the successful spy, or None, after each previous fight, indexed by prev
+        self.spy_table = tuple(
+            None if None in (prev_red_card, prev_blue_card) else spy_fn(self, prev_red_card, prev_blue_card)
+            for prev_red_card in _CARDS_OR_NONE
+            for prev_blue_card in _CARDS_OR_NONE
+        )
+
+    def __repr__(self):
+        return 'RuleSet({!r})'.format(self.name)
+
+    def fight_result(self, red_card, blue_card, prev_red_card, prev_blue_card):
+        ''' :return: FightResult of a fight; previous cards may be None
+        '''
+        return self.results[fight_index(int(red_card), int(blue_card),
+                                        card_index(prev_red_card) * PREV_BASE + card_index(prev_blue_card))]
+
+    def spy_color(self, (prev_red_card, prev_blue_card)):
+        ''' Takes a fight tuple of (red_card, blue_card), either of which may be None
+        :return: Color of the player whose spy worked in that fight, if any, or None
+        '''
+        return self.spy_table[card_index(prev_red_card) * PREV_BASE + card_index(prev_blue_card)]
+
+
+VANILLA = RuleSet('vanilla')
+
+# Rule sets selectable by name, eg. from the command line
+VARIANTS = {
+    rules.name: rules
+    for rules in (
+        VANILLA,
+        # House rule: the general gives +3 strength instead of +2
+        RuleSet('strong_general', general_bonus=3),
+    )
+}
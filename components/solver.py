@@ -0,0 +1,248 @@
+from components.cards import Card, Color
+from components.compact_game import (FIGHT_TABLE, FULL_HAND, HAND_CARDS, NO_PREV, NUM_CARDS, PREV_BASE,
+                                     PRINCESS_POINTS, SPY_TABLE)
+from components.fight import FightResult
+from components.game_status import MAX_ROUNDS_IN_GAME, POINTS_TO_WIN
+from components.rules import fight_index
+
+# Tolerance for comparing game values, which are floats
+EPSILON = 1e-9
+
+# Winning a fight is always worth at least 1 point, so with this many points on hold, the next decided fight
+# wins the game and any extra points on hold don't matter
+MAX_USEFUL_ON_HOLD_POINTS = POINTS_TO_WIN - 1
+
+_ON_HOLD = int(FightResult.on_hold)
+_AMBASSADOR = int(Card.ambassador)
+
+# Points gained for each FightResult value, not counting points on hold
+_RED_GAIN = {
+    int(FightResult.red_wins): 1, int(FightResult.red_wins_2): 2, int(FightResult.red_wins_game): PRINCESS_POINTS
+}
+_BLUE_GAIN = {
+    int(FightResult.blue_wins): 1, int(FightResult.blue_wins_2): 2, int(FightResult.blue_wins_game): PRINCESS_POINTS
+}
+
+
+def _swap_prev(prev):
+    prev_red, prev_blue = divmod(prev, PREV_BASE)
+    return prev_blue * PREV_BASE + prev_red
+
+
+def _build_canonical_prev():
+    ''' Previous fights only matter through the General's bonus and the Spy's reveal, so map each previous fight to
+    the lowest previous fight that has exactly the same effect on the next fight.
+    '''
+    representatives = {}
+    canonical = []
+    for prev in range(PREV_BASE * PREV_BASE):
+        effect = (SPY_TABLE[prev],) + tuple(
+            FIGHT_TABLE[fight_index(red_card, blue_card, prev)]
+            for red_card in range(NUM_CARDS)
+            for blue_card in range(NUM_CARDS)
+        )
+        canonical.append(representatives.setdefault(effect, prev))
+    return tuple(canonical)
+
+
+CANONICAL_PREV = _build_canonical_prev()
+
+
+def initial_state(red_hand=FULL_HAND, blue_hand=FULL_HAND):
+    ''' A solver state is a tuple of
+    (red_hand, blue_hand, red_points, blue_points, prev, on_hold_points, rounds_left),
+    with hands as masks and prev as in CompactGameStatus.
+    '''
+    return red_hand, blue_hand, 0, 0, CANONICAL_PREV[NO_PREV], 0, MAX_ROUNDS_IN_GAME
+
+
+def state_from_game(game):
+    ''' Solver state of an unfinished CompactGameStatus
+    '''
+    return (game.red_hand, game.blue_hand, game.red_points, game.blue_points, CANONICAL_PREV[game.prev],
+            min(game.on_hold_points, MAX_USEFUL_ON_HOLD_POINTS), MAX_ROUNDS_IN_GAME - game.num_fights)
+
+
+def swap_colors(state):
+    red_hand, blue_hand, red_points, blue_points, prev, on_hold_points, rounds_left = state
+    return blue_hand, red_hand, blue_points, red_points, CANONICAL_PREV[_swap_prev(prev)], on_hold_points, rounds_left
+
+
+def child_state(state, red_card, blue_card):
+    ''' Plays one fight from a state.
+    :return: (terminal value, None) if the game ends, else (None, child state)
+    '''
+    red_hand, blue_hand, red_points, blue_points, prev, on_hold_points, rounds_left = state
+    result = FIGHT_TABLE[fight_index(red_card, blue_card, prev)]
+    if result == _ON_HOLD:
+        on_hold_points = min(
+            on_hold_points + (2 if red_card == blue_card == _AMBASSADOR else 1), MAX_USEFUL_ON_HOLD_POINTS
+        )
+    else:
+        if result in _RED_GAIN:
+            red_points += _RED_GAIN[result] + on_hold_points
+        else:
+            blue_points += _BLUE_GAIN[result] + on_hold_points
+        on_hold_points = 0
+        if red_points >= POINTS_TO_WIN:
+            return 1.0, None
+        if blue_points >= POINTS_TO_WIN:
+            return -1.0, None
+
+    red_hand ^= 1 << red_card
+    blue_hand ^= 1 << blue_card
+    rounds_left -= 1
+    if not (rounds_left and red_hand and blue_hand):
+        # Out of cards with nobody on 4 points
+        return 0.0, None
+    return None, (red_hand, blue_hand, red_points, blue_points, CANONICAL_PREV[red_card * PREV_BASE + blue_card],
+                  on_hold_points, rounds_left)
+
+
+def _pivot(tableau, objective, row, column):
+    pivot_row = tableau[row]
+    pivot = pivot_row[column]
+    for k in range(len(pivot_row)):
+        pivot_row[k] /= pivot
+    for other_row in tableau + [objective]:
+        if other_row is not pivot_row and other_row[column]:
+            factor = other_row[column]
+            for k in range(len(other_row)):
+                other_row[k] -= factor * pivot_row[k]
+
+
+def solve_matrix_game(matrix):
+    ''' Solves a zero-sum matrix game exactly (up to float rounding) with the simplex method.
+    :param matrix: list of rows of payoffs to the row player, who maximizes
+    :return: (value, row player's mixed strategy, column player's mixed strategy), strategies as lists of probabilities
+    '''
+    num_rows, num_columns = len(matrix), len(matrix[0])
+
+    # Most positions have a saddle point, so try pure strategies first
+    row_mins = [min(row) for row in matrix]
+    column_maxes = [max(row[j] for row in matrix) for j in range(num_columns)]
+    maximin, minimax = max(row_mins), min(column_maxes)
+    if minimax - maximin < EPSILON:
+        best_row, best_column = row_mins.index(maximin), column_maxes.index(minimax)
+        return (maximin,
+                [1.0 if i == best_row else 0.0 for i in range(num_rows)],
+                [1.0 if j == best_column else 0.0 for j in range(num_columns)])
+
+    # Shift payoffs positive, then solve the column player's LP: maximize sum(y) subject to A.y <= 1, y >= 0
+    shift = 1.0 - min(row_mins)
+    tableau = [
+        [payoff + shift for payoff in row] + [1.0 if k == i else 0.0 for k in range(num_rows)] + [1.0]
+        for i, row in enumerate(matrix)
+    ]
+    objective = [-1.0] * num_columns + [0.0] * num_rows + [0.0]
+    basis = [num_columns + i for i in range(num_rows)]
+
+    while True:
+        # Bland's rule: lowest-index improving column, lowest-index basis variable among tied ratios
+        column = next((k for k in range(num_columns + num_rows) if objective[k] < -EPSILON), None)
+        if column is None:
+            break
+        row, best_ratio = None, None
+        for i in range(num_rows):
+            if tableau[i][column] > EPSILON:
+                ratio = tableau[i][-1] / tableau[i][column]
+                if (best_ratio is None or ratio < best_ratio - EPSILON
+                        or (ratio < best_ratio + EPSILON and basis[i] < basis[row])):
+                    row, best_ratio = i, ratio
+        _pivot(tableau, objective, row, column)
+        basis[row] = column
+
+    scale = 1.0 / objective[-1]
+    column_strategy = [0.0] * num_columns
+    for i, variable in enumerate(basis):
+        if variable < num_columns:
+            column_strategy[variable] = tableau[i][-1] * scale
+    # The row player's strategy is the dual solution, read off the slack columns of the objective row
+    row_strategy = [objective[num_columns + i] * scale for i in range(num_rows)]
+    return scale - shift, row_strategy, column_strategy
+
+
+class Solver(object):
+    ''' Computes the game-theoretic value and equilibrium strategies of Brave Rats positions.
+    Values are from red's point of view: 1 for a red win, -1 for a blue win, 0 for a tie.
+    Results are memoized in a transposition table keyed by solver state (see initial_state). Since the rules
+    are symmetric between colors, a state and its color-swapped twin share one entry.
+    '''
+    def __init__(self):
+        # {canonical state: (value, red strategy, blue strategy)}; strategies are tuples of (card, probability),
+        # or None for a player who gets to see the opponent's card thanks to a spy
+        self.table = {}
+
+    def _lookup(self, state):
+        ''' :return: (table key, whether the key is the color-swapped state)
+        '''
+        swapped = swap_colors(state)
+        return (swapped, True) if swapped < state else (state, False)
+
+    def _solve_state(self, state):
+        red_hand, blue_hand = state[0], state[1]
+        red_cards, blue_cards = HAND_CARDS[red_hand], HAND_CARDS[blue_hand]
+        matrix = [[self._child_value(state, red_card, blue_card) for blue_card in blue_cards]
+                  for red_card in red_cards]
+
+        spy_color = SPY_TABLE[state[4]]
+        if spy_color == Color.red:
+            # Blue reveals first, so it plays the card red's best response does the worst with
+            responses = [max(matrix[i][j] for i in range(len(red_cards))) for j in range(len(blue_cards))]
+            value = min(responses)
+            return value, None, ((blue_cards[responses.index(value)], 1.0),)
+        if spy_color == Color.blue:
+            responses = [min(row) for row in matrix]
+            value = max(responses)
+            return value, ((red_cards[responses.index(value)], 1.0),), None
+
+        value, red_strategy, blue_strategy = solve_matrix_game(matrix)
+        return (value,
+                tuple((card, p) for card, p in zip(red_cards, red_strategy) if p > EPSILON),
+                tuple((card, p) for card, p in zip(blue_cards, blue_strategy) if p > EPSILON))
+
+    def _entry(self, state):
+        key, swapped = self._lookup(state)
+        try:
+            entry = self.table[key]
+        except KeyError:
+            entry = self.table[key] = self._solve_state(key)
+        if swapped:
+            value, red_strategy, blue_strategy = entry
+            return -value, blue_strategy, red_strategy
+        return entry
+
+    def _child_value(self, state, red_card, blue_card):
+        terminal_value, child = child_state(state, red_card, blue_card)
+        if child is None:
+            return terminal_value
+        return self._entry(child)[0]
+
+    def value(self, state):
+        ''' Game value of a solver state with optimal play on both sides
+        '''
+        return self._entry(state)[0]
+
+    def strategies(self, state):
+        ''' Equilibrium strategies in a solver state
+        :return: (red strategy, blue strategy), each a dict of {card: probability}, or None for a player who will
+            see the opponent's card first; use best_response for that player
+        '''
+        _, red_strategy, blue_strategy = self._entry(state)
+        return (dict(red_strategy) if red_strategy is not None else None,
+                dict(blue_strategy) if blue_strategy is not None else None)
+
+    def best_response(self, state, color, revealed_card):
+        ''' Best card for a player who knows the card the opponent is about to play
+        :param color: Color of the player to move
+        :param revealed_card: the opponent's int card
+        '''
+        if color == Color.red:
+            return max(HAND_CARDS[state[0]], key=lambda card: self._child_value(state, card, revealed_card))
+        return min(HAND_CARDS[state[1]], key=lambda card: self._child_value(state, revealed_card, card))
+
+    def solve(self, red_hand=FULL_HAND, blue_hand=FULL_HAND):
+        ''' Solves every position reachable from the start of a game
+        :return: value of the game
+        '''
+        return self.value(initial_state(red_hand, blue_hand))
@@ -0,0 +1,38 @@
+import argparse
+from timeit import default_timer
+
+from components.cards import Color
+from components.exploitability import (
+    DEFAULT_EVALUATIONS, DEFAULT_SAMPLES, best_response_scores, exploitability, exploitability_error,
+)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Measure how much a best response can beat brains by')
+    parser.add_argument('brains', nargs='+', help='Brain names to evaluate')
+    parser.add_argument('-s', '--samples', type=int, default=DEFAULT_SAMPLES,
+                        help="Times each brain is asked for its card in each position, in each sample set. More "
+                             "samples find a better response to brains that play at random; unused for brains that "
+                             "give their exact odds")
+    parser.add_argument('-e', '--evaluations', type=int, default=DEFAULT_EVALUATIONS,
+                        help='Independent sample sets the best response is scored on, for its sampling error')
+    parser.add_argument('-p', '--processes', type=int, help='Number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='Base RNG seed')
+    parser.add_argument('-rh', '--initial_red_hand_str', help='Initial red hand as string')
+    parser.add_argument('-bh', '--initial_blue_hand_str', help='Initial blue hand as string')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    for brain_name in args.brains:
+        start = default_timer()
+        scores, errors, num_queries = best_response_scores(
+            brain_name, args.initial_red_hand_str, args.initial_blue_hand_str,
+            samples=args.samples, processes=args.processes, seed=args.seed, evaluations=args.evaluations,
+        )
+        print '{}: exploitability {:.4f} +/- {:.4f} (best response scores {:.4f} +/- {:.4f} vs. red, ' \
+              '{:.4f} +/- {:.4f} vs. blue; {} brain queries in {:.1f}s)'.format(
+                  brain_name, exploitability(scores), exploitability_error(errors),
+                  scores[Color.red], errors[Color.red], scores[Color.blue], errors[Color.blue],
+                  num_queries, default_timer() - start)
@@ -0,0 +1,156 @@
+import argparse
+from collections import Counter
+import csv
+import hashlib
+import inspect
+import json
+from multiprocessing import Pool
+import os
+import random
+import zlib
+
+from brave_rats import play_match
+from components.brain_management import get_brain_func
+from components.cards import Color
+from components.compact_game import FULL_HAND, HAND_CARDS
+
+ALL_HANDS = 'all'
+DEFAULT_CACHE_PATH = '.sweep_cache.jsonl'
+
+
+def all_hand_strs():
+    ''' Every non-empty hand, as hand strings
+    '''
+    return [''.join(str(card) for card in HAND_CARDS[mask]) for mask in range(1, FULL_HAND + 1)]
+
+
+def brain_identity(name):
+    ''' Brain name plus a hash of the source of the module that defines it, so editing a brain invalidates its
+    cached results
+    '''
+    with open(inspect.getsourcefile(get_brain_func(name))) as source_file:
+        return '{}@{}'.format(name, hashlib.sha1(source_file.read()).hexdigest()[:12])
+
+
+def _cell_key(red_identity, blue_identity, red_hand_str, blue_hand_str, num_games, seed):
+    return '|'.join([red_identity, blue_identity, red_hand_str, blue_hand_str, str(num_games), str(seed)])
+
+
+class ResultCache(object):
+    ''' Finished sweep cells, appended to a JSON lines file as they come in, so a re-run only plays missing cells
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.results = {}  # {cell key: (red wins, ties, blue wins)}
+        if os.path.exists(path):
+            with open(path) as cache_file:
+                for line in cache_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interrupted run
+                    self.results[entry['key']] = tuple(entry['result'])
+        self._file = open(path, 'a')
+
+    def add(self, key, result):
+        self.results[key] = result
+        self._file.write(json.dumps({'key': key, 'result': result}) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _play_cell((key, red_name, blue_name, red_hand_str, blue_hand_str, num_games, seed)):
+    ''' Process pool worker: plays one cell of the sweep
+    :return: (cell key, (red wins, ties, blue wins))
+    '''
+    random.seed(zlib.crc32(key) & 0xffffffff)
+    games = play_match(get_brain_func(red_name), get_brain_func(blue_name), num_games=num_games,
+                       initial_red_hand_str=red_hand_str, initial_blue_hand_str=blue_hand_str)
+    win_count = Counter(game.winner for game in games)
+    return key, (win_count[Color.red], win_count[None], win_count[Color.blue])
+
+
+def sweep(red_name, blue_name, red_hand_strs, blue_hand_strs, num_games=100, seed=0, processes=None,
+          cache_path=DEFAULT_CACHE_PATH, progress_fn=None):
+    ''' Plays a match between two brains for every pair of red and blue initial hands, skipping cells already
+    in the result cache
+    :param red_hand_strs: list of red initial hands, as hand strings
+    :param blue_hand_strs: list of blue initial hands
+    :param num_games: number of games per cell
+    :param seed: base seed; each cell's RNG seed is derived from it and the cell
+    :param progress_fn: optional function called with (cells done, total cells) as cells finish
+    :return: list of (red hand str, blue hand str, red wins, ties, blue wins), in hand order
+    '''
+    red_identity, blue_identity = brain_identity(red_name), brain_identity(blue_name)
+    cells = [
+        (_cell_key(red_identity, blue_identity, red_hand_str, blue_hand_str, num_games, seed),
+         red_name, blue_name, red_hand_str, blue_hand_str, num_games, seed)
+        for red_hand_str in red_hand_strs
+        for blue_hand_str in blue_hand_strs
+    ]
+    cache = ResultCache(cache_path)
+    try:
+        missing = [cell for cell in cells if cell[0] not in cache.results]
+        done = len(cells) - len(missing)
+        if missing:
+            pool = Pool(processes)
+            try:
+                for key, result in pool.imap_unordered(_play_cell, missing):
+                    cache.add(key, result)
+                    done += 1
+                    if progress_fn:
+                        progress_fn(done, len(cells))
+            finally:
+                pool.close()
+                pool.join()
+        return [(cell[3], cell[4]) + tuple(cache.results[cell[0]]) for cell in cells]
+    finally:
+        cache.close()
+
+
+def write_csv(rows, output_file):
+    ''' Writes sweep results in long format, one row per cell, ready to pivot into a heatmap.
+    red_score is red's average score per game, counting a tie as half a win.
+    '''
+    writer = csv.writer(output_file)
+    writer.writerow(['red_hand', 'blue_hand', 'red_wins', 'ties', 'blue_wins', 'red_score'])
+    for red_hand_str, blue_hand_str, red_wins, ties, blue_wins in rows:
+        num_games = red_wins + ties + blue_wins
+        writer.writerow([red_hand_str, blue_hand_str, red_wins, ties, blue_wins,
+                         '{:.4f}'.format((red_wins + 0.5 * ties) / num_games if num_games else 0)])
+
+
+def _hand_strs(arg):
+    return all_hand_strs() if arg == ALL_HANDS else arg.split(',')
+
+
+def _print_progress(cells_done, num_cells):
+    print '{}/{} cells done'.format(cells_done, num_cells)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Play two brains against each other over many initial hands')
+    parser.add_argument('red_brain', help='Brain function name to use for red player')
+    parser.add_argument('blue_brain', help='Brain function name to use for blue player')
+    parser.add_argument('--red-hands', default='01234567',
+                        help="Comma-separated red initial hands, eg. '0123456,1234567', or '{}' for every "
+                             "non-empty hand".format(ALL_HANDS))
+    parser.add_argument('--blue-hands', default='01234567', help='Blue initial hands, as for --red-hands')
+    parser.add_argument('-n', '--num-games', type=int, default=100, help='Number of games per pair of hands')
+    parser.add_argument('-p', '--processes', type=int, help='Number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='Base RNG seed')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Result cache file')
+    parser.add_argument('-o', '--output', default='sweep.csv', help='CSV file to write results to')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    results = sweep(args.red_brain, args.blue_brain, _hand_strs(args.red_hands), _hand_strs(args.blue_hands),
+                    num_games=args.num_games, seed=args.seed, processes=args.processes, cache_path=args.cache,
+                    progress_fn=_print_progress)
+    with open(args.output, 'wb') as output_file:
+        write_csv(results, output_file)
+    print 'Results written to', args.output
@@ -0,0 +1,53 @@
+import argparse
+
+from components.fixed_orders import (
+    DEFAULT_CHUNK_ROWS, NUM_ORDERS, best_response, compute_matrix, dominated_rows, expected_payoffs, open_matrix,
+    order_index, order_str,
+)
+
+
+def _print_progress(chunks_done, num_chunks):
+    print '{}/{} chunks done'.format(chunks_done, num_chunks)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Build and query the payoff matrix of every fixed card order '
+                                                 'against every other')
+    parser.add_argument('matrix_file', help='int8 matrix file, rows are red orders and columns blue orders')
+    subparsers = parser.add_subparsers(dest='command')
+
+    compute_parser = subparsers.add_parser('compute', help='Compute the matrix, resuming if interrupted')
+    compute_parser.add_argument('-p', '--processes', type=int, help='Number of worker processes')
+    compute_parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                                help='Number of rows computed at once by a worker')
+
+    response_parser = subparsers.add_parser('best-response', help='Best order against a mix of orders')
+    response_parser.add_argument('orders', nargs='+',
+                                 help="Opponent orders, eg. '76543210', played with equal probability")
+
+    top_parser = subparsers.add_parser('top', help='Orders that do best against uniformly random orders')
+    top_parser.add_argument('-n', type=int, default=10, help='Number of orders to list')
+
+    dominated_parser = subparsers.add_parser('dominated', help='Count orders dominated by reference orders')
+    dominated_parser.add_argument('orders', nargs='+', help='Reference orders')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    if args.command == 'compute':
+        compute_matrix(args.matrix_file, processes=args.processes, chunk_rows=args.chunk_rows,
+                       progress_fn=_print_progress)
+    elif args.command == 'best-response':
+        opponents = [order_index(order) for order in args.orders]
+        best, payoff = best_response(open_matrix(args.matrix_file),
+                                     {index: 1.0 / len(opponents) for index in opponents})
+        print 'Best response: {} (expected payoff {:+.3f})'.format(order_str(best), payoff)
+    elif args.command == 'top':
+        payoffs = expected_payoffs(open_matrix(args.matrix_file),
+                                   {index: 1.0 / NUM_ORDERS for index in range(NUM_ORDERS)})
+        for index in payoffs.argsort()[::-1][:args.n]:
+            print '{} {:+.4f}'.format(order_str(index), payoffs[index])
+    else:
+        dominated = dominated_rows(open_matrix(args.matrix_file), [order_index(order) for order in args.orders])
+        print '{} of {} orders are dominated'.format(dominated.sum(), NUM_ORDERS)
@@ -0,0 +1,68 @@
+import argparse
+
+from components.brain_management import get_brain_func
+from components.game_server import (
+    DEFAULT_MAX_PENDING_MESSAGES, DEFAULT_MOVE_TIMEOUT, REMOTE_OPPONENT, GameServer, LoadClient,
+)
+from components.latency import format_seconds
+
+
+def serve(address, opponent=REMOTE_OPPONENT, move_timeout=DEFAULT_MOVE_TIMEOUT,
+          max_pending_messages=DEFAULT_MAX_PENDING_MESSAGES):
+    opponent_brain_fn = None if opponent == REMOTE_OPPONENT else get_brain_func(opponent)
+    server = GameServer(address, opponent_brain_fn, move_timeout, max_pending_messages)
+    print 'Serving games against {} on {}'.format(opponent, address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print 'Games finished:', ', '.join(
+            '{}: {}'.format(getattr(winner, 'name', 'tie'), count) for winner, count in server.results.iteritems()
+        )
+
+
+def run_load(address, brain='random_ai', num_connections=4, games_per_connection=1000, concurrency=256):
+    client = LoadClient(address, get_brain_func(brain), num_connections, games_per_connection, concurrency).run()
+    num_games = sum(client.results.itervalues())
+    print '{} games in {:.2f}s: {:.0f} games/s'.format(num_games, client.elapsed, num_games / client.elapsed)
+    print '{} won {}, tied {}, lost {}'.format(brain, client.results['win'], client.results['tie'],
+                                               client.results['loss'])
+    print 'Game time p50 {}, p99 {}, max {}'.format(format_seconds(client.game_times.percentile(50)),
+                                                    format_seconds(client.game_times.percentile(99)),
+                                                    format_seconds(client.game_times.max))
+    if client.errors:
+        print client.errors, 'errors from the server'
+    return client
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Host games for remote brains, or generate load against a server')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help='Run a game server')
+    serve_parser.add_argument('address', help="'host:port' or 'unix:/path/to/socket'")
+    serve_parser.add_argument('--opponent', default=REMOTE_OPPONENT,
+                              help="Brain that remote brains play against, or '{}' to pair remote brains with "
+                                   "each other".format(REMOTE_OPPONENT))
+    serve_parser.add_argument('--move-timeout', type=float, default=DEFAULT_MOVE_TIMEOUT,
+                              help='Seconds a remote brain has to choose a card before it forfeits')
+    serve_parser.add_argument('--max-pending-messages', type=int, default=DEFAULT_MAX_PENDING_MESSAGES,
+                              help='Stop reading from a client while this many messages to it are unsent')
+
+    load_parser = subparsers.add_parser('load', help='Play many games against a server to benchmark it')
+    load_parser.add_argument('address', help="'host:port' or 'unix:/path/to/socket'")
+    load_parser.add_argument('--brain', default='random_ai', help='Brain the load generator plays')
+    load_parser.add_argument('-c', '--connections', type=int, default=4, help='Number of connections')
+    load_parser.add_argument('-n', '--num-games', type=int, default=1000, help='Number of games per connection')
+    load_parser.add_argument('--concurrency', type=int, default=256,
+                             help='Max games played at once on each connection')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    if args.command == 'serve':
+        serve(args.address, opponent=args.opponent, move_timeout=args.move_timeout,
+              max_pending_messages=args.max_pending_messages)
+    else:
+        run_load(args.address, brain=args.brain, num_connections=args.connections,
+                 games_per_connection=args.num_games, concurrency=args.concurrency)
@@ -0,0 +1,73 @@
+''' The fight and spy functions of the original engine, copied unchanged from components/fight.py as it was before
+the rules were compiled into RuleSet tables. The tests check the tables against these, so don't edit them to match
+the tables.
+'''
+from components.cards import Card, Color
+from components.rules import FightResult
+
+
+def fight_result(red_card, blue_card, prev_red_card, prev_blue_card):
+    ''' The main game engine. Figures out what the result of played cards should be.
+    :return: a FightResult
+    '''
+    #5. Wizard - nullifies opponent's power
+    blue_has_power = red_card != Card.wizard
+    red_has_power = blue_card != Card.wizard
+
+    #0. Musician - round is put on hold
+    if red_has_power and red_card == Card.musician:
+        return FightResult.on_hold
+    if blue_has_power and blue_card == Card.musician:
+        return FightResult.on_hold
+
+    #1. Princess - wins against prince
+    if red_has_power and red_card == Card.princess and blue_card == Card.prince:
+        return FightResult.red_wins_game
+    if blue_has_power and blue_card == Card.princess and red_card == Card.prince:
+        return FightResult.blue_wins_game
+
+    #7. Prince - you win the round
+    if red_has_power and red_card == Card.prince and blue_card != Card.prince:
+        return FightResult.red_wins
+    if blue_has_power and blue_card == Card.prince and red_card != Card.prince:
+        return FightResult.blue_wins
+
+    #6. General - next round, your card gets +2 strength
+    if prev_red_card == Card.general and prev_blue_card not in [Card.wizard, Card.musician]:
+        red_value = red_card.value + 2
+    else:
+        red_value = red_card.value
+    if prev_blue_card == Card.general and prev_red_card not in [Card.wizard, Card.musician]:
+        blue_value = blue_card.value + 2
+    else:
+        blue_value = blue_card.value
+
+    #3. Assassin - Lowest strength wins
+    modifier = -1 if (red_has_power and red_card == Card.assassin)\
+                  or (blue_has_power and blue_card == Card.assassin) else 1
+
+    if modifier * red_value > modifier * blue_value:
+        #4. Ambassador - win with this counts as 2 victories
+        if red_has_power and red_card == Card.ambassador:
+            return FightResult.red_wins_2
+        return FightResult.red_wins
+    elif modifier * red_value < modifier * blue_value:
+        #4. Ambassador - win with this counts as 2 victories
+        if blue_has_power and blue_card == Card.ambassador:
+            return FightResult.blue_wins_2
+        return FightResult.blue_wins
+    else:
+        return FightResult.on_hold
+
+
+def successful_spy_color((red_card, blue_card)):
+    ''' Determine whether the provided fight has a non-nullified spy in it
+    Takes a fight tuple of (red_card, blue_card)
+    :return: Color of non-nullified spy, if any, or None if no non-nullified spy.
+    '''
+    spy_nullifiers = {Card.musician, Card.wizard, Card.spy}
+    if red_card == Card.spy and blue_card not in spy_nullifiers:
+        return Color.red
+    if blue_card == Card.spy and red_card not in spy_nullifiers:
+        return Color.blue
+    return None
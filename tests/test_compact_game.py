@@ -0,0 +1,134 @@
+import random
+import unittest
+
+from components.cards import Card, initial_hand
+from components.compact_game import (
+    FULL_HAND, HAND_CARDS, POINTS_TO_WIN, CompactGameStatus, hand_mask, hand_mask_from_str,
+)
+from components.fight import resolve_fight
+from components.game_status import GameStatus
+from components.rules import VARIANTS
+
+
+def _slots(compact_game):
+    return tuple(getattr(compact_game, slot) for slot in CompactGameStatus.__slots__ if slot != 'undo_stack')
+
+
+class ApplyUndoTest(unittest.TestCase):
+    ''' Walks games with CompactGameStatus.apply and undo, replaying each one on a GameStatus with resolve_fight
+    '''
+    def _replay(self, initial_red_hand_str, initial_blue_hand_str, fights):
+        game = GameStatus(initial_red_hand_str, initial_blue_hand_str)
+        for red_card, blue_card in fights:
+            resolve_fight(Card(red_card), Card(blue_card), game)
+        return game
+
+    def _check_position(self, compact_game, initial_red_hand_str, initial_blue_hand_str, keys):
+        ''' Checks a position against the same fights played on a GameStatus, and checks that positions sharing a
+        state key have the same hands, capped points, previous fight and points on hold
+        '''
+        fights = compact_game.all_fights
+        game = self._replay(initial_red_hand_str, initial_blue_hand_str, fights)
+        self.assertEqual((compact_game.red_points, compact_game.blue_points), (game.red_points, game.blue_points))
+        self.assertEqual(compact_game.on_hold_points, game.on_hold_points)
+        self.assertEqual(compact_game.on_hold_fights, len(game.on_hold_fights))
+        self.assertEqual(compact_game.winner, game.winner)
+        self.assertEqual(compact_game.is_over, bool(game.is_over))
+        self.assertEqual(fights, [(int(red_card), int(blue_card)) for red_card, blue_card in game.all_fights])
+        self.assertEqual(compact_game.spy_color, game.rules.spy_color(game.most_recent_fight))
+        red_hand = hand_mask_from_str(initial_red_hand_str) & ~hand_mask(red_card for red_card, _ in fights)
+        blue_hand = hand_mask_from_str(initial_blue_hand_str) & ~hand_mask(blue_card for _, blue_card in fights)
+        self.assertEqual((compact_game.red_hand, compact_game.blue_hand), (red_hand, blue_hand))
+
+        position = (red_hand, blue_hand, min(game.red_points, POINTS_TO_WIN), min(game.blue_points, POINTS_TO_WIN),
+                    fights[-1] if fights else None, game.on_hold_points)
+        self.assertEqual(keys.setdefault(compact_game.state_key, position), position)
+
+    def _walk(self, compact_game, initial_red_hand_str, initial_blue_hand_str, keys):
+        ''' Checks every position reachable from compact_game, visiting each state key once
+        '''
+        if compact_game.state_key in keys:
+            self._check_position(compact_game, initial_red_hand_str, initial_blue_hand_str, keys)
+            return
+        self._check_position(compact_game, initial_red_hand_str, initial_blue_hand_str, keys)
+        if compact_game.is_over:
+            return
+        for red_card in HAND_CARDS[compact_game.red_hand]:
+            for blue_card in HAND_CARDS[compact_game.blue_hand]:
+                before = _slots(compact_game), compact_game.state_key
+                compact_game.apply(red_card, blue_card)
+                self._walk(compact_game, initial_red_hand_str, initial_blue_hand_str, keys)
+                compact_game.undo()
+                self.assertEqual((_slots(compact_game), compact_game.state_key), before)
+
+    def test_all_positions_of_small_hands(self):
+        # Full hands have too many positions to walk in a test; these cover every card, fights on hold and general
+        # bonuses, and princess wins
+        for initial_red_hand_str, initial_blue_hand_str in (('04567', '01234'), ('01246', '02357'), ('12357', '04567')):
+            keys = {}
+            compact_game = CompactGameStatus.from_hand_strs(initial_red_hand_str, initial_blue_hand_str)
+            self._walk(compact_game, initial_red_hand_str, initial_blue_hand_str, keys)
+            self.assertFalse(compact_game.undo_stack)
+            self.assertEqual(compact_game.num_fights, 0)
+
+    def test_random_full_games(self):
+        rng = random.Random(0)
+        keys = {}
+        for _ in range(500):
+            compact_game = CompactGameStatus()
+            red_hand, blue_hand = initial_hand(), initial_hand()
+            rng.shuffle(red_hand)
+            rng.shuffle(blue_hand)
+            positions = []
+            for red_card, blue_card in zip(red_hand, blue_hand):
+                if compact_game.is_over:
+                    break
+                positions.append((_slots(compact_game), compact_game.state_key))
+                compact_game.apply(int(red_card), int(blue_card))
+                self._check_position(compact_game, None, None, keys)
+            while positions:
+                compact_game.undo()
+                self.assertEqual((_slots(compact_game), compact_game.state_key), positions.pop())
+
+
+class FromGameTest(unittest.TestCase):
+    def test_from_game_plays_the_games_rules(self):
+        # General then spy: the ambassador only beats the spy with the strong general's +3
+        fights = [(Card.general, Card.spy), (Card.spy, Card.ambassador)]
+        points = {}
+        for name, rules in VARIANTS.iteritems():
+            game = GameStatus(rules=rules)
+            for red_card, blue_card in fights:
+                resolve_fight(red_card, blue_card, game)
+            compact_game = CompactGameStatus.from_game(game, FULL_HAND & ~hand_mask(red_card for red_card, _ in fights),
+                                                       FULL_HAND & ~hand_mask(blue_card for _, blue_card in fights))
+            self.assertIs(compact_game.rules, rules)
+            self.assertEqual((compact_game.red_points, compact_game.blue_points), (game.red_points, game.blue_points))
+            self.assertEqual(compact_game.on_hold_points, game.on_hold_points)
+            points[name] = compact_game.red_points, compact_game.on_hold_points
+        self.assertNotEqual(points['vanilla'], points['strong_general'])
+
+    def test_random_games_under_every_variant(self):
+        rng = random.Random(0)
+        for rules in VARIANTS.itervalues():
+            for _ in range(200):
+                game = GameStatus(rules=rules)
+                red_hand, blue_hand = initial_hand(), initial_hand()
+                rng.shuffle(red_hand)
+                rng.shuffle(blue_hand)
+                for n, (red_card, blue_card) in enumerate(zip(red_hand, blue_hand)):
+                    if game.is_over:
+                        break
+                    resolve_fight(red_card, blue_card, game)
+                    compact_game = CompactGameStatus.from_game(game, hand_mask(red_hand[n + 1:]),
+                                                               hand_mask(blue_hand[n + 1:]))
+                    self.assertEqual((compact_game.red_points, compact_game.blue_points),
+                                     (game.red_points, game.blue_points))
+                    self.assertEqual(compact_game.on_hold_points, game.on_hold_points)
+                    self.assertEqual(compact_game.winner, game.winner)
+                    self.assertEqual(compact_game.is_over, bool(game.is_over))
+                    self.assertEqual(compact_game.spy_color, rules.spy_color(game.most_recent_fight))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import random
+import unittest
+
+from brains.example_ai import random_ai_brain_fn
+from brave_rats import play_match
+from components.cards import Color
+from components.determinism import decision_cache, deterministic
+from components.early_stopping import StoppingRule
+from components.events import GameListener
+from components.observation import takes_observation
+
+
+def _make_brains():
+    ''' :return: (legacy brain, observation brain, {brain name: number of moves asked}). Both brains play the same
+    deterministic choice of card, and are new functions, so they get new decision caches.
+    '''
+    moves = {}
+
+    def choose(name, hand, points, opponent_points, on_hold_points):
+        moves[name] = moves.get(name, 0) + 1
+        hand = sorted(hand)
+        return hand[(points + 2 * opponent_points + on_hold_points) % len(hand)]
+
+    def legacy_brain_fn(player, game, spied_card):
+        if game.is_over:
+            return None
+        if player.color == Color.red:
+            points, opponent_points = game.red_points, game.blue_points
+        else:
+            points, opponent_points = game.blue_points, game.red_points
+        return choose('legacy', player.hand, points, opponent_points, game.on_hold_points)
+
+    @takes_observation
+    def observation_brain_fn(observation):
+        if observation.is_over:
+            return None
+        return choose('observation', observation.hand, observation.points, observation.opponent_points,
+                      observation.on_hold_points)
+
+    return legacy_brain_fn, observation_brain_fn, moves
+
+
+class _RecordingListener(GameListener):
+    ''' Records every event, with the game's index in the match in place of the game
+    '''
+    def __init__(self):
+        self.events = []
+        self.games = []
+
+    def _game_index(self, game):
+        if not self.games or self.games[-1] is not game:
+            self.games.append(game)
+        return len(self.games) - 1
+
+    def match_started(self, red_brain_name, blue_brain_name):
+        self.events.append(('match_started', red_brain_name, blue_brain_name))
+
+    def game_started(self, game):
+        self.events.append(('game_started', self._game_index(game)))
+
+    def spy_revealed(self, game, spy_color, revealed_card):
+        self.events.append(('spy_revealed', self._game_index(game), spy_color, revealed_card))
+
+    def fight_resolved(self, game, red_card, blue_card, result):
+        self.events.append(('fight_resolved', self._game_index(game), red_card, blue_card, result,
+                            game.red_points, game.blue_points))
+
+    def game_over(self, game):
+        self.events.append(('game_over', self._game_index(game), game.winner))
+
+    def match_progress(self, game):
+        self.events.append(('match_progress', self._game_index(game)))
+
+    def match_over(self):
+        self.events.append(('match_over',))
+
+    def game_events(self, game_index):
+        return [event[:1] + event[2:] for event in self.events if len(event) > 1 and event[1] == game_index]
+
+
+class _StopAfter(StoppingRule):
+    def __init__(self, num_games):
+        super(_StopAfter, self).__init__(min_games=1)
+        self.num_games = num_games
+
+    def _separation(self):
+        return 'played {} games'.format(self.num_games) if self.games_played >= self.num_games else None
+
+
+def _winners(brain_fn, num_games=50, seed=0):
+    random.seed(seed)
+    return [game.winner for game in play_match(brain_fn, random_ai_brain_fn, num_games=num_games)]
+
+
+class DecisionCacheTest(unittest.TestCase):
+    def test_cache_matches_uncached_play(self):
+        for name in ('legacy', 'observation'):
+            uncached_brains = _make_brains()
+            uncached_fn = uncached_brains[0 if name == 'legacy' else 1]
+            uncached_winners = _winners(uncached_fn)
+            uncached_moves = uncached_brains[2][name]
+
+            cached_brains = _make_brains()
+            cached_fn = deterministic(cached_brains[0 if name == 'legacy' else 1])
+            self.assertEqual(_winners(cached_fn), uncached_winners)
+            cache = decision_cache(cached_fn)
+            self.assertEqual(cache.hits + cache.misses, uncached_moves)
+            # The brain is only asked about positions it hasn't seen
+            self.assertEqual(cached_brains[2][name], cache.misses)
+            self.assertEqual(len(cache.decisions), cache.misses)
+            self.assertTrue(cache.hits)
+
+            # A second match only hits
+            misses = cache.misses
+            self.assertEqual(_winners(cached_fn), uncached_winners)
+            self.assertEqual(cache.misses, misses)
+
+    def test_legacy_and_observation_brains_hit_alike(self):
+        legacy_fn, observation_fn, _ = _make_brains()
+        legacy_fn, observation_fn = deterministic(legacy_fn), deterministic(observation_fn)
+        self.assertEqual(_winners(legacy_fn), _winners(observation_fn))
+        legacy_cache, observation_cache = decision_cache(legacy_fn), decision_cache(observation_fn)
+        self.assertEqual((legacy_cache.hits, legacy_cache.misses), (observation_cache.hits, observation_cache.misses))
+
+
+class RepeatedGameTest(unittest.TestCase):
+    ''' Matches between two deterministic brains play their game once and replay it
+    '''
+    def test_replayed_games_are_new_objects_with_the_same_events(self):
+        legacy_fn, observation_fn, moves = _make_brains()
+        listener = _RecordingListener()
+        games = list(play_match(deterministic(legacy_fn), deterministic(observation_fn), num_games=5,
+                                listener=listener))
+        self.assertEqual(moves, {'legacy': len(games[0].all_fights), 'observation': len(games[0].all_fights)})
+        self.assertEqual(len(games), 5)
+        self.assertEqual(len(set(id(game) for game in games)), 5)
+        self.assertEqual(listener.games, games)
+        for game_index, game in enumerate(games):
+            self.assertEqual(game.all_fights, games[0].all_fights)
+            self.assertEqual((game.red_points, game.blue_points, game.winner),
+                             (games[0].red_points, games[0].blue_points, games[0].winner))
+            self.assertEqual(listener.game_events(game_index), listener.game_events(0))
+        self.assertEqual(listener.events[0], ('match_started', 'legacy', 'observation'))
+        self.assertEqual(listener.events[-1], ('match_over',))
+        self.assertEqual(listener.game_events(0)[0], ('game_started',))
+        self.assertEqual(listener.game_events(0)[-1], ('match_progress',))
+
+    def test_stop_rule_stops_a_replayed_match(self):
+        legacy_fn, observation_fn, _ = _make_brains()
+        listener = _RecordingListener()
+        stop_rule = _StopAfter(7)
+        games = list(play_match(deterministic(legacy_fn), deterministic(observation_fn), num_games=1000,
+                                listener=listener, stop_rule=stop_rule))
+        self.assertEqual(len(games), 7)
+        self.assertEqual(stop_rule.games_played, 7)
+        self.assertEqual(stop_rule.reason, 'played 7 games')
+        self.assertEqual([event for event in listener.events if event[0] == 'match_over'], [('match_over',)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import random
+import unittest
+
+from components.cards import Color
+from components.early_stopping import SPRTStop, WilsonStop
+
+
+def _verdicts(rule_class, red_win_probability, num_matches, max_games, seed=0):
+    ''' Simulates matches of decisive games
+    :return: list of the stopping reason of each match, or None for matches that reached max_games
+    '''
+    rng = random.Random(seed)
+    verdicts = []
+    for _ in range(num_matches):
+        rule = rule_class()
+        reason = None
+        for _ in range(max_games):
+            if rule.update(Color.red if rng.random() < red_win_probability else Color.blue):
+                reason = rule.reason
+                break
+        verdicts.append(reason)
+    return verdicts
+
+
+def _stronger_rate(verdicts):
+    return sum(1 for reason in verdicts if reason and 'is stronger' in reason) / float(len(verdicts))
+
+
+class WilsonStopTest(unittest.TestCase):
+    def test_even_matches_rarely_called(self):
+        # alpha is 1%, over however many looks the match takes
+        self.assertLessEqual(_stronger_rate(_verdicts(WilsonStop, 0.5, 500, 2000)), 0.025)
+
+    def test_uneven_matches_called(self):
+        verdicts = _verdicts(WilsonStop, 0.65, 100, 2000)
+        self.assertTrue(all(reason and reason.startswith('red is stronger') for reason in verdicts))
+
+
+class SPRTStopTest(unittest.TestCase):
+    def test_even_matches_rarely_called(self):
+        # alpha is 5%
+        verdicts = _verdicts(SPRTStop, 0.5, 300, 20000)
+        self.assertLessEqual(_stronger_rate(verdicts), 0.09)
+        self.assertTrue(all(verdicts))
+
+    def test_uneven_matches_called(self):
+        verdicts = _verdicts(SPRTStop, 0.4, 100, 20000)
+        self.assertGreaterEqual(sum(1 for reason in verdicts if reason.startswith('blue is stronger')), 90)
+
+
+if __name__ == '__main__':
+    unittest.main()
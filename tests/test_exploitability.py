@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from brains.example_ai import random_ai_brain_fn
+from components.cards import Color
+from components.exploitability import BestResponse, best_response_scores, exploitability
+
+# Best response's expected score against a brain playing uniformly at random, with both players holding 0-4. Found
+# by a separate brute force search over GameStatus.
+UNIFORM_BEST_RESPONSE_01234 = 0.7375
+
+
+def _uniform_brain(player, game, spied_card):
+    ''' random_ai_brain_fn without its exact odds, so that BestResponse has to sample it
+    '''
+    if game.is_over:
+        return None
+    return random.choice(player.hand)
+
+
+class BestResponseTest(unittest.TestCase):
+    def test_exact_odds(self):
+        for brain_color in Color:
+            best_response = BestResponse(random_ai_brain_fn, brain_color, '01234', '01234')
+            score, error = best_response.score()
+            self.assertAlmostEqual(score, UNIFORM_BEST_RESPONSE_01234, places=12)
+            self.assertEqual(error, 0.0)
+
+    def test_sampled_scores_are_not_biased_up(self):
+        # Cards chosen on a few samples can be worse than the best response, but shouldn't score better than it
+        for samples in (4, 16):
+            for brain_color in Color:
+                best_response = BestResponse(_uniform_brain, brain_color, '01234', '01234', samples=samples)
+                score, error = best_response.score()
+                self.assertGreater(error, 0.0)
+                self.assertLess(score, UNIFORM_BEST_RESPONSE_01234 + 3 * error, (samples, brain_color, score, error))
+                # Scoring on the samples the cards were chosen on would be too high
+                self.assertGreater(best_response.value(best_response.initial_game()), UNIFORM_BEST_RESPONSE_01234)
+
+    def test_process_pool_matches_serial_search(self):
+        scores, errors, num_queries = best_response_scores('random_ai', '01234', '01234', processes=2)
+        self.assertEqual(errors, {Color.red: 0.0, Color.blue: 0.0})
+        for brain_color in Color:
+            self.assertAlmostEqual(scores[brain_color], UNIFORM_BEST_RESPONSE_01234, places=12)
+        self.assertAlmostEqual(exploitability(scores), UNIFORM_BEST_RESPONSE_01234 - 0.5, places=12)
+        self.assertTrue(num_queries)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import random
+import unittest
+
+from brave_rats import play_game
+from components.cards import Color, initial_hand
+from components.observation import takes_observation
+from components.rules import VARIANTS
+
+HAND_STRS = ((None, None), ('01234', '34567'), ('0246', '1357'))
+
+
+def _mask(cards):
+    mask = 0
+    for card in cards:
+        mask |= 1 << int(card)
+    return mask
+
+
+def _legacy_view(player, game, spied_card):
+    ''' What a (player, game, spied_card) brain sees, from red's side whatever the player's color
+    '''
+    fights = tuple(game.all_fights)
+    red_hand_mask = _mask(initial_hand(game.initial_hands['red'])) & ~_mask(red_card for red_card, _ in fights)
+    blue_hand_mask = _mask(initial_hand(game.initial_hands['blue'])) & ~_mask(blue_card for _, blue_card in fights)
+    if player.color == Color.red:
+        red_hand_mask = _mask(player.hand)
+    else:
+        blue_hand_mask = _mask(player.hand)
+    return (player.color, tuple(sorted(player.hand)), red_hand_mask, blue_hand_mask,
+            game.red_points, game.blue_points, game.on_hold_points, fights,
+            game.rules.spy_color(game.most_recent_fight), spied_card, bool(game.is_over), game.winner)
+
+
+def _observation_view(observation):
+    ''' The same view as _legacy_view, turned back to red's side for blue's observations
+    '''
+    if observation.color == Color.red:
+        red_hand_mask, blue_hand_mask = observation.hand_mask, observation.opponent_hand_mask
+        red_points, blue_points = observation.points, observation.opponent_points
+        fights = observation.fights
+    else:
+        red_hand_mask, blue_hand_mask = observation.opponent_hand_mask, observation.hand_mask
+        red_points, blue_points = observation.opponent_points, observation.points
+        fights = tuple((red_card, blue_card) for blue_card, red_card in observation.fights)
+    expected_last_fight = observation.fights[-1] if observation.fights else (None, None)
+    assert observation.last_fight == expected_last_fight, (observation.last_fight, expected_last_fight)
+    return (observation.color, tuple(sorted(observation.hand)), red_hand_mask, blue_hand_mask,
+            red_points, blue_points, observation.on_hold_points, fights,
+            observation.spy_color, observation.spied_card, observation.is_over, observation.winner)
+
+
+def _recording_brains(seed, views):
+    ''' :return: (legacy brain, observation brain), which append what they see to views and play the same random
+    cards given the same views
+    '''
+    rng = random.Random(seed)
+
+    def choose(view):
+        views.append(view)
+        hand = view[1]
+        return None if view[-2] else rng.choice(hand)
+
+    def legacy_brain_fn(player, game, spied_card):
+        return choose(_legacy_view(player, game, spied_card))
+
+    @takes_observation
+    def observation_brain_fn(observation):
+        return choose(_observation_view(observation))
+
+    return legacy_brain_fn, observation_brain_fn
+
+
+class ObservationTest(unittest.TestCase):
+    ''' Plays the same games with legacy brains and with observation brains, and checks that both kinds see the
+    same game at every turn, blue's observations included once turned back to red's side
+    '''
+    def _views(self, observation_colors, seed, hand_strs, rules):
+        views = {Color.red: [], Color.blue: []}
+        red_legacy, red_observation = _recording_brains(seed, views[Color.red])
+        blue_legacy, blue_observation = _recording_brains(seed + 1, views[Color.blue])
+        play_game(red_observation if Color.red in observation_colors else red_legacy,
+                  blue_observation if Color.blue in observation_colors else blue_legacy,
+                  hand_strs[0], hand_strs[1], rules=rules)
+        return views
+
+    def test_observation_brains_see_the_same_game(self):
+        spied = set()
+        for rules in VARIANTS.itervalues():
+            for hand_strs in HAND_STRS:
+                for seed in range(0, 100, 2):
+                    expected = self._views((), seed, hand_strs, rules)
+                    for observation_colors in ((Color.red,), (Color.blue,), (Color.red, Color.blue)):
+                        self.assertEqual(self._views(observation_colors, seed, hand_strs, rules), expected,
+                                         (rules, hand_strs, seed, observation_colors))
+                    spied.update(color for color, views in expected.iteritems() if any(view[-3] for view in views))
+        # The games included spy reveals to both players
+        self.assertEqual(spied, {Color.red, Color.blue})
+
+
+if __name__ == '__main__':
+    unittest.main()
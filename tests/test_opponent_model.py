@@ -0,0 +1,104 @@
+import os
+import random
+import shutil
+import tempfile
+from timeit import default_timer
+import unittest
+
+from brains.example_ai import random_ai_brain_fn
+from brains.opponent_model_ai import OpponentModel, make_opponent_model_brain
+from brave_rats import play_match
+from components.cards import Card
+from components.latency import RANDOM_CARD
+from tournament import _chunk_seed, _play_chunk
+
+
+def _make_lowest_card_brain():
+    # Made in a function, so that brain discovery doesn't find it
+    def lowest_card_brain_fn(player, game, spied_card):
+        if game.is_over:
+            return None
+        return min(player.hand)
+    return lowest_card_brain_fn
+
+
+def _random_fights(rng):
+    my_cards, opponent_cards = list(Card), list(Card)
+    rng.shuffle(my_cards)
+    rng.shuffle(opponent_cards)
+    return zip(my_cards, opponent_cards)[:rng.randint(1, len(my_cards))]
+
+
+def _fights_played(games):
+    return sum(len(game.all_fights) for game in games)
+
+
+class OpponentModelTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_saved_models_survive_reloading(self):
+        random.seed(0)
+        brain_fn = make_opponent_model_brain(models_dir=self.temp_dir)
+        games = list(play_match(brain_fn, random_ai_brain_fn, num_games=20))
+        lowest_games = list(play_match(_make_lowest_card_brain(), brain_fn, num_games=10))
+
+        # One model per opponent, each counting every opponent card twice: by turn and after the previous fight
+        random_path = os.path.join(self.temp_dir, 'random_ai.npy')
+        lowest_path = os.path.join(self.temp_dir, 'lowest_card.npy')
+        self.assertEqual(sorted(name for name in os.listdir(self.temp_dir) if name.endswith('.npy')),
+                         ['lowest_card.npy', 'random_ai.npy'])
+        self.assertEqual(OpponentModel(random_path).counts.sum(), 2 * _fights_played(games))
+        self.assertEqual(OpponentModel(lowest_path).counts.sum(), 2 * _fights_played(lowest_games))
+        saved_counts = OpponentModel(random_path).counts.copy()
+
+        # A new brain, eg. in the next run, carries on from the saved model
+        brain_fn = make_opponent_model_brain(models_dir=self.temp_dir)
+        more_games = list(play_match(random_ai_brain_fn, brain_fn, num_games=5))
+        counts = OpponentModel(random_path).counts
+        self.assertEqual(counts.sum(), 2 * _fights_played(games + more_games))
+        self.assertTrue((counts >= saved_counts).all())
+
+    def test_learning_takes_the_same_time_per_game(self):
+        rng = random.Random(0)
+        model = OpponentModel(os.path.join(self.temp_dir, 'opponent.npy'))
+        shape, size = model.counts.shape, os.path.getsize(model.path)
+        for _ in range(20):
+            fights = _random_fights(rng)
+            total = model.counts.sum()
+            model.learn(fights)
+            self.assertEqual(model.counts.sum(), total + 2 * len(fights))
+        self.assertEqual((model.counts.shape, os.path.getsize(model.path)), (shape, size))
+
+        model = OpponentModel()
+        games = [_random_fights(rng) for _ in range(1000)]
+
+        def learning_time():
+            start = default_timer()
+            for fights in games:
+                model.learn(fights)
+            return default_timer() - start
+
+        first_time = min(learning_time() for _ in range(3))
+        for _ in range(30):
+            learning_time()
+        later_time = min(learning_time() for _ in range(3))
+        self.assertEqual(model.counts.shape, shape)
+        self.assertLess(later_time, 3 * first_time)
+
+    def test_tournament_chunks_dont_depend_on_earlier_chunks(self):
+        chunk = ('opponent_model', 'random_ai', 40, _chunk_seed(0, 'opponent_model', 'random_ai', 1), None,
+                 RANDOM_CARD, False)
+        other_chunk = ('random_ai', 'opponent_model', 100, _chunk_seed(0, 'random_ai', 'opponent_model', 0), None,
+                       RANDOM_CARD, False)
+        win_count = _play_chunk(chunk)[2]
+        _play_chunk(other_chunk)
+        _play_chunk(chunk)
+        self.assertEqual(_play_chunk(chunk)[2], win_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
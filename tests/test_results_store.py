@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from components.results_store import ResultsStore
+
+
+class ResultsStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'results.sqlite')
+        self.store = ResultsStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_brain_record(self):
+        self.store.start_matchup('a', 'b', 10)
+        self.store.record('a', 'b', 6, 1, 3)
+        self.store.start_matchup('b', 'a', 10)
+        self.store.record('b', 'a', 2, 0, 8)
+        self.store.start_matchup('a', 'a', 10)
+        self.store.record('a', 'a', 9, 0, 1)
+        # a won 6 as red and 8 as blue against b; self-play counts once
+        self.assertEqual(self.store.brain_record('a'), {'b': (14, 1, 5), 'a': (9, 0, 1)})
+        self.assertEqual(self.store.brain_record('b'), {'a': (5, 1, 14)})
+        self.assertEqual(self.store.brain_record('c'), {})
+
+    def test_win_table_and_completed_matchups(self):
+        self.store.start_matchup('a', 'b', 10)
+        self.store.record('a', 'b', 6, 1, 3)
+        self.store.start_matchup('b', 'a', 10)
+        self.store.record('b', 'a', 2, 0, 3)
+        self.store.start_matchup('a', 'c', 10)
+        self.assertEqual(self.store.win_table(), {('a', 'b'): (6, 1, 3), ('b', 'a'): (2, 0, 3)})
+        self.assertEqual(self.store.completed_matchups(10), {('a', 'b')})
+        self.assertEqual(self.store.completed_matchups(20), set())
+
+    def test_games_survive_reopening_and_restarting_clears_them(self):
+        rows = [('red', 4, 2, '0716'), (None, 1, 1, '5544')]
+        self.store.start_matchup('a', 'b', 2)
+        self.store.record('a', 'b', 1, 1, 0, rows)
+        self.store.close()
+
+        self.store = ResultsStore(self.path)
+        self.assertEqual(self.store.games('a', 'b'), rows)
+        self.assertEqual(self.store.games('b', 'a'), [])
+        self.assertEqual(self.store.completed_matchups(2), {('a', 'b')})
+
+        self.store.start_matchup('a', 'b', 2)
+        self.assertEqual(self.store.games('a', 'b'), [])
+        self.assertEqual(self.store.win_table(), {})
+        self.assertEqual(self.store.completed_matchups(2), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
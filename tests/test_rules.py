@@ -0,0 +1,145 @@
+import unittest
+
+from components.cards import Card, Color
+from components.compact_game import CompactGameStatus
+from components.fight import fight_result, resolve_fight, successful_spy_color
+from components.game_status import GameStatus
+from components.rules import (
+    NO_CARD, PREV_BASE, VANILLA, VARIANTS, FightResult, card_index, fight_index, standard_fight_result,
+)
+from tests import baseline_rules
+
+CARDS_OR_NONE = list(Card) + [None]
+
+_RED_GAIN = {FightResult.red_wins: 1, FightResult.red_wins_2: 2}
+_BLUE_GAIN = {FightResult.blue_wins: 1, FightResult.blue_wins_2: 2}
+
+
+def all_fights():
+    ''' Yields (red card, blue card, previous red card, previous blue card) of every fight, previous cards being
+    None before the first fight
+    '''
+    for red_card in Card:
+        for blue_card in Card:
+            for prev_red_card in CARDS_OR_NONE:
+                for prev_blue_card in CARDS_OR_NONE:
+                    if (prev_red_card is None) == (prev_blue_card is None):
+                        yield red_card, blue_card, prev_red_card, prev_blue_card
+
+
+class RuleSetTablesTest(unittest.TestCase):
+    def test_tables_match_fight_function(self):
+        for rules in VARIANTS.itervalues():
+            for red_card, blue_card, prev_red_card, prev_blue_card in all_fights():
+                expected = standard_fight_result(rules, red_card, blue_card, prev_red_card, prev_blue_card)
+                prev = card_index(prev_red_card) * PREV_BASE + card_index(prev_blue_card)
+                self.assertEqual(rules.results[fight_index(red_card, blue_card, prev)], expected)
+                self.assertEqual(rules.fight_table[fight_index(red_card, blue_card, prev)], int(expected))
+                self.assertEqual(rules.fight_result(red_card, blue_card, prev_red_card, prev_blue_card), expected)
+
+    def test_vanilla_matches_baseline(self):
+        # Every entry, including the unreachable ones with only one previous card
+        for red_card in Card:
+            for blue_card in Card:
+                for prev_red_card in CARDS_OR_NONE:
+                    for prev_blue_card in CARDS_OR_NONE:
+                        fight = red_card, blue_card, prev_red_card, prev_blue_card
+                        expected = baseline_rules.fight_result(*fight)
+                        prev = card_index(prev_red_card) * PREV_BASE + card_index(prev_blue_card)
+                        self.assertEqual(VANILLA.results[fight_index(red_card, blue_card, prev)], expected, fight)
+                        self.assertEqual(fight_result(*fight), expected, fight)
+
+    def test_spy_table_matches_baseline(self):
+        for prev_red_card in CARDS_OR_NONE:
+            for prev_blue_card in CARDS_OR_NONE:
+                prev_fight = prev_red_card, prev_blue_card
+                if (prev_red_card is None) == (prev_blue_card is None):
+                    expected = baseline_rules.successful_spy_color(prev_fight)
+                else:
+                    # Never reached: there's either no previous fight or a whole one
+                    expected = None
+                self.assertEqual(VANILLA.spy_table[card_index(prev_red_card) * PREV_BASE + card_index(prev_blue_card)],
+                                 expected, prev_fight)
+                self.assertEqual(VANILLA.spy_color(prev_fight), expected, prev_fight)
+                self.assertEqual(successful_spy_color(prev_fight), expected, prev_fight)
+
+    def test_card_powers(self):
+        # (red card, blue card, previous red card, previous blue card, result), from the game's rules
+        cases = [
+            (Card.musician, Card.prince, None, None, FightResult.on_hold),
+            (Card.musician, Card.wizard, None, None, FightResult.blue_wins),
+            (Card.princess, Card.prince, None, None, FightResult.red_wins_game),
+            (Card.prince, Card.princess, None, None, FightResult.blue_wins_game),
+            (Card.prince, Card.princess, Card.spy, Card.spy, FightResult.blue_wins_game),
+            (Card.wizard, Card.prince, None, None, FightResult.blue_wins),
+            (Card.assassin, Card.general, None, None, FightResult.red_wins),
+            (Card.assassin, Card.wizard, None, None, FightResult.blue_wins),
+            (Card.ambassador, Card.spy, None, None, FightResult.red_wins_2),
+            (Card.spy, Card.ambassador, None, None, FightResult.blue_wins_2),
+            (Card.ambassador, Card.ambassador, None, None, FightResult.on_hold),
+            (Card.spy, Card.ambassador, Card.general, Card.spy, FightResult.on_hold),
+            (Card.spy, Card.assassin, Card.general, Card.spy, FightResult.blue_wins),
+            (Card.spy, Card.assassin, Card.general, Card.wizard, FightResult.red_wins),
+            (Card.assassin, Card.ambassador, Card.general, Card.musician, FightResult.red_wins),
+            (Card.prince, Card.prince, None, None, FightResult.on_hold),
+        ]
+        for red_card, blue_card, prev_red_card, prev_blue_card, expected in cases:
+            self.assertEqual(VANILLA.fight_result(red_card, blue_card, prev_red_card, prev_blue_card), expected,
+                             (red_card, blue_card, prev_red_card, prev_blue_card))
+        self.assertEqual(VARIANTS['strong_general'].fight_result(Card.spy, Card.ambassador, Card.general, Card.spy),
+                         FightResult.red_wins)
+
+
+class ResolveFightTest(unittest.TestCase):
+    ''' resolve_fight on GameStatus and CompactGameStatus.resolve_fight against the fight function, for every fight
+    with and without points on hold
+    '''
+    def _games(self, prev_red_card, prev_blue_card, on_hold):
+        ''' :return: (GameStatus, CompactGameStatus) after the previous fight, which is on hold if on_hold is True
+        '''
+        game = GameStatus()
+        compact_game = CompactGameStatus()
+        if prev_red_card is not None:
+            prev_fight = (prev_red_card, prev_blue_card)
+            if on_hold:
+                game.on_hold_fights.append(prev_fight)
+                compact_game.on_hold_fights = 1
+                compact_game.on_hold_points = game.on_hold_points
+            else:
+                game.resolved_fights.append(prev_fight)
+            compact_game.prev = card_index(prev_red_card) * PREV_BASE + card_index(prev_blue_card)
+        else:
+            compact_game.prev = NO_CARD * PREV_BASE + NO_CARD
+        return game, compact_game
+
+    def test_resolve_fight(self):
+        for red_card, blue_card, prev_red_card, prev_blue_card in all_fights():
+            for on_hold in (False, True) if prev_red_card is not None else (False,):
+                game, compact_game = self._games(prev_red_card, prev_blue_card, on_hold)
+                on_hold_points = game.on_hold_points
+                expected = standard_fight_result(VANILLA, red_card, blue_card, prev_red_card, prev_blue_card)
+
+                self.assertEqual(resolve_fight(red_card, blue_card, game), expected)
+                self.assertEqual(compact_game.resolve_fight(int(red_card), int(blue_card)), int(expected))
+
+                if expected == FightResult.on_hold:
+                    self.assertEqual((game.red_points, game.blue_points), (0, 0))
+                    self.assertEqual(game.on_hold_fights[-1], (red_card, blue_card))
+                elif expected == FightResult.red_wins_game:
+                    self.assertEqual(game.winner, Color.red)
+                elif expected == FightResult.blue_wins_game:
+                    self.assertEqual(game.winner, Color.blue)
+                else:
+                    self.assertEqual(game.red_points, _RED_GAIN[expected] + on_hold_points if expected in _RED_GAIN
+                                     else 0)
+                    self.assertEqual(game.blue_points, _BLUE_GAIN[expected] + on_hold_points
+                                     if expected in _BLUE_GAIN else 0)
+                    self.assertEqual(game.on_hold_fights, [])
+                self.assertEqual((compact_game.red_points, compact_game.blue_points),
+                                 (game.red_points, game.blue_points))
+                self.assertEqual(compact_game.on_hold_points, game.on_hold_points)
+                self.assertEqual(compact_game.winner, game.winner)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,21 @@
 #!/usr/bin/python
 #  -*- coding: UTF8 -*-
+import argparse
 from collections import Counter
+from multiprocessing import Pool, cpu_count
+import os
+import random
 import sys
+import zlib
+from brains.opponent_model_ai import MODELS_DIR_ENV
 from brave_rats import play_match
 
-from components.brain_management import discover_brains, unprefixed_name
+from components.brain_management import discover_brains, get_brain_func, unprefixed_name
 from components.cards import Color
+from components.events import ConsoleListener
+from components.ladder import Ladder
+from components.latency import BrainTimer, RANDOM_CARD, TIMEOUT_POLICIES, format_seconds
+from components.results_store import ResultsStore, game_row
 from components.style import redify, blueify, color_pad
 
 
@@ -33,12 +43,9 @@ def print_summary(results, all_ais):
         _print_table_cell(redify(unprefixed_name(red_ai)))
         for blue_ai in all_ais:
             try:
-                games = results[(red_ai, blue_ai)]
+                win_count = results[(red_ai, blue_ai)]
             except KeyError:
                 win_count = {Color.red: '-', Color.blue: '-', None: '-'}
-            else:
-                winners = [game.winner for game in games]
-                win_count = Counter(winners)
             result_descrip = u'{}/{}/{}'.format(
                 u'←{}'.format(win_count[Color.red]),
                 win_count[None],
@@ -54,7 +61,7 @@ def print_summary(results, all_ais):
         _print_table_row([])
 
 
-def play_round_robin(num_games=1000):
+def _discover_ais():
     brains_dict = discover_brains()
     all_ais = [
         brain_fn
@@ -66,19 +73,306 @@ def play_round_robin(num_games=1000):
     print '{} AIs discovered:'.format(len(all_ais))
     print 'AIs:'
     print '\n'.join(ai_names)
+    return all_ais
+
+
+def print_latency_summary(timers):
+    ''' Prints a table of brain latencies
+    :param timers: {brain name: BrainTimer}
+    '''
+    _print_table_row(['brain', 'moves', 'mean', 'p50', 'p99', 'max', 'game over p99', 'timeouts'])
+    for name, timer in sorted(timers.iteritems()):
+        _print_table_row([
+            name,
+            str(timer.moves.count),
+            format_seconds(timer.moves.mean),
+            format_seconds(timer.moves.percentile(50)),
+            format_seconds(timer.moves.percentile(99)),
+            format_seconds(timer.moves.max),
+            format_seconds(timer.game_over.percentile(99)),
+            str(timer.timeouts),
+        ])
+
+
+def _merge_timer(timers, timer):
+    ''' Adds a BrainTimer's stats to the totals for its brain
+    '''
+    if timer.name in timers:
+        timers[timer.name].merge(timer)
+    else:
+        timers[timer.name] = timer
+
+
+def _win_count(red_wins, ties, blue_wins):
+    return Counter({Color.red: red_wins, None: ties, Color.blue: blue_wins})
+
+
+def _stored_results(store, all_ais):
+    ''' :return: {(red_ai, blue_ai): Counter of winners} of the discovered brains' matchups in a ResultsStore
+    '''
+    ais_by_name = {unprefixed_name(ai): ai for ai in all_ais}
+    return {
+        (ais_by_name[red_name], ais_by_name[blue_name]): _win_count(*counts)
+        for (red_name, blue_name), counts in store.win_table().iteritems()
+        if red_name in ais_by_name and blue_name in ais_by_name
+    }
 
-    results = {}
+
+def play_round_robin(num_games=1000, move_time_budget=None, on_timeout=RANDOM_CARD, store=None,
+                     record_games=False):
+    '''
+    :param store: optional ResultsStore; matchups it has already finished are skipped, and each matchup is saved
+        to it when it's done
+    :param record_games: if True, save a row for every game in the store
+    '''
+    all_ais = _discover_ais()
+
+    # {(red_ai, blue_ai): Counter of winners}
+    results = _stored_results(store, all_ais) if store else {}
+    completed = store.completed_matchups(num_games) if store else set()
+    # {brain name: BrainTimer}
+    timers = {}
     for red_ai in all_ais:
         for blue_ai in all_ais:
+            red_name, blue_name = unprefixed_name(red_ai), unprefixed_name(blue_ai)
+            if (red_name, blue_name) in completed:
+                continue
             raw_input(
                 'Next match: {} vs. {}'.format(
                     redify(unprefixed_name(red_ai)),
                     blueify(unprefixed_name(blue_ai))
                 )
             )
-            games = list(play_match(red_ai, blue_ai, num_games=num_games, verbose=True, quiet_games=True))
-            results[(red_ai, blue_ai)] = games
+            red_timer = BrainTimer(red_name, move_time_budget, on_timeout)
+            blue_timer = BrainTimer(blue_name, move_time_budget, on_timeout)
+            games = list(play_match(red_ai, blue_ai, num_games=num_games, listener=ConsoleListener(),
+                                    red_timer=red_timer, blue_timer=blue_timer))
+            win_count = results[(red_ai, blue_ai)] = Counter(game.winner for game in games)
+            if store:
+                store.start_matchup(red_name, blue_name, num_games)
+                store.record(red_name, blue_name, win_count[Color.red], win_count[None], win_count[Color.blue],
+                             [game_row(game) for game in games] if record_games else ())
+            _merge_timer(timers, red_timer)
+            _merge_timer(timers, blue_timer)
             print_summary(results, all_ais)
+            print_latency_summary(timers)
+
+
+def _chunk_seed(seed, red_name, blue_name, chunk_index):
+    ''' Deterministic RNG seed for one chunk of a matchup, independent of which worker plays it
+    '''
+    return zlib.crc32('{}:{}:{}:{}'.format(seed, red_name, blue_name, chunk_index)) & 0xffffffff
+
+
+def _play_chunk((red_name, blue_name, num_games, chunk_seed, move_time_budget, on_timeout, record_games)):
+    ''' Process pool worker: plays num_games games between two brains looked up by name
+    :param record_games: if True, also return a results_store.game_row for each game
+    :return: (red_name, blue_name, Counter of winners, red BrainTimer, blue BrainTimer, list of game rows)
+    '''
+    random.seed(chunk_seed)
+    red_timer = BrainTimer(red_name, move_time_budget, on_timeout)
+    blue_timer = BrainTimer(blue_name, move_time_budget, on_timeout)
+    win_count, game_rows = Counter(), []
+    for game in play_match(get_brain_func(red_name), get_brain_func(blue_name), num_games=num_games,
+                           red_timer=red_timer, blue_timer=blue_timer):
+        win_count[game.winner] += 1
+        if record_games:
+            game_rows.append(game_row(game))
+    return red_name, blue_name, win_count, red_timer, blue_timer, game_rows
+
+
+def play_round_robin_headless(num_games=1000, processes=None, chunk_size=250, seed=0,
+                              move_time_budget=None, on_timeout=RANDOM_CARD, store=None, record_games=False):
+    ''' Non-interactive round robin. Matchups, and chunks of games within each matchup, are spread
+    over a process pool, and only win/tie counts come back from the workers.
+    :param num_games: number of games per matchup
+    :param processes: number of worker processes; defaults to the number of CPUs
+    :param chunk_size: max number of games in one unit of work
+    :param seed: base seed; each chunk's RNG seed is derived from it, so results are reproducible
+    :param move_time_budget: max seconds a brain may take to choose a card, or None for no limit
+    :param on_timeout: what happens to a brain that goes over its budget; see BrainTimer
+    :param store: optional ResultsStore; matchups it has already finished are skipped, unfinished ones are
+        played again from the start, and every chunk's results are saved to it as they come in
+    :param record_games: if True, save a row for every game in the store
+    :return: ({(red_ai, blue_ai): Counter of winners}, {brain name: BrainTimer})
+    '''
+    all_ais = _discover_ais()
+    ais_by_name = {unprefixed_name(ai): ai for ai in all_ais}
+
+    completed = store.completed_matchups(num_games) if store else set()
+    matchups = [
+        (red_name, blue_name)
+        for red_name in ais_by_name
+        for blue_name in ais_by_name
+        if (red_name, blue_name) not in completed
+    ]
+    chunks = [
+        (red_name, blue_name, min(chunk_size, num_games - start),
+         _chunk_seed(seed, red_name, blue_name, start // chunk_size), move_time_budget, on_timeout,
+         store is not None and record_games)
+        for red_name, blue_name in matchups
+        for start in range(0, num_games, chunk_size)
+    ]
+
+    results = {
+        (red_ai, blue_ai): Counter()
+        for red_ai in all_ais
+        for blue_ai in all_ais
+    }
+    if store:
+        results.update(_stored_results(store, all_ais))
+        for red_name, blue_name in matchups:
+            store.start_matchup(red_name, blue_name, num_games)
+            results[(ais_by_name[red_name], ais_by_name[blue_name])] = Counter()
+    timers = {}
+    pool = Pool(processes)
+    try:
+        chunk_results = pool.imap_unordered(_play_chunk, chunks)
+        for red_name, blue_name, win_count, red_timer, blue_timer, game_rows in chunk_results:
+            results[(ais_by_name[red_name], ais_by_name[blue_name])].update(win_count)
+            if store:
+                store.record(red_name, blue_name, win_count[Color.red], win_count[None], win_count[Color.blue],
+                             game_rows)
+            _merge_timer(timers, red_timer)
+            _merge_timer(timers, blue_timer)
+    finally:
+        pool.close()
+        pool.join()
+
+    print_summary(results, all_ais)
+    print_latency_summary(timers)
+    return results, timers
+
+
+def print_standings(ladder):
+    _print_table_row(['rank', 'brain', 'rating', 'rd', 'games'])
+    for rank, (name, rating) in enumerate(ladder.standings(), 1):
+        _print_table_row([str(rank), name, '{:.0f}'.format(rating.rating), '{:.0f}'.format(rating.rd),
+                          str(rating.games)])
+
+
+def play_ladder(state_path, num_matches=100, games_per_match=100, processes=None, seed=0, target_rd=None,
+                move_time_budget=None, on_timeout=RANDOM_CARD):
+    ''' Rates the discovered brains by playing the most informative matches, instead of a full round robin.
+    Each match is split evenly between the two brains playing red. Ratings are saved to state_path after
+    every batch of matches, so a ladder can be resumed, and brains added since the last run join the ladder.
+    :param num_matches: max number of matches to play
+    :param games_per_match: number of games per match
+    :param processes: number of worker processes; defaults to the number of CPUs. As many matches as there are
+        processes are scheduled at once.
+    :param target_rd: stop once every brain's rating deviation is below this
+    :return: Ladder
+    '''
+    ladder = Ladder(state_path)
+    names = sorted(unprefixed_name(ai) for ai in _discover_ais())
+    for name in names:
+        ladder.add_brain(name)
+
+    processes = processes or cpu_count()
+    pool = Pool(processes)
+    try:
+        matches_left = num_matches
+        while matches_left > 0:
+            if target_rd is not None and all(ladder.ratings[name].rd < target_rd for name in names):
+                break
+            matches = ladder.next_matches(names, games_per_match, min(matches_left, processes))
+            if not matches:
+                break
+            chunks = [
+                (red_name, blue_name, num_games,
+                 _chunk_seed(seed, red_name, blue_name, ladder.matches_played), move_time_budget, on_timeout, False)
+                for name_a, name_b in matches
+                for red_name, blue_name, num_games in (
+                    (name_a, name_b, games_per_match - games_per_match // 2),
+                    (name_b, name_a, games_per_match // 2),
+                )
+            ]
+            # {(name, name): Counter of winning brain names, None for ties}
+            results = {match: Counter() for match in matches}
+            for red_name, blue_name, win_count, _, _, _ in pool.imap_unordered(_play_chunk, chunks):
+                match = (red_name, blue_name) if (red_name, blue_name) in results else (blue_name, red_name)
+                results[match].update({
+                    red_name: win_count[Color.red], blue_name: win_count[Color.blue], None: win_count[None]
+                })
+            for (name_a, name_b), win_count in results.iteritems():
+                ladder.record_match(name_a, name_b, win_count[name_a], win_count[None], win_count[name_b])
+                print '{} vs. {}: {}/{}/{}'.format(name_a, name_b, win_count[name_a], win_count[None],
+                                                   win_count[name_b])
+            ladder.save()
+            matches_left -= len(matches)
+    finally:
+        pool.close()
+        pool.join()
+
+    print_standings(ladder)
+    return ladder
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Play a round robin tournament between all discovered AIs')
+    parser.add_argument('num_games', type=int, nargs='?', default=1000,
+                        help='Number of games to play in each match')
+    parser.add_argument('--headless', action='store_true', default=False,
+                        help='Play all matches without prompting, spread over a process pool')
+    parser.add_argument('-p', '--processes', type=int, help='Number of worker processes in headless mode')
+    parser.add_argument('--chunk-size', type=int, default=250,
+                        help='Max number of games handed to a worker at once in headless mode')
+    parser.add_argument('--seed', type=int, default=0, help='Base RNG seed for headless mode')
+    parser.add_argument('--move-time-budget', type=float, help='Max seconds a brain may take to choose a card')
+    parser.add_argument('--on-timeout', choices=TIMEOUT_POLICIES, default=RANDOM_CARD,
+                        help='What happens to a brain that goes over its move time budget')
+    parser.add_argument('--ladder', metavar='STATE_FILE',
+                        help='Rate brains on a ladder saved in this JSON file instead of playing a round robin; '
+                             'num_games is then the number of games per ladder match')
+    parser.add_argument('--ladder-matches', type=int, default=100, help='Max number of ladder matches to play')
+    parser.add_argument('--target-rd', type=float,
+                        help='Stop the ladder once every rating deviation is below this')
+    parser.add_argument('--results-db', metavar='DB_FILE',
+                        help='Save round robin results to this SQLite file, and skip matchups it has already '
+                             'finished')
+    parser.add_argument('--record-games', action='store_true', default=False,
+                        help='Also save a row for every game in the results database')
+    parser.add_argument('--opponent-models', metavar='DIR',
+                        help='Directory opponent_model saves what it learns about each opponent in, between runs. '
+                             'Results then depend on earlier runs and on the order matches finish in, so --seed no '
+                             'longer makes them repeatable')
+    parser.add_argument('--show', action='store_true', default=False,
+                        help="Print the results database's summary table and exit, eg. while a tournament runs")
+    parser.add_argument('--brain-record', metavar='BRAIN',
+                        help="Print a brain's record against each opponent from the results database and exit")
+    return parser.parse_args()
+
+
+def print_brain_record(store, name):
+    _print_table_row(['opponent', 'wins', 'ties', 'losses'])
+    for opponent, (wins, ties, losses) in sorted(store.brain_record(name).iteritems()):
+        _print_table_row([opponent, str(wins), str(ties), str(losses)])
+
 
 if __name__ == '__main__':
-    play_round_robin(int(sys.argv[1]))
\ No newline at end of file
+    args = _parse_args()
+    if args.opponent_models:
+        # Read by the brain when a match starts, also in worker processes
+        os.environ[MODELS_DIR_ENV] = args.opponent_models
+    store = ResultsStore(args.results_db) if args.results_db else None
+    if (args.show or args.brain_record) and not store:
+        sys.exit('--show and --brain-record need --results-db')
+    if args.show:
+        all_ais = _discover_ais()
+        print_summary(_stored_results(store, all_ais), all_ais)
+    elif args.brain_record:
+        print_brain_record(store, args.brain_record)
+    elif args.ladder:
+        play_ladder(args.ladder, num_matches=args.ladder_matches, games_per_match=args.num_games,
+                    processes=args.processes, seed=args.seed, target_rd=args.target_rd,
+                    move_time_budget=args.move_time_budget, on_timeout=args.on_timeout)
+    elif args.headless:
+        play_round_robin_headless(args.num_games, processes=args.processes,
+                                  chunk_size=args.chunk_size, seed=args.seed,
+                                  move_time_budget=args.move_time_budget, on_timeout=args.on_timeout,
+                                  store=store, record_games=args.record_games)
+    else:
+        play_round_robin(args.num_games, move_time_budget=args.move_time_budget, on_timeout=args.on_timeout,
+                         store=store, record_games=args.record_games)
+    if store:
+        store.close()
\ No newline at end of file
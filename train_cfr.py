@@ -0,0 +1,30 @@
+import argparse
+
+from components.cfr import DEFAULT_EXPLORATION, export_strategy, train
+
+
+def _print_progress(iterations):
+    print '{} iterations trained'.format(iterations)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Train a CFR strategy for cfr_brain_fn. Training resumes from '
+                                                 'the last checkpoint in the tables directory.')
+    parser.add_argument('tables_dir', help='Directory for the regret and strategy tables')
+    parser.add_argument('-n', '--iterations', type=int, default=100000, help='Number of iterations to train for')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('--checkpoint-every', type=int, default=10000, help='Iterations between checkpoints')
+    parser.add_argument('--exploration', type=float, default=DEFAULT_EXPLORATION,
+                        help='Exploration probability for outcome sampling')
+    parser.add_argument('--seed', type=int, default=0, help='Base RNG seed')
+    parser.add_argument('--export', help='Write the average strategy to this file when done')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    train(args.tables_dir, args.iterations, processes=args.processes, checkpoint_every=args.checkpoint_every,
+          exploration=args.exploration, seed=args.seed, progress_fn=_print_progress)
+    if args.export:
+        export_strategy(args.tables_dir, args.export)
+        print 'Average strategy written to', args.export